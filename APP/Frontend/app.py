@@ -1,17 +1,160 @@
+import os
+import time
 import streamlit as st
 import requests
 import pandas as pd
 import plotly.express as px
-import yfinance as yf
 from datetime import date
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from streamlit_option_menu import option_menu
 
 # --- 設定 ---
 # 這是我們後端的地址
 API_URL = "http://127.0.0.1:8000"
+# (連線逾時, 讀取逾時) 秒數；股票報價較慢，讀取給寬一點
+API_TIMEOUT = (3.05, 20)
+# 以哪個使用者的身分操作 (後端是多使用者的；沒有登入閘道時用預設使用者 1)
+API_USER_ID = os.getenv("ASSET_DOJO_USER_ID", "1")
+# 後端設了 GATEWAY_SECRET 時要帶同一把密鑰，X-User-Id 才會被採信
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET")
+
+# --- 共用連線 ---
+# Streamlit 每次互動都會重跑整支腳本，用 cache_resource 讓 Session 跨重跑保留，
+# 底層 TCP 連線就能 keep-alive 重複使用，不必每個請求重新握手。
+@st.cache_resource
+def get_api_session() -> requests.Session:
+    session = requests.Session()
+    session.headers["X-User-Id"] = API_USER_ID
+    if GATEWAY_SECRET:
+        session.headers["X-Gateway-Secret"] = GATEWAY_SECRET
+    retry = Retry(
+        total=3,
+        backoff_factor=0.3,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET"})  # 只有 GET 會重送；POST/DELETE 只在連線失敗時重試
+    )
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=10, max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def api_get(path, **kwargs):
+    return get_api_session().get(f"{API_URL}{path}", timeout=API_TIMEOUT, **kwargs)
+
+def api_post(path, **kwargs):
+    return get_api_session().post(f"{API_URL}{path}", timeout=API_TIMEOUT, **kwargs)
+
+def api_delete(path, **kwargs):
+    return get_api_session().delete(f"{API_URL}{path}", timeout=API_TIMEOUT, **kwargs)
+
+# --- 資料快取 ---
+# 每次點按鈕、切換選單都會重跑整支腳本，讀取類的請求一律先過快取。
+# 各資源的存活秒數 (TTL)：報價變動快、預算幾乎不動
+CACHE_TTL = {
+    "overview": 60,
+    "budget": 600,
+    "pace": 600,
+    "expenses": 300,
+    "stocks": 60,
+    "achievements": 600,
+    "quote": 120,
+}
+# 彙總 (總覽、預算進度、趨勢) 與成就是寫入後由後端背景工作更新的，寫入後最多等這麼久
+JOB_WAIT_SECONDS = 3
+
+def _get_json(path):
+    res = api_get(path)
+    res.raise_for_status()  # 失敗不要被快取起來，直接丟給呼叫端處理
+    return res.json()
+
+@st.cache_data(ttl=CACHE_TTL["overview"], show_spinner=False)
+def fetch_overview():
+    return _get_json("/overview/")
+
+@st.cache_data(ttl=CACHE_TTL["budget"], show_spinner=False)
+def fetch_budget():
+    return _get_json("/budget/")
+
+@st.cache_data(ttl=CACHE_TTL["pace"], show_spinner=False)
+def fetch_pace():
+    return _get_json("/budget/pace")
+
+@st.cache_data(ttl=CACHE_TTL["expenses"], show_spinner=False)
+def fetch_expenses():
+    return _get_json("/expenses/")
+
+@st.cache_data(ttl=CACHE_TTL["expenses"], show_spinner=False)
+def fetch_series(bucket, start, end):
+    # 已經分好桶、補好 0 的收支序列 (不必把所有帳都抓回來自己分組)
+    return _get_json(f"/expenses/series?bucket={bucket}&from={start}&to={end}")
+
+@st.cache_data(ttl=CACHE_TTL["expenses"], show_spinner=False)
+def fetch_breakdown(start, end):
+    # 各分類合計 (歷史的部分後端讀封存彙總，不必把帳全部抓回來分組)
+    return _get_json(f"/expenses/breakdown?from={start}&to={end}")
+
+@st.cache_data(ttl=CACHE_TTL["stocks"], show_spinner=False)
+def fetch_stocks():
+    return _get_json("/stocks/")
+
+@st.cache_data(ttl=CACHE_TTL["achievements"], show_spinner=False)
+def fetch_achievements():
+    return _get_json("/achievements/")
+
+@st.cache_data(ttl=CACHE_TTL["quote"], show_spinner=False)
+def fetch_quote(symbol):
+    # 台股代號補上 .TW；抓不到回傳 None (None 也會被快取，避免打錯字時一直重查)
+    import yfinance as yf  # 只有試算賣出時才用得到，用到才載入
+    try:
+        hist = yf.Ticker(f"{symbol}.TW").history(period="1d")
+        if not hist.empty:
+            return float(hist["Close"].iloc[-1])
+    except Exception:
+        pass
+    return None
+
+def jobs_pending():
+    # 後端還有沒做完的背景工作嗎 (查不到就當作沒有，不要卡住畫面)
+    try:
+        return _get_json("/system/jobs")["pending"] > 0
+    except Exception:
+        return False
+
+def wait_for_jobs():
+    deadline = time.monotonic() + JOB_WAIT_SECONDS
+    while jobs_pending():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+def clear_derived_cache():
+    # 靠背景工作更新的資料
+    fetch_overview.clear()
+    fetch_pace.clear()
+    fetch_series.clear()
+    fetch_achievements.clear()
+
+def invalidate_cache():
+    # 只要 App 自己送出了寫入 (記帳/刪除/買賣/設定預算)，就把受影響的讀取快取清掉
+    # (報價與我們的寫入無關，保留)
+    # 先等背景工作做完再清：不然馬上重抓到的還是舊的彙總，又會被快取好幾分鐘
+    done = wait_for_jobs()
+    clear_derived_cache()
+    fetch_budget.clear()
+    fetch_expenses.clear()
+    fetch_breakdown.clear()
+    fetch_stocks.clear()
+    # 等太久還沒做完的話，之後每次重跑都再清一次，直到工作做完
+    st.session_state["jobs_pending"] = not done
 
 st.set_page_config(page_title="Asset Dojo 攻守道", page_icon="🥋", layout="wide")
 
+if st.session_state.get("jobs_pending"):
+    st.session_state["jobs_pending"] = jobs_pending()
+    clear_derived_cache()
+
 st.title("🥋 Asset Dojo 攻守道")
 st.caption("記帳是防守，投資是進攻")
 
@@ -40,17 +183,46 @@ with st.sidebar:
     # --- 預算設定區塊 (維持原本邏輯，只稍微調整位置) ---
     st.subheader("⚙️ 修煉")
 
-# 1. 抓取目前預算狀態
+# 0. 資產總覽頁一次把預算、記帳、股票、年度分析全部抓回來 (只需一趟請求)
+overview_data = None
+overview_error = None
+if menu == "資產總覽":
+    try:
+        overview_data = fetch_overview()
+    except Exception as e:
+        overview_error = e
+
+# 1. 抓取目前預算狀態 (總覽頁直接沿用上面的結果)
 try:
-    res_budget = requests.get(f"{API_URL}/budget/")
-    if res_budget.status_code == 200:
-        b_data = res_budget.json()
+    if overview_data is not None:
+        b_data = overview_data["budget"]
+    else:
+        b_data = fetch_budget()
+
+    if b_data is not None:
         current_budget = b_data['amount']
         can_update = b_data['can_update']
         next_date = b_data['next_update_date']
         
         # 顯示目前目標
         st.sidebar.metric("每月支出目標", f"${current_budget:,.0f}")
+
+        # 本月進度：實際花費 vs 依天數平均分配的額度，並預估月底
+        try:
+            pace = fetch_pace()
+            st.sidebar.metric(
+                "本月已花 / 應花",
+                f"${pace['spent']:,.0f} / ${pace['allowance']:,.0f}",
+                delta=f"預估月底 ${pace['projected_total']:,.0f}",
+                delta_color="normal" if pace['on_track'] else "inverse"
+            )
+            if not pace['on_track'] and pace['days_until_breach'] is not None:
+                if pace['days_until_breach'] == 0:
+                    st.sidebar.error("🔥 本月已超出預算！")
+                else:
+                    st.sidebar.warning(f"⚠️ 照目前速度，約 {pace['days_until_breach']} 天後超標")
+        except Exception:
+            pass # 進度只是輔助資訊，抓不到不影響主畫面
         
         # 2. 修改預算 (使用 expander 收納，保持介面整潔)
         with st.sidebar.expander("更改目標設定"):
@@ -58,8 +230,9 @@ try:
                 new_budget = st.number_input("設定新目標", min_value=1000, step=1000, value=current_budget if current_budget > 0 else 30000)
                 if st.button("🔒 立下誓約 (鎖定3個月)"):
                     try:
-                        res_set = requests.post(f"{API_URL}/budget/", json={"amount": new_budget})
+                        res_set = api_post("/budget/", json={"amount": new_budget})
                         if res_set.status_code == 200:
+                            invalidate_cache()
                             st.sidebar.success("✅ 設定成功！修煉開始！")
                             st.rerun()
                         else:
@@ -80,16 +253,16 @@ if menu == "資產總覽":
     st.header("🏆 資產戰情室 (Dashboard)")
     st.caption("運籌帷幄之中，決勝千里之外。")
 
-    # --- 1. 撈取資料 ---
+    # --- 1. 撈取資料 (已在頁面開頭透過 /overview/ 一次取得) ---
     try:
-        # 取得所有記帳資料
-        res_exp = requests.get(f"{API_URL}/expenses/")
-        # 取得股票現值 (為了算淨值)
-        res_stock = requests.get(f"{API_URL}/stocks/")
-        
-        if res_exp.status_code == 200 and res_stock.status_code == 200:
-            data_exp = res_exp.json()
-            data_stock = res_stock.json()
+        if overview_error is not None:
+            st.error(f"資料讀取錯誤: {overview_error}")
+
+        if overview_data is not None:
+            # 記帳資料
+            data_exp = overview_data["expenses"]
+            # 股票現值 (為了算淨值)
+            data_stock = overview_data["stocks"]
             
             # 轉換為 DataFrame 方便計算
             df = pd.DataFrame(data_exp)
@@ -166,10 +339,16 @@ if menu == "資產總覽":
                 with c1:
                     # [圖表] 本月支出類別佔比 (Donut Chart)
                     # 只篩選「支出」且「本月」(如果本月沒資料，就顯示全部時間的，避免空白)
-                    target_df = df[mask_this_month]
+                    def expense_by_category(start):
+                        items = fetch_breakdown(start, today)["items"]
+                        return pd.DataFrame(
+                            [i for i in items if i["record_type"] == "expense"], columns=["category", "total"]
+                        ).rename(columns={"total": "amount"})
+
+                    target_df = expense_by_category(today.replace(day=1))
                     chart_title = "本月支出分佈"
                     if target_df.empty:
-                        target_df = df[df["record_type"] == "expense"] # fallback 到全部
+                        target_df = expense_by_category(date(1970, 1, 1)) # fallback 到全部
                         chart_title = "歷史總支出分佈 (本月尚無資料)"
 
                     if not target_df.empty:
@@ -209,10 +388,19 @@ if menu == "資產總覽":
             # --- 5. 底部：收支趨勢與結餘 (Bar Chart) ---
             st.subheader("📅 收支趨勢 (累計節省)")
             
-            if not df.empty:
-                # 依月份分組，計算收入與支出
-                monthly_stats = df.groupby(["month", "record_type"])["amount"].sum().reset_index()
-                
+            # 近 24 個月的每月收支 (後端分桶，沒有紀錄的月份也會補 0)
+            series_start = (today.replace(day=1) - pd.DateOffset(months=23)).date()
+            series = fetch_series("month", series_start, today)
+            monthly_stats = pd.DataFrame(
+                [
+                    {"month": p["start"][:7], "record_type": record_type, "amount": p["total"]}
+                    for record_type, points in series["series"].items()
+                    for p in points
+                ],
+                columns=["month", "record_type", "amount"]
+            )
+
+            if monthly_stats["amount"].sum() > 0:
                 # 使用 Grouped Bar Chart
                 fig_bar = px.bar(
                     monthly_stats, 
@@ -228,7 +416,7 @@ if menu == "資產總覽":
                 
                 # 計算每個月實際存了多少 (Income - Expense)
                 # 這裡做一個 pivot table 比較好算
-                pivot_df = df.pivot_table(index="month", columns="record_type", values="amount", aggfunc="sum", fill_value=0)
+                pivot_df = monthly_stats.pivot_table(index="month", columns="record_type", values="amount", aggfunc="sum", fill_value=0)
                 if "income" in pivot_df.columns and "expense" in pivot_df.columns:
                     pivot_df["saved"] = pivot_df["income"] - pivot_df["expense"]
                     
@@ -242,39 +430,37 @@ if menu == "資產總覽":
             st.subheader("📆 歷年戰績回顧 (近3年)")
             
             try:
-                res_annual = requests.get(f"{API_URL}/expenses/annual_summary")
-                if res_annual.status_code == 200:
-                    annual_data = res_annual.json()
+                annual_data = overview_data["annual_summary"]
+                
+                if annual_data:
+                    # 我們用 columns 來顯示每年的卡片
+                    cols = st.columns(len(annual_data))
                     
-                    if annual_data:
-                        # 我們用 columns 來顯示每年的卡片
-                        cols = st.columns(len(annual_data))
+                    for idx, item in enumerate(annual_data):
+                        year = item['year']
+                        profit = item['net_profit']
+                        growth = item['growth_pct']
                         
-                        for idx, item in enumerate(annual_data):
-                            year = item['year']
-                            profit = item['net_profit']
-                            growth = item['growth_pct']
-                            
-                            with cols[idx]:
-                                # 根據獲利正負顯示顏色
-                                border_color = "green" if profit >= 0 else "red"
-                                with st.container(border=True):
-                                    st.markdown(f"### {year} 年")
-                                    
-                                    # 顯示淨利
-                                    st.metric(
-                                        label="年度淨利 (Net Profit)",
-                                        value=f"${profit:,.0f}",
-                                        # 顯示成長率 (如果是 None 就不顯示 delta)
-                                        delta=f"{growth:+.1f}% (YoY)" if growth is not None else None,
-                                        delta_color="normal" # 正成長綠色，負成長紅色
-                                    )
-                                    
-                                    # 顯示收支細節小字
-                                    st.caption(f"💰 總收入: ${item['total_income']:,.0f}")
-                                    st.caption(f"💸 總支出: ${item['total_expense']:,.0f}")
-                    else:
-                        st.info("尚無跨年度的資料可供分析")
+                        with cols[idx]:
+                            # 根據獲利正負顯示顏色
+                            border_color = "green" if profit >= 0 else "red"
+                            with st.container(border=True):
+                                st.markdown(f"### {year} 年")
+                                
+                                # 顯示淨利
+                                st.metric(
+                                    label="年度淨利 (Net Profit)",
+                                    value=f"${profit:,.0f}",
+                                    # 顯示成長率 (如果是 None 就不顯示 delta)
+                                    delta=f"{growth:+.1f}% (YoY)" if growth is not None else None,
+                                    delta_color="normal" # 正成長綠色，負成長紅色
+                                )
+                                
+                                # 顯示收支細節小字
+                                st.caption(f"💰 總收入: ${item['total_income']:,.0f}")
+                                st.caption(f"💸 總支出: ${item['total_expense']:,.0f}")
+                else:
+                    st.info("尚無跨年度的資料可供分析")
             except Exception as e:
                 st.error(f"無法讀取年度分析: {e}")
                 
@@ -317,8 +503,9 @@ elif menu == "記帳 (防守)":
                 "record_type": "expense"  # <--- 關鍵：標記為支出
             }
             try:
-                res = requests.post(f"{API_URL}/expenses/", json=payload)
+                res = api_post("/expenses/", json=payload)
                 if res.status_code == 200:
+                    invalidate_cache()
                     st.success("✅ 支出紀錄成功！")
                     st.rerun()
                 else:
@@ -349,8 +536,9 @@ elif menu == "記帳 (防守)":
                 "record_type": "income"  # <--- 關鍵：標記為收入
             }
             try:
-                res = requests.post(f"{API_URL}/expenses/", json=payload)
+                res = api_post("/expenses/", json=payload)
                 if res.status_code == 200:
+                    invalidate_cache()
                     st.balloons()  # 賺錢值得慶祝！
                     st.success("🎉 收入紀錄成功！")
                     st.rerun()
@@ -369,8 +557,9 @@ elif menu == "記帳 (防守)":
         del_id = st.number_input("輸入要刪除的 ID", min_value=1, step=1)
         if st.button("確認刪除"):
             try:
-                res = requests.delete(f"{API_URL}/expenses/{del_id}")
+                res = api_delete(f"/expenses/{del_id}")
                 if res.status_code == 204:
+                    invalidate_cache()
                     st.success(f"✅ ID {del_id} 已刪除")
                     import time
                     time.sleep(1)
@@ -390,25 +579,23 @@ elif menu == "記帳 (防守)":
 
     # 列表顯示邏輯
     try:
-        response = requests.get(f"{API_URL}/expenses/")
-        if response.status_code == 200:
-            data = response.json()
-            if data:
-                df = pd.DataFrame(data)
-                
-                if "record_type" not in df.columns:
-                    df["record_type"] = "expense"
-                
-                # 為了讓使用者知道 ID (以便刪除)，我們把 ID 欄位加回來
-                df = df[["id", "date", "record_type", "category", "amount", "description"]]
-                df.columns = ["ID", "日期", "類型", "分類", "金額", "備註"]
-                
-                # 依照日期降序排列 (新的在上面)
-                df = df.sort_values(by="日期", ascending=False)
-                
-                st.dataframe(df, hide_index=True, use_container_width=True)
-            else:
-                st.info("目前還沒有任何記帳資料，快去新增一筆吧！")
+        data = fetch_expenses()
+        if data:
+            df = pd.DataFrame(data)
+            
+            if "record_type" not in df.columns:
+                df["record_type"] = "expense"
+            
+            # 為了讓使用者知道 ID (以便刪除)，我們把 ID 欄位加回來
+            df = df[["id", "date", "record_type", "category", "amount", "description"]]
+            df.columns = ["ID", "日期", "類型", "分類", "金額", "備註"]
+            
+            # 依照日期降序排列 (新的在上面)
+            df = df.sort_values(by="日期", ascending=False)
+            
+            st.dataframe(df, hide_index=True, use_container_width=True)
+        else:
+            st.info("目前還沒有任何記帳資料，快去新增一筆吧！")
     except Exception as e:
         st.error("⚠️ 無法連接到後端伺服器")
 
@@ -434,17 +621,12 @@ elif menu == "股票 (進攻)":
 
         # [UX 優化] 3. 自動抓取當前股價 (作為預設值)
         current_price_guess = 0.0
-        try:
-            if symbol_input:
-                # 這裡直接用 yfinance 抓即時股價給前端看
-                ticker = yf.Ticker(f"{symbol_input}.TW")
-                # 嘗試抓取最後收盤價 (快速查詢)
-                hist = ticker.history(period="1d")
-                if not hist.empty:
-                    current_price_guess = float(hist["Close"].iloc[-1])
-                    st.caption(f"🔎 {symbol_input} 參考市價: {current_price_guess}")
-        except Exception:
-            pass # 抓不到就算了，不影響主流程
+        if symbol_input:
+            # 用 yfinance 抓最後收盤價給前端參考 (同一代號會走快取，重跑不會再連網)
+            quote = fetch_quote(symbol_input)
+            if quote is not None:
+                current_price_guess = quote
+                st.caption(f"🔎 {symbol_input} 參考市價: {current_price_guess}")
 
         # --- 買入表單 ---
         with st.form("buy_stock_form"):
@@ -468,8 +650,9 @@ elif menu == "股票 (進攻)":
             
             payload = {"symbol": symbol_input, "shares": int(final_shares), "price": price}
             try:
-                res = requests.post(f"{API_URL}/stocks/", json=payload)
+                res = api_post("/stocks/", json=payload)
                 if res.status_code == 200:
+                    invalidate_cache()
                     st.success(f"✅ 成功買入 {symbol_input} {final_shares} 股！")
                     st.rerun()
                 else:
@@ -495,27 +678,21 @@ elif menu == "股票 (進攻)":
 
         try:
             # A. 嘗試從後端 API 抓庫存資料
-            res = requests.get(f"{API_URL}/stocks/")
-            if res.status_code == 200:
-                all_stocks = res.json()
-                target_batches = [s for s in all_stocks if s['symbol'] == sell_symbol]
-                
-                if target_batches:
-                    # 情況 1: 有庫存 -> 用庫存裡的最新價格
-                    total_shares_owned = sum(s['shares'] for s in target_batches)
-                    current_market_price = target_batches[0].get('current_price', 0)
-                    st.info(f"📦 {sell_symbol} 總庫存: {total_shares_owned} 股")
-                else:
-                    # 情況 2: 沒庫存 -> 嘗試去 Yahoo Finance 抓即時股價
-                    st.warning(f"⚠️ 查無 {sell_symbol} 的庫存，將嘗試抓取即時市價...")
-                    try:
-                        ticker = yf.Ticker(f"{sell_symbol}.TW")
-                        hist = ticker.history(period="1d")
-                        if not hist.empty:
-                            current_market_price = float(hist["Close"].iloc[-1])
-                            st.caption(f"🔎 Yahoo Finance 報價: {current_market_price}")
-                    except:
-                        pass # 抓不到就算了
+            all_stocks = fetch_stocks()
+            target_batches = [s for s in all_stocks if s['symbol'] == sell_symbol]
+            
+            if target_batches:
+                # 情況 1: 有庫存 -> 用庫存裡的最新價格
+                total_shares_owned = sum(s['shares'] for s in target_batches)
+                current_market_price = target_batches[0].get('current_price', 0)
+                st.info(f"📦 {sell_symbol} 總庫存: {total_shares_owned} 股")
+            else:
+                # 情況 2: 沒庫存 -> 嘗試去 Yahoo Finance 抓即時股價
+                st.warning(f"⚠️ 查無 {sell_symbol} 的庫存，將嘗試抓取即時市價...")
+                quote = fetch_quote(sell_symbol)
+                if quote is not None:
+                    current_market_price = quote
+                    st.caption(f"🔎 Yahoo Finance 報價: {current_market_price}")
         except:
             pass
 
@@ -557,8 +734,9 @@ elif menu == "股票 (進攻)":
                     "price": sell_price
                 }
                 try:
-                    res = requests.post(f"{API_URL}/stocks/sell/smart", json=payload)
+                    res = api_post("/stocks/sell/smart", json=payload)
                     if res.status_code == 200:
+                        invalidate_cache()
                         result = res.json()
                         profit = result['realized_profit']
                         
@@ -583,26 +761,24 @@ elif menu == "股票 (進攻)":
     # --- 下方顯示庫存列表 (維持不變) ---
     st.subheader("📦 目前持股清單")
     try:
-        res = requests.get(f"{API_URL}/stocks/")
-        if res.status_code == 200:
-            stock_data = res.json()
-            if stock_data:
-                df_stock = pd.DataFrame(stock_data)
-                df_stock = df_stock[[
-                    "symbol", "shares", "average_cost", 
-                    "current_price", "market_value", "profit"
-                ]]
-                df_stock.columns = ["代號", "股數", "平均成本", "目前股價", "市值", "未實現損益"]
-                st.dataframe(df_stock, hide_index=True, use_container_width=True)
-                
-                total_value = df_stock["市值"].sum()
-                total_profit = df_stock["未實現損益"].sum()
-                
-                c1, c2 = st.columns(2)
-                c1.metric("💰 股票總市值", f"${total_value:,.0f}")
-                c2.metric("🚀 帳面損益", f"${total_profit:,.0f}", delta=f"{total_profit:,.0f}")
-            else:
-                st.info("目前沒有庫存，趕快進場吧！")
+        stock_data = fetch_stocks()
+        if stock_data:
+            df_stock = pd.DataFrame(stock_data)
+            df_stock = df_stock[[
+                "symbol", "shares", "average_cost", 
+                "current_price", "market_value", "profit"
+            ]]
+            df_stock.columns = ["代號", "股數", "平均成本", "目前股價", "市值", "未實現損益"]
+            st.dataframe(df_stock, hide_index=True, use_container_width=True)
+            
+            total_value = df_stock["市值"].sum()
+            total_profit = df_stock["未實現損益"].sum()
+            
+            c1, c2 = st.columns(2)
+            c1.metric("💰 股票總市值", f"${total_value:,.0f}")
+            c2.metric("🚀 帳面損益", f"${total_profit:,.0f}", delta=f"{total_profit:,.0f}")
+        else:
+            st.info("目前沒有庫存，趕快進場吧！")
     except Exception as e:
         st.error("⚠️ 無法取得股票資料")
 
@@ -614,97 +790,98 @@ elif menu == "成就道場":
     st.caption(f"📅 目前週期：{current_period} (當月成就將於次月 1 日結算)")
     
     try:
-        res = requests.get(f"{API_URL}/achievements/")
-        if res.status_code == 200:
-            ach_list = res.json()
-            
-            # 計算總進度
-            unlocked_count = sum(1 for a in ach_list if a['is_unlocked'])
-            total_count = len(ach_list)
+        ach_list = fetch_achievements()
+        
+        # 計算總進度
+        unlocked_count = sum(1 for a in ach_list if a['is_unlocked'])
+        total_count = len(ach_list)
+        if total_count:
             st.progress(unlocked_count / total_count, text=f"總修煉進度：{unlocked_count}/{total_count}")
-            st.divider()
-
-            # [前端邏輯優化] 建立一個「可見清單」
-            # 我們需要知道每個成就的「前置條件」是誰，這需要在前端也簡單定義一下關係，
-            # 或是利用後端的 tier 邏輯。這裡用一個更聰明的方法：
-            # 邏輯：對於每一個成就，如果它是 Level 1 -> 顯示
-            #       如果它的 Level > 1 -> 只有在「上一級已解鎖」時才顯示
-            
-            # 為了方便，我們把後端的 PREREQUISITES 邏輯簡單複製一份到前端做顯示過濾
-            # (這比再寫一支 API 簡單)
-            FRONTEND_PREREQ = {
-                "save_300": "save_1",
-                "save_1000": "save_300",
-                "save_5000": "save_1000",
-                "save_10000": "save_5000",
-                "success_streak_3": "first_success",
-                "success_streak_6": "success_streak_3",
-                "fail_streak_3": "first_fail",
-                "fail_streak_6": "fail_streak_3",
-                "super_save": "success_streak_3"
-            }
+        else:
+            st.info("成就資料準備中，請稍後再重新整理")
+        st.divider()
+
+        # [前端邏輯優化] 建立一個「可見清單」
+        # 我們需要知道每個成就的「前置條件」是誰，這需要在前端也簡單定義一下關係，
+        # 或是利用後端的 tier 邏輯。這裡用一個更聰明的方法：
+        # 邏輯：對於每一個成就，如果它是 Level 1 -> 顯示
+        #       如果它的 Level > 1 -> 只有在「上一級已解鎖」時才顯示
+        
+        # 為了方便，我們把後端成就規則表 (achievement_rules.py) 的前置關係簡單複製一份到前端做顯示過濾
+        # (這比再寫一支 API 簡單)
+        FRONTEND_PREREQ = {
+            "save_300": "save_1",
+            "save_1000": "save_300",
+            "save_5000": "save_1000",
+            "save_10000": "save_5000",
+            "success_streak_3": "first_success",
+            "success_streak_6": "success_streak_3",
+            "fail_streak_3": "first_fail",
+            "fail_streak_6": "fail_streak_3",
+            "super_save": "success_streak_3"
+        }
+        
+        # 建立一個 {code: is_unlocked} 的快速查表
+        status_map = {a['code']: a['is_unlocked'] for a in ach_list}
+        
+        visible_achs = []
+        for ach in ach_list:
+            code = ach['code']
+            is_unlocked = ach['is_unlocked']
             
-            # 建立一個 {code: is_unlocked} 的快速查表
-            status_map = {a['code']: a['is_unlocked'] for a in ach_list}
+            # 規則 1: 已經解鎖的，當然要顯示
+            if is_unlocked:
+                visible_achs.append(ach)
+                continue
             
-            visible_achs = []
-            for ach in ach_list:
-                code = ach['code']
-                is_unlocked = ach['is_unlocked']
-                
-                # 規則 1: 已經解鎖的，當然要顯示
-                if is_unlocked:
-                    visible_achs.append(ach)
-                    continue
+            # 規則 2: 還沒解鎖，但它是 Level 1 (新手任務)，也要顯示
+            if ach['tier'] == 1:
+                visible_achs.append(ach)
+                continue
                 
-                # 規則 2: 還沒解鎖，但它是 Level 1 (新手任務)，也要顯示
-                if ach['tier'] == 1:
-                    visible_achs.append(ach)
-                    continue
-                    
-                # 規則 3: 還沒解鎖，是高階任務，檢查上一級解鎖沒
-                parent_code = FRONTEND_PREREQ.get(code)
-                if parent_code and status_map.get(parent_code, False):
-                    # 如果爸爸解鎖了，兒子就可以出來見人了 (作為下一個挑戰)
-                    visible_achs.append(ach)
-
-            # --- 開始繪製 (只繪製 visible_achs) ---
-            # 為了保持版面整齊，我們還是依照 Tier 分類顯示
-            tiers = {
-                1: "🔰 Level 1: 見習 (Novice)",
-                2: "🥋 Level 2: 黑帶 (Black Belt)",
-                3: "🧘 Level 3: 師父 (Master)",
-                4: "👑 Level 4: 宗師 (Grandmaster)"
-            }
+            # 規則 3: 還沒解鎖，是高階任務，檢查上一級解鎖沒
+            parent_code = FRONTEND_PREREQ.get(code)
+            if parent_code and status_map.get(parent_code, False):
+                # 如果爸爸解鎖了，兒子就可以出來見人了 (作為下一個挑戰)
+                visible_achs.append(ach)
+
+        # --- 開始繪製 (只繪製 visible_achs) ---
+        # 為了保持版面整齊，我們還是依照 Tier 分類顯示
+        tiers = {
+            1: "🔰 Level 1: 見習 (Novice)",
+            2: "🥋 Level 2: 黑帶 (Black Belt)",
+            3: "🧘 Level 3: 師父 (Master)",
+            4: "👑 Level 4: 宗師 (Grandmaster)"
+        }
 
-            for t_id, t_name in tiers.items():
-                # 篩選屬於這個層級且「可見」的成就
-                tier_items = [a for a in visible_achs if a['tier'] == t_id]
-                
-                if not tier_items:
-                    continue # 如果這個等級沒有可見的成就，就整區隱藏
-                
-                st.subheader(t_name)
-                cols = st.columns(3)
-                for idx, ach in enumerate(tier_items):
-                    with cols[idx % 3]:
-                        container = st.container(border=True)
-                        if ach['is_unlocked']:
-                            # 解鎖樣式
-                            container.markdown(f"### {ach['icon']} {ach['name']}")
-                            container.caption(f"✅ {ach['description']}")
-                            if ach['unlocked_at']:
-                                # [修改] 顯示達成年月 (YYYY-MM)
-                                dt_obj = date.fromisoformat(ach['unlocked_at'].split("T")[0])
-                                date_str = dt_obj.strftime("%Y年%m月")
-                                container.text(f"達成於: {date_str}")
-                        else:
-                            # 鎖定樣式 (下一個挑戰)
-                            container.markdown(f"### 🔒 {ach['name']}")
-                            container.caption(f"{ach['description']}") 
-                            container.info("修煉中...")
-                
-                st.divider()
+        for t_id, t_name in tiers.items():
+            # 篩選屬於這個層級且「可見」的成就
+            tier_items = [a for a in visible_achs if a['tier'] == t_id]
+            
+            if not tier_items:
+                continue # 如果這個等級沒有可見的成就，就整區隱藏
+            
+            st.subheader(t_name)
+            cols = st.columns(3)
+            for idx, ach in enumerate(tier_items):
+                with cols[idx % 3]:
+                    container = st.container(border=True)
+                    if ach['is_unlocked']:
+                        # 解鎖樣式
+                        container.markdown(f"### {ach['icon']} {ach['name']}")
+                        container.caption(f"✅ {ach['description']}")
+                        if ach['unlocked_at']:
+                            # [修改] 顯示達成年月 (YYYY-MM)
+                            dt_obj = date.fromisoformat(ach['unlocked_at'].split("T")[0])
+                            date_str = dt_obj.strftime("%Y年%m月")
+                            container.text(f"達成於: {date_str}")
+                    else:
+                        # 鎖定樣式 (下一個挑戰)
+                        container.markdown(f"### 🔒 {ach['name']}")
+                        container.caption(f"{ach['description']}") 
+                        container.info("修煉中...")
+            
+            st.divider()
 
     except Exception as e:
         st.error(f"無法讀取成就資料: {e}")
\ No newline at end of file
@@ -0,0 +1,12 @@
+import argparse
+from APP.startup_profile import profile_startup
+
+parser = argparse.ArgumentParser(prog="python -m APP", description="Asset Dojo 後端工具")
+parser.add_argument("--profile-startup", action="store_true", help="分析 API 啟動耗時 (各模組 import 時間 + lifespan)")
+parser.add_argument("--top", type=int, default=20, help="每張表列出前幾名 (預設 20)")
+args = parser.parse_args()
+
+if args.profile_startup:
+    profile_startup(args.top)
+else:
+    parser.print_help()
@@ -0,0 +1,64 @@
+"""
+帳務封存 (見 APP/services/archive_service.py)：
+
+    python -m APP.archive list                      # 已封存的年份
+    python -m APP.archive run --dry-run             # 看看哪些年份可以封存
+    python -m APP.archive run                       # 封存 ARCHIVE_KEEP_YEARS 以前的年份
+    python -m APP.archive run --keep-years 5
+    python -m APP.archive run --year 2019           # 只封存指定年份
+
+封存檔放在 ARCHIVE_DIR (預設 ./archive)，API 與排程也要能讀到同一個目錄。
+"""
+import argparse
+import asyncio
+import logging
+from APP import migrations
+from APP.database import dispose_engines, engine
+from APP.services import archive_service, seal_service
+
+
+async def main(args):
+    try:
+        await migrations.verify(engine)
+        if args.command == "list":
+            for a in await archive_service.list_archives():
+                print(f"{a.year}  {a.rows:>8} 筆  {a.total_amount:>12}  {a.archived_at:%Y-%m-%d %H:%M}  {a.path}")
+            return
+
+        # 搬走之前先確定封存彙總已經涵蓋這些帳 (之後分類合計不再需要明細)
+        if not args.dry_run:
+            await seal_service.seal_all()
+        years = [args.year] if args.year else await archive_service.archivable_years(args.keep_years)
+        if not years:
+            print("沒有可以封存的年份")
+        if args.dry_run and years:
+            summaries = {int(s.year): s for s in await archive_service.year_summaries(max(years) + 1)}
+        for year in years:
+            if args.dry_run:
+                s = summaries.get(year)
+                print(f"可封存: {year}  {s.rows if s else 0:>8} 筆  {s.total_amount if s else 0:>12}")
+                continue
+            try:
+                record = await archive_service.archive_year(year)
+            except archive_service.ArchiveError as e:
+                print(e)
+                continue
+            if record is None:
+                print(f"{year} 年沒有資料")
+            else:
+                print(f"{year} 年已封存: {record['rows']} 筆 -> {record['path']}")
+    finally:
+        await dispose_engines()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m APP.archive", description="舊年份帳務封存")
+    parser.add_argument("command", choices=["run", "list"], help="run: 封存 / list: 列出已封存的年份")
+    parser.add_argument("--keep-years", type=int, default=archive_service.ARCHIVE_KEEP_YEARS,
+                        help="資料庫保留最近幾年 (含今年)")
+    parser.add_argument("--year", type=int, help="只封存這一年")
+    parser.add_argument("--dry-run", action="store_true", help="只列出會封存的年份")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args))
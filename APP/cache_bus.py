@@ -0,0 +1,135 @@
+"""
+快取失效通知 (跨程序)。
+
+開好幾個 uvicorn worker (或獨立的 python -m APP.worker) 時，寫入可能發生在別的程序，
+本程序裡的快取 (例如預算進度) 就會一直拿著舊資料。這裡把「哪張表、哪個使用者的資料變了」廣播給所有程序：
+- 寫入端在 transaction 裡呼叫 publish(db, topic)，commit 成功後才送出 (rollback 就不送)
+- 本程序：commit 之後直接通知 subscribe 的函式 (單一程序、SQLite 都靠這條)
+- PostgreSQL：同時在 transaction 裡 pg_notify，commit 時資料庫才真正發給所有 LISTEN 的程序；
+  每個程序啟動時開一條連線 LISTEN，收到別的程序發的通知就清掉自己的快取
+- 監聽連線斷掉 (中間的通知可能漏了) 重連後，把所有快取整個清掉
+
+topic 用資料表的角度命名 (rollups = 日 / 月彙總、budgets = 預算)，訂閱端自己決定要清哪些 key。
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from uuid import uuid4
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from APP import metrics
+from APP.database import engine
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = "cache_invalidate"
+RECONNECT_SECONDS = 5
+# 這個程序發出的通知會被自己的 LISTEN 收回來，靠這個認出來略過 (本程序已經在 commit 後處理過了)
+ORIGIN = f"{os.getpid()}-{uuid4().hex[:8]}"
+
+# topic -> [fn(user_id)]；user_id 是 None 代表全部使用者
+_subscribers = defaultdict(list)
+
+
+def subscribe(*topics: str):
+    """註冊：這些 topic 有變動 (任何程序) 時呼叫 fn(user_id)，可當 decorator 用"""
+    def register(fn):
+        for topic in topics:
+            _subscribers[topic].append(fn)
+        return fn
+    return register
+
+def _dispatch(topic: str, user_id: int | None, source: str):
+    metrics.cache_invalidations.inc(topic, source)
+    for fn in _subscribers.get(topic, ()):
+        try:
+            fn(user_id)
+        except Exception:
+            logger.exception("快取失效處理失敗: %s", topic)
+
+def _dispatch_all():
+    for topic in list(_subscribers):
+        _dispatch(topic, None, "reconnect")
+
+async def publish(db, topic: str, user_id: int | None = None):
+    """登記一筆變動 (跟呼叫端的資料一起 commit 才生效)；user_id 預設是 Session 的使用者"""
+    if user_id is None:
+        user_id = db.info.get("user_id")
+    events = db.info.setdefault("cache_events", set())
+    if (topic, user_id) in events:
+        return
+    events.add((topic, user_id))
+    if db.get_bind().dialect.name == "postgresql":
+        payload = json.dumps({"origin": ORIGIN, "topic": topic, "user_id": user_id})
+        await db.execute(text("SELECT pg_notify(:channel, :payload)"), {"channel": CHANNEL, "payload": payload})
+
+@event.listens_for(Session, "after_commit")
+def _dispatch_after_commit(session):
+    # 等 commit 成功才清，避免別的請求在 commit 前重算又把舊資料放回快取
+    for topic, user_id in session.info.pop("cache_events", ()):
+        _dispatch(topic, user_id, "local")
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("cache_events", None)
+
+
+def _on_notify(connection, pid, channel, payload):
+    try:
+        message = json.loads(payload)
+    except ValueError:
+        logger.warning("看不懂的快取失效通知: %r", payload)
+        return
+    if message.get("origin") != ORIGIN:
+        _dispatch(message["topic"], message.get("user_id"), "remote")
+
+
+class Listener:
+    """PostgreSQL 才需要：背景 task 佔一條連線 LISTEN，斷線自動重連"""
+
+    def __init__(self):
+        self._task = None
+
+    async def _listen(self):
+        while True:
+            lost = asyncio.Event()
+            try:
+                async with engine.connect() as conn:
+                    raw = (await conn.get_raw_connection()).driver_connection  # asyncpg 的連線
+                    raw.add_termination_listener(lambda _: lost.set())
+                    await raw.add_listener(CHANNEL, _on_notify)
+                    # 剛連上 (或重連) 之前的通知收不到，保守起見整個清掉
+                    _dispatch_all()
+                    logger.info("快取失效通知：開始監聽 %s", CHANNEL)
+                    try:
+                        await lost.wait()
+                    finally:
+                        if not raw.is_closed():
+                            await raw.remove_listener(CHANNEL, _on_notify)
+                    logger.warning("快取失效通知的連線中斷，%s 秒後重連", RECONNECT_SECONDS)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("快取失效通知連線失敗，%s 秒後重連", RECONNECT_SECONDS)
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def start(self):
+        # SQLite：只有本程序的通知 (commit 後直接處理)，不需要監聽
+        if self._task is not None or engine.dialect.name != "postgresql":
+            return
+        self._task = asyncio.create_task(self._listen(), name="cache-bus")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+listener = Listener()
@@ -1,27 +1,200 @@
 import os
+import threading
+import time
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from APP.tenancy import get_user_id
 
 # 1. 載入 .env 檔案裡的設定
 load_dotenv()
 
 # 2. 從環境變數讀取連線字串 (不再寫死密碼)
-SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL")
+# 沒設定 DATABASE_URL 就用內建的 SQLite 檔案 (單機 / 單人使用不必另外架資料庫伺服器)
+SQLITE_PATH = os.getenv("SQLITE_PATH", "asset_dojo.db")
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"sqlite:///{SQLITE_PATH}"
+# 選填：唯讀副本 (只給 GET 查詢用)，沒設定就全部走主資料庫
+READ_DATABASE_URL = os.getenv("READ_DATABASE_URL")
 
-# 3. 建立資料庫引擎
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+# 連線池設定 (每個 worker 各自一個池，總連線數 = worker 數 x (SIZE + OVERFLOW))
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+POOL_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))      # 等不到連線幾秒後放棄
+POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))      # 連線用超過幾秒就換新的 (-1 不換)
+POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") != "0"     # 取出前先確認連線還活著
+
+# SQLite 調校 (WAL 模式下 synchronous=NORMAL 不會因當機損毀資料庫，最多遺失最後幾筆 commit)
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL").upper()
+SQLITE_CACHE_MB = int(os.getenv("SQLITE_CACHE_MB", "64"))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))  # 寫入鎖被佔用時最多等多久
+if SQLITE_SYNCHRONOUS not in ("OFF", "NORMAL", "FULL", "EXTRA"):
+    raise ValueError(f"SQLITE_SYNCHRONOUS 設定錯誤: {SQLITE_SYNCHRONOUS}")
+
+# 非同步驅動：PostgreSQL 用 asyncpg，本機 SQLite 用 aiosqlite
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+}
+
+def to_async_url(url):
+    # .env 裡照舊寫 postgresql://...，這裡自動換成對應的非同步驅動
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.drivername, url.drivername))
+
+# 連線池使用狀況 (依引擎名稱分開統計)
+_pool_stats = {}
+_pool_stats_lock = threading.Lock()
+
+class MeteredPool(AsyncAdaptedQueuePool):
+    """記錄取連線次數與等待時間的連線池 (池滿時的等待、開新連線都發生在 _do_get 裡)"""
+
+    stats_name = "primary"
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start
+            with _pool_stats_lock:
+                stats = _pool_stats.setdefault(self.stats_name, {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0})
+                stats["checkouts"] += 1
+                stats["wait_seconds"] += waited
+                stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+def _setup_sqlite(sync_engine, write: bool):
+    """
+    SQLite 的連線設定：
+    - WAL：讀寫互不阻擋 (寫入時其他連線照樣可以讀)
+    - 交易由我們自己下 BEGIN (驅動預設要等到第一句寫入才開始交易)。
+      寫入用 BEGIN IMMEDIATE：一開始就拿寫入鎖，多個請求同時寫時會照順序等 busy_timeout，
+      而不是「先讀後寫」在升級鎖的時候直接失敗 (database is locked)
+    """
+    @event.listens_for(sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+        cursor.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_MB * 1024}")  # 負數代表 KB
+        cursor.execute(f"PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @event.listens_for(sync_engine, "begin")
+    def _on_begin(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE" if write else "BEGIN")
+
+def _create_engine(url, name, write=True):
+    # __module__ 設成 sqlalchemy.pool：連線池的 log 跟原本一樣歸在 sqlalchemy 底下 (預設不輸出 INFO)
+    pool_class = type(f"MeteredPool_{name}", (MeteredPool,), {"stats_name": name, "__module__": "sqlalchemy.pool"})
+    eng = create_async_engine(
+        to_async_url(url),
+        poolclass=pool_class,
+        pool_size=POOL_SIZE,
+        max_overflow=POOL_MAX_OVERFLOW,
+        pool_timeout=POOL_TIMEOUT,
+        pool_recycle=POOL_RECYCLE,
+        pool_pre_ping=POOL_PRE_PING,
+    )
+    if eng.dialect.name == "sqlite":
+        _setup_sqlite(eng.sync_engine, write)
+    return eng
+
+# 3. 建立資料庫引擎 (非同步)
+engine = _create_engine(SQLALCHEMY_DATABASE_URL, "primary")
+if engine.dialect.name == "sqlite" and engine.url.database not in (None, "", ":memory:"):
+    # 同一個 SQLite 檔案，但查詢另外用一組不搶寫入鎖的連線 (WAL 下讀取不必等寫入)
+    primary_read_engine = _create_engine(SQLALCHEMY_DATABASE_URL, "read", write=False)
+else:
+    primary_read_engine = engine
+if READ_DATABASE_URL:
+    read_engine = _create_engine(READ_DATABASE_URL, "replica", write=False)
+else:
+    read_engine = primary_read_engine
+
+async def dispose_engines():
+    # 同一個引擎只關一次 (沒有副本時 read_engine 就是 primary_read_engine / engine)
+    for eng in dict.fromkeys((engine, primary_read_engine, read_engine)):
+        await eng.dispose()
 
 # 4. 建立 Session 工廠
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# expire_on_commit=False：commit 後物件仍可直接讀取，不會在 async 環境下觸發隱性查詢
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(bind=read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
+# 只讀、但要看到主資料庫最新狀態的查詢 (不能用有延遲的副本)：SQLite 不會因此拿寫入鎖
+PrimaryReadSessionLocal = async_sessionmaker(bind=primary_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 # 5. 宣告 Base 模型
 Base = declarative_base()
 
 # 6. 資料庫依賴 (這個函式一定要留著，不然 API 會壞掉！)
-def get_db():
-    db = SessionLocal()
-    try:
+# Session 綁定這次請求的使用者，之後的查詢都會自動只看該使用者的資料 (見 APP/tenancy.py)
+async def get_db(user_id: int = Depends(get_user_id)):
+    async with SessionLocal(info={"user_id": user_id}) as db:
+        yield db
+
+# 唯讀依賴：純查詢的 GET API 用這個 (有設定副本就走副本，減輕主資料庫負擔)
+# 注意副本可能有些許延遲，剛寫入的資料不一定馬上查得到
+async def get_read_db(user_id: int = Depends(get_user_id)):
+    async with ReadSessionLocal(info={"user_id": user_id}) as db:
+        yield db
+
+# 唯讀但要讀主資料庫的 GET API (結果會被快取、或是要馬上看到剛寫入的資料)
+# get_db 在 SQLite 上一開始就拿寫入鎖 (BEGIN IMMEDIATE)，純查詢用它會跟所有寫入排隊
+async def get_primary_read_db(user_id: int = Depends(get_user_id)):
+    async with PrimaryReadSessionLocal(info={"user_id": user_id}) as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+# 在自己開的唯讀 Session 裡執行 fn(*args, db=db)
+# 給並行任務、或是多個請求共用的計算 (APP/singleflight.py) 用：它們不能借用某個請求的 Session
+async def with_read_session(user_id: int, fn, *args):
+    async with ReadSessionLocal(info={"user_id": user_id}) as db:
+        return await fn(*args, db=db)
+
+# 7. 支援 ON CONFLICT 的 insert (批次 upsert 用)
+def dialect_insert(db, table):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(table)
+    if dialect == "sqlite":
+        return sqlite.insert(table)
+    raise NotImplementedError(f"不支援的資料庫: {dialect}")
+
+async def increment(db, table, pk: dict, **deltas):
+    """
+    計數列原子加減：沒有這一列就以 deltas 新增，有就在資料庫裡 col = col + delta。
+    不先讀再寫 (兩個 transaction 同時讀到同一個值，其中一個的加減會不見)。
+    """
+    stmt = dialect_insert(db, table).values(**pk, **deltas)
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c[k] for k in pk],
+        set_={k: table.c[k] + stmt.excluded[k] for k in deltas}
+    ))
+
+# 8. 連線池狀態 (給監控用)
+def pool_status() -> dict:
+    engines = {"primary": engine}
+    if read_engine is not engine:
+        engines[read_engine.pool.stats_name] = read_engine
+
+    result = {}
+    for name, eng in engines.items():
+        pool = eng.pool
+        with _pool_stats_lock:
+            stats = dict(_pool_stats.get(name, {"checkouts": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0}))
+        result[name] = {
+            "size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+            "idle": pool.checkedin(),
+            **stats,
+        }
+    return result
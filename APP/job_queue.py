@@ -0,0 +1,224 @@
+"""
+背景工作佇列 (存在資料庫的 jobs 表，程序重啟也不會遺失)。
+
+寫入 API 只負責主要的那筆資料，衍生的更新 (月/日彙總、成就判定、賣股自動記帳) 排進佇列，
+commit 後馬上回應，由 worker 在背景處理：
+- enqueue 跟主要資料在同一個 transaction：主資料存進去了，工作就一定也在 (不會漏排)
+- 冪等鍵：同一個 (使用者, key) 只會排入一次
+- 執行工作跟標記完成在同一個 transaction：中途失敗整個 rollback，重試不會重複套用
+- 失敗依次數延後重試，超過 JOB_MAX_ATTEMPTS 次標記 failed (留在表裡給人查)
+- 程序當掉而卡在 running 的工作，超過 JOB_LOCK_TIMEOUT 秒會被重新領取
+- API 內建的 worker 與獨立的 python -m APP.worker 可以同時跑：
+  PostgreSQL 用 FOR UPDATE SKIP LOCKED 領工作，SQLite 的寫入交易本來就是一個一個來
+"""
+import asyncio
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from uuid import uuid4
+from sqlalchemy import and_, delete, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from APP import metrics, models
+from APP.database import PrimaryReadSessionLocal, SessionLocal, dialect_insert
+from APP.tenancy import tenant_id
+from APP.services import achievement_service, journal_service
+
+logger = logging.getLogger(__name__)
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))               # API 程序內建幾個 worker (0 = 交給獨立程序)
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "5"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))   # 沒被喚醒時多久檢查一次 (其他程序排的工作)
+JOB_LOCK_TIMEOUT = int(os.getenv("JOB_LOCK_TIMEOUT", "300"))   # running 超過幾秒視為 worker 已經掛掉
+JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", "7"))  # 完成的工作保留幾天 (冪等鍵在這段期間有效)
+RETRY_BASE_SECONDS = 2   # 第 n 次失敗後等 2^n 秒再重試
+STOP_TIMEOUT = 10        # 關閉時最多等手上的工作幾秒
+
+# 工作種類 -> 處理函式 async fn(db, payload)，db 已經綁定該工作的使用者
+HANDLERS = {
+    "record_change": achievement_service.handle_record_change,
+    "auto_journal": journal_service.auto_journal,
+}
+
+
+async def enqueue(db, kind: str, payload: dict, key: str | None = None):
+    """排入一個工作，跟呼叫端的資料一起 commit。key 相同的工作只會排入一次 (沒給就不去重)"""
+    if kind not in HANDLERS:
+        raise ValueError(f"沒有這種工作: {kind}")
+    now = datetime.now()
+    table = models.Job.__table__
+    stmt = dialect_insert(db, table).values(
+        user_id=tenant_id(db), kind=kind, payload=payload, idempotency_key=key or uuid4().hex,
+        status="pending", attempts=0, run_after=now, created_at=now
+    )
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=[table.c.user_id, table.c.idempotency_key]))
+    db.info["jobs_enqueued"] = True
+
+@event.listens_for(Session, "after_commit")
+def _wake_after_commit(session):
+    # commit 之後才叫醒 worker (之前它還看不到這筆工作)
+    if session.info.pop("jobs_enqueued", False):
+        worker_pool.wake()
+
+@event.listens_for(Session, "after_rollback")
+def _discard_after_rollback(session):
+    session.info.pop("jobs_enqueued", None)
+
+
+async def _claim() -> models.Job | None:
+    """領一個該跑的工作 (標成 running)"""
+    J = models.Job
+    now = datetime.now()
+    async with SessionLocal() as db:  # 不綁使用者：所有人的工作都看得到
+        job = await db.scalar(
+            select(J).where(or_(
+                and_(J.status == "pending", J.run_after <= now),
+                and_(J.status == "running", J.locked_at < now - timedelta(seconds=JOB_LOCK_TIMEOUT)),
+            )).order_by(J.run_after, J.id).limit(1).with_for_update(skip_locked=True)
+        )
+        if job is None:
+            return None
+        job.status = "running"
+        job.locked_at = now
+        job.attempts += 1
+        await db.commit()
+        return job
+
+def _still_ours(job: models.Job):
+    # 處理太久被當成掛掉、已經被別的 worker 重新領走的話，這邊的結果就不算數
+    return and_(models.Job.id == job.id, models.Job.locked_at == job.locked_at)
+
+async def _run(job: models.Job):
+    metrics.job_wait.observe((datetime.now() - job.created_at).total_seconds(), job.kind)
+    start = time.perf_counter()
+    try:
+        handler = HANDLERS[job.kind]
+        # job_id：處理中重建彙總時，別把自己這個工作也當成重複的結掉 (rollup_service.backfill)
+        async with SessionLocal(info={"user_id": job.user_id, "job_id": job.id}) as db:
+            await handler(db, job.payload)
+            result = await db.execute(
+                update(models.Job).where(_still_ours(job)).values(status="done", finished_at=datetime.now())
+            )
+            if result.rowcount == 0:
+                await db.rollback()
+                logger.warning("工作 %s 已被其他 worker 重新領取，放棄這次的結果", job.id)
+                return
+            await db.commit()
+        metrics.jobs_processed.inc(job.kind, "done")
+    except Exception as e:
+        logger.exception("工作 %s (%s) 第 %s 次執行失敗", job.id, job.kind, job.attempts)
+        await _fail(job, e)
+    finally:
+        metrics.job_duration.observe(time.perf_counter() - start, job.kind)
+
+async def apply_pending(db, kind: str) -> int:
+    """
+    在呼叫端的 transaction 裡直接處理目前使用者還沒做完 (含失敗) 的某種工作，標成完成 (不 commit)。
+    給「接下來要讀這些工作的結果、而且讀了就不能改」的地方用 (月結算)，回傳處理了幾個。
+    正在被 worker 處理的也一起做掉：locked_at 清掉之後，那個 worker 的結果會被丟棄 (_still_ours)。
+    """
+    J = models.Job
+    jobs = (await db.scalars(
+        select(J).where(J.kind == kind, J.status.in_(["pending", "running", "failed"])).order_by(J.id).with_for_update()
+    )).all()
+    for job in jobs:
+        await HANDLERS[kind](db, job.payload)
+        job.status = "done"
+        job.locked_at = None
+        job.finished_at = datetime.now()
+    await db.flush()
+    return len(jobs)
+
+async def _fail(job: models.Job, error: Exception):
+    now = datetime.now()
+    final = job.attempts >= JOB_MAX_ATTEMPTS or job.kind not in HANDLERS
+    values = {"locked_at": None, "last_error": f"{type(error).__name__}: {error}"[:2000]}
+    if final:
+        values.update(status="failed", finished_at=now)
+    else:
+        values.update(status="pending", run_after=now + timedelta(seconds=RETRY_BASE_SECONDS ** job.attempts))
+    async with SessionLocal() as db:
+        await db.execute(update(models.Job).where(_still_ours(job)).values(**values))
+        await db.commit()
+    metrics.jobs_processed.inc(job.kind, "failed" if final else "retry")
+
+
+class WorkerPool:
+    """在 event loop 裡跑 N 個 worker，各自領工作來做"""
+
+    def __init__(self):
+        self._tasks = []
+        self._wakeup = None
+        self._stopping = False
+
+    def wake(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _worker(self):
+        while not self._stopping:
+            self._wakeup.clear()
+            try:
+                job = await _claim()
+            except Exception:
+                logger.exception("領取背景工作失敗")
+                job = None
+            if job is not None:
+                await _run(job)
+                continue
+            # 沒工作：等 commit 叫醒，或是定時再看一次 (其他程序排的工作不會叫醒這裡)
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), JOB_POLL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, workers: int = JOB_WORKERS):
+        if self._tasks or workers <= 0:
+            return
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._tasks = [asyncio.create_task(self._worker(), name=f"job-worker-{i}") for i in range(workers)]
+
+    async def stop(self):
+        """做完手上的工作再停 (超過 STOP_TIMEOUT 就直接取消，沒做完的工作之後會被重新領取)"""
+        if not self._tasks:
+            return
+        self._stopping = True
+        self.wake()
+        _, pending = await asyncio.wait(self._tasks, timeout=STOP_TIMEOUT)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        self._tasks = []
+        self._wakeup = None
+
+
+worker_pool = WorkerPool()
+
+
+async def queue_depth() -> dict[str, int]:
+    """各狀態的工作數 (給 /metrics 用；done 不算，只看還沒做完或失敗的)"""
+    J = models.Job
+    async with PrimaryReadSessionLocal() as db:
+        rows = (await db.execute(
+            select(J.status, func.count()).where(J.status != "done").group_by(J.status)
+        )).all()
+    depth = {"pending": 0, "running": 0, "failed": 0}
+    depth.update({status: count for status, count in rows})
+    return depth
+
+async def pending_count(db) -> int:
+    """目前使用者還沒做完的工作數 (前端寫入後輪詢，等衍生資料更新完再重抓)"""
+    J = models.Job
+    return await db.scalar(select(func.count()).select_from(J).where(J.status.in_(["pending", "running"])))
+
+async def purge_finished():
+    """清掉保留期限之前完成的工作 (失敗的留著給人查)"""
+    cutoff = datetime.now() - timedelta(days=JOB_RETENTION_DAYS)
+    async with SessionLocal() as db:
+        result = await db.execute(
+            delete(models.Job).where(models.Job.status == "done", models.Job.finished_at < cutoff)
+        )
+        await db.commit()
+    if result.rowcount:
+        logger.info("清除 %s 筆已完成的背景工作", result.rowcount)
@@ -1,19 +1,57 @@
+from contextlib import asynccontextmanager
+import os
 from fastapi import FastAPI
-from APP.database import engine
-from APP import models
+from fastapi.middleware.gzip import GZipMiddleware
+from APP.database import dispose_engines, engine
+from APP import cache_bus, migrations, query_profiler
+from APP.job_queue import worker_pool
+from APP.metrics import MetricsMiddleware
 from APP.routers import dashboard, expense, stock
 from APP.routers import budget
 from APP.routers import achievements
+from APP.routers import overview
+from APP.routers import system
+from APP.routers import metrics
+from APP.services import quote_service
+from APP.scheduler import scheduler, SCHEDULER_ENABLED
 
-models.Base.metadata.create_all(bind=engine)
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 只檢查資料庫結構版本 (建表、加索引交給 python -m APP.migrations upgrade)
+    await migrations.verify(engine)
+    # PostgreSQL：監聽其他程序的快取失效通知 (SQLite / 單一程序不需要)
+    await cache_bus.listener.start()
 
-app = FastAPI(title="Asset Dojo API")
+    # 背景工作 (寫入後的彙總 / 成就 / 自動記帳)，JOB_WORKERS=0 時交給 python -m APP.worker
+    # 先開 worker 再跑排程：重啟前沒做完的工作馬上開始消化
+    await worker_pool.start()
+    # 背景排程 (月結算)：啟動時會先補跑錯過的月份 (結算前會把還沒做完的彙總工作補上)
+    if SCHEDULER_ENABLED:
+        await scheduler.start()
+    yield
+    await worker_pool.stop()
+    await scheduler.stop()
+    await cache_bus.listener.stop()
+    await quote_service.close()
+    await dispose_engines()
+
+app = FastAPI(title="Asset Dojo API", lifespan=lifespan)
+
+# 回應超過 GZIP_MIN_BYTES 且用戶端支援 (Accept-Encoding: gzip) 才壓縮；小回應壓了反而浪費 CPU
+app.add_middleware(GZipMiddleware, minimum_size=int(os.getenv("GZIP_MIN_BYTES", "1024")))
+# 每個請求的次數 / 延遲 / 資料庫用量，從 GET /metrics 抓
+app.add_middleware(MetricsMiddleware)
+# 除錯模式 (QUERY_PROFILE=1)：逐句記錄 SQL、標出重複查詢與慢查詢
+query_profiler.install(app)
 
 app.include_router(dashboard.router)
 app.include_router(expense.router)
 app.include_router(stock.router)
 app.include_router(budget.router)
 app.include_router(achievements.router)
+app.include_router(overview.router)
+app.include_router(system.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 def read_root():
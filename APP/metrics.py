@@ -0,0 +1,201 @@
+"""
+輕量的 Prometheus 指標 (不依賴 prometheus_client)。
+
+所有更新都發生在 event loop 的執行緒上 (包含 SQLAlchemy 的 async 事件)，
+所以只是單純的 dict / list 加總，不需要上鎖；/metrics 被抓取時才組出文字格式。
+"""
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# 預設的延遲分界 (秒)
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# 每個請求的查詢次數分界
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+
+_registry = []
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labels, amount=1):
+        self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def samples(self):
+        for labels, value in self._values.items():
+            yield self.name, _format_labels(self.label_names, labels), value
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.documentation, self.label_names = name, documentation, tuple(labels)
+        self.buckets = tuple(buckets)
+        # labels -> [各區間次數 (最後一格是 +Inf), 總和, 次數]
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, value, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            entry = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        entry[0][bisect_left(self.buckets, value)] += 1
+        entry[1] += value
+        entry[2] += 1
+
+    def samples(self):
+        for labels, (counts, total, count) in self._values.items():
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                yield f"{self.name}_bucket", _format_labels(self.label_names + ("le",), labels + (le,)), cumulative
+            yield f"{self.name}_sum", _format_labels(self.label_names, labels), total
+            yield f"{self.name}_count", _format_labels(self.label_names, labels), count
+
+
+def render(extra_gauges=()) -> str:
+    """
+    輸出 Prometheus 文字格式。
+    extra_gauges: [(名稱, 說明, 標籤名稱, {標籤值: 數值})]，抓取當下才讀的狀態 (例如連線池)
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.documentation}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for name, labels, value in metric.samples():
+            lines.append(f"{name}{labels} {value}")
+    for name, documentation, label_names, values in extra_gauges:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} gauge")
+        for labels, value in values.items():
+            lines.append(f"{name}{_format_labels(label_names, labels)} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# --- API 請求 ---
+http_requests = Counter("http_requests_total", "API 請求數", ("method", "route", "status"))
+http_latency = Histogram("http_request_duration_seconds", "API 回應時間", ("method", "route"))
+http_in_flight = Gauge("http_requests_in_flight", "處理中的請求數")
+
+# --- 資料庫 ---
+db_queries = Counter("db_queries_total", "SQL 執行次數")
+db_query_latency = Histogram("db_query_duration_seconds", "單一 SQL 執行時間")
+db_queries_per_request = Histogram("db_queries_per_request", "每個請求執行的 SQL 數", ("route",), QUERY_COUNT_BUCKETS)
+db_time_per_request = Histogram("db_time_per_request_seconds", "每個請求花在資料庫的時間", ("route",))
+
+# --- 外部報價 (Yahoo) ---
+quote_requests = Counter("quote_requests_total", "向 Yahoo 查價的次數", ("result",))
+quote_latency = Histogram("quote_request_duration_seconds", "向 Yahoo 查價的時間")
+
+# --- 快取 ---
+cache_requests = Counter("cache_requests_total", "快取查詢次數 (result=hit/miss)", ("cache", "result"))
+cache_invalidations = Counter(
+    "cache_invalidations_total", "收到的快取失效通知 (source=local 本程序 / remote 其他程序 / reconnect 重連後全清)",
+    ("topic", "source")
+)
+
+# --- 背景工作佇列 (佇列長度在 /metrics 被抓取時才查) ---
+jobs_processed = Counter("jobs_processed_total", "背景工作執行結果 (result=done/retry/failed)", ("kind", "result"))
+job_duration = Histogram("job_duration_seconds", "背景工作執行時間", ("kind",))
+job_wait = Histogram("job_wait_seconds", "背景工作從排入到開始執行的等待時間", ("kind",))
+
+# --- 庫存批次合併 (各部位的批次數在 /metrics 被抓取時才查) ---
+lots_compacted = Counter("stock_lots_compacted_total", "合併掉的庫存批次數")
+
+# --- 請求合併 (single-flight) ---
+singleflight_requests = Counter(
+    "singleflight_requests_total", "可合併的計算次數 (result=leader 實際計算 / shared 等別人的結果)", ("key", "result")
+)
+
+# 目前請求的資料庫用量 [查詢次數, 秒數] (由 middleware 放進去，SQLAlchemy 事件累加)
+request_db_usage: ContextVar[list | None] = ContextVar("request_db_usage", default=None)
+
+
+class MetricsMiddleware:
+    """純 ASGI middleware (比 BaseHTTPMiddleware 少一層 task，開著也幾乎沒有成本)"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = [0, 0.0]
+        token = request_db_usage.set(usage)
+        http_in_flight.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start
+            http_in_flight.dec()
+            request_db_usage.reset(token)
+
+            # 用路由樣板 (/expenses/{expense_id}) 而不是實際網址，避免標籤數量爆炸
+            route = scope.get("route")
+            route = route.path if route is not None else "unmatched"
+            method = scope["method"]
+            http_requests.inc(method, route, status)
+            http_latency.observe(elapsed, method, route)
+            db_queries_per_request.observe(usage[0], route)
+            db_time_per_request.observe(usage[1], route)
+
+
+# --- SQL 計時 (所有引擎都算) ---
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    db_queries.inc()
+    db_query_latency.observe(elapsed)
+    usage = request_db_usage.get()
+    if usage is not None:
+        usage[0] += 1
+        usage[1] += elapsed
+
+@event.listens_for(Engine, "handle_error")
+def _on_query_error(context):
+    # 執行失敗時不會有 after_cursor_execute，把開始時間丟掉，避免之後配錯對
+    starts = context.connection.info.get("query_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
@@ -0,0 +1,78 @@
+"""
+資料庫結構的版本管理 (只能往前升級，不提供降版)。
+
+新增一版的做法：
+1. 在這個資料夾新增 vXXXX_說明.py，裡面要有 DESCRIPTION 和 upgrade(conn) (conn 是同步的 Connection)
+2. 加到下面的 MIGRATIONS 最後面 (版本號 = 在清單中的位置，已發佈的版本不能再改)
+3. 執行 python -m APP.migrations upgrade
+"""
+import logging
+from sqlalchemy import Column, Integer, MetaData, String, DateTime, Table, func, insert, inspect, select
+from APP.migrations import (
+    v0001_baseline, v0002_query_indexes, v0003_user_tenancy, v0004_job_queue,
+    v0005_expense_partitions, v0006_sealed_totals, v0007_budget_effective_from,
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = [
+    v0001_baseline,
+    v0002_query_indexes,
+    v0003_user_tenancy,
+    v0004_job_queue,
+    v0005_expense_partitions,
+    v0006_sealed_totals,
+    v0007_budget_effective_from,
+]
+LATEST_VERSION = len(MIGRATIONS)
+
+_metadata = MetaData()
+schema_version = Table(
+    "schema_version", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("description", String, nullable=False),
+    Column("applied_at", DateTime, server_default=func.now()),
+)
+
+
+class SchemaVersionError(RuntimeError):
+    pass
+
+
+def _current_version(conn) -> int:
+    if not inspect(conn).has_table(schema_version.name):
+        return 0
+    return conn.execute(select(func.max(schema_version.c.version))).scalar() or 0
+
+async def current_version(engine) -> int:
+    async with engine.connect() as conn:
+        return await conn.run_sync(_current_version)
+
+async def upgrade(engine) -> list[int]:
+    """把資料庫升到最新版，回傳這次套用的版本號 (每一版各自一個 transaction)"""
+    async with engine.begin() as conn:
+        await conn.run_sync(_metadata.create_all, checkfirst=True)
+
+    applied = []
+    for version, migration in enumerate(MIGRATIONS, start=1):
+        async with engine.begin() as conn:
+            if await conn.run_sync(_current_version) >= version:
+                continue
+            logger.info("套用 migration %04d: %s", version, migration.DESCRIPTION)
+            await conn.run_sync(migration.upgrade)
+            # 版本號是主鍵：兩個程序同時升級時，慢的那個會在這裡失敗並整版 rollback
+            await conn.execute(insert(schema_version).values(version=version, description=migration.DESCRIPTION))
+        applied.append(version)
+    return applied
+
+async def verify(engine):
+    """啟動時檢查：資料庫版本要跟程式碼一致 (不自動升級，避免多個 worker 同時改結構)"""
+    version = await current_version(engine)
+    if version < LATEST_VERSION:
+        raise SchemaVersionError(
+            f"資料庫結構版本 {version} 落後於程式碼 ({LATEST_VERSION})，請先執行: python -m APP.migrations upgrade"
+        )
+    if version > LATEST_VERSION:
+        raise SchemaVersionError(
+            f"資料庫結構版本 {version} 比程式碼 ({LATEST_VERSION}) 還新，請更新程式碼"
+        )
@@ -0,0 +1,30 @@
+import argparse
+import asyncio
+import logging
+from APP import migrations
+from APP.database import engine
+
+
+async def main(command: str):
+    try:
+        if command == "upgrade":
+            applied = await migrations.upgrade(engine)
+            if applied:
+                print(f"已升級到版本 {applied[-1]} (套用 {len(applied)} 版)")
+            else:
+                print(f"已是最新版本 ({migrations.LATEST_VERSION})")
+        else:
+            version = await migrations.current_version(engine)
+            print(f"目前版本: {version} / 最新版本: {migrations.LATEST_VERSION}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m APP.migrations", description="資料庫結構版本管理")
+    parser.add_argument("command", choices=["upgrade", "current"], help="upgrade: 升到最新版 / current: 顯示目前版本")
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(message)s")
+    logging.getLogger(migrations.__name__).setLevel(logging.INFO)
+    asyncio.run(main(args.command))
@@ -0,0 +1,93 @@
+from sqlalchemy import Boolean, Column, Date, DateTime, Float, Integer, MetaData, String, Table
+
+DESCRIPTION = "初始資料表 (導入 migration 前 create_all 建出來的結構)"
+
+# 當時結構的快照：之後 models.py 再怎麼改，這一版都不能動
+metadata = MetaData()
+
+Table(
+    "expenses", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("amount", Integer, nullable=False),
+    Column("category", String, nullable=False),
+    Column("description", String, nullable=True),
+    Column("date", Date, nullable=False),
+    Column("record_type", String, nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "stocks", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("symbol", String, nullable=False),
+    Column("shares", Integer, nullable=False),
+    Column("average_cost", Float, nullable=False),
+    Column("created_at", DateTime),
+)
+
+Table(
+    "budget", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("monthly_limit", Integer, nullable=False),
+    Column("updated_at", DateTime),
+    # effective_from (預算歷史) 是後來才加的，見 v0007
+)
+
+Table(
+    "achievements", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String, unique=True),
+    Column("description", String),
+    Column("tier", Integer),
+    Column("icon", String),
+    Column("code", String, unique=True),
+    Column("is_unlocked", Boolean),
+    Column("unlocked_at", DateTime, nullable=True),
+)
+
+Table(
+    "monthly_totals", metadata,
+    Column("month", String, primary_key=True),
+    Column("record_type", String, primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+Table(
+    "achievement_state", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("record_count", Integer, nullable=False),
+    Column("settled_month", String, nullable=True),
+    Column("total_savings", Integer, nullable=False),
+    Column("streak_over", Integer, nullable=False),
+    Column("streak_under", Integer, nullable=False),
+    Column("max_streak_over", Integer, nullable=False),
+    Column("max_streak_under", Integer, nullable=False),
+    Column("failed_months", Integer, nullable=False),
+    Column("succeeded_months", Integer, nullable=False),
+    Column("super_save_months", Integer, nullable=False),
+)
+
+Table(
+    "monthly_settlements", metadata,
+    Column("month", String, primary_key=True),
+    Column("total_expense", Integer, nullable=False),
+    Column("total_income", Integer, nullable=False),
+    Column("expense_count", Integer, nullable=False),
+    Column("budget", Integer, nullable=False),
+    Column("savings", Integer, nullable=False),
+    Column("settled_at", DateTime),
+)
+
+Table(
+    "daily_totals", metadata,
+    Column("date", Date, primary_key=True),
+    Column("record_type", String, primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+
+def upgrade(conn):
+    # checkfirst：舊資料庫已經由 create_all 建好表，這一版就只是登記版本號
+    metadata.create_all(conn, checkfirst=True)
@@ -0,0 +1,19 @@
+from sqlalchemy import Index, MetaData, Table
+
+DESCRIPTION = "常用查詢的索引 (帳務依日期/類型/分類、庫存依代號與成本)"
+
+# achievements(code) 已經有 UNIQUE 限制 (資料庫會自動建立唯一索引，成就 upsert 也靠它)，不再重複建
+
+INDEXES = [
+    ("ix_expenses_date", "expenses", ["date"]),
+    ("ix_expenses_record_type_date", "expenses", ["record_type", "date"]),
+    ("ix_expenses_category_date", "expenses", ["category", "date"]),
+    ("ix_stocks_symbol_average_cost", "stocks", ["symbol", "average_cost"]),  # 智慧賣出：同代號依成本排序
+]
+
+
+def upgrade(conn):
+    metadata = MetaData()
+    for name, table_name, columns in INDEXES:
+        table = Table(table_name, metadata, autoload_with=conn)
+        Index(name, *(table.c[c] for c in columns)).create(conn, checkfirst=True)
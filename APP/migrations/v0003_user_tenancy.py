@@ -0,0 +1,164 @@
+from sqlalchemy import (
+    Boolean, Column, Date, DateTime, Float, Index, Integer, MetaData, String, Table, UniqueConstraint, inspect
+)
+from sqlalchemy.schema import AddConstraint
+
+DESCRIPTION = "多租戶：所有資料表加上 user_id (既有資料歸給使用者 1)，主鍵 / 唯一限制 / 索引改成以 user_id 開頭"
+
+# 導入多租戶前的資料都是單一使用者的
+LEGACY_USER_ID = 1
+
+# 升級後的結構快照
+metadata = MetaData()
+
+Table(
+    "expenses", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("amount", Integer, nullable=False),
+    Column("category", String, nullable=False),
+    Column("description", String, nullable=True),
+    Column("date", Date, nullable=False),
+    Column("record_type", String, nullable=False),
+    Column("created_at", DateTime),
+    Column("user_id", Integer, nullable=False),
+    Index("ix_expenses_user_date", "user_id", "date"),
+    Index("ix_expenses_user_type_date", "user_id", "record_type", "date"),
+    Index("ix_expenses_user_category_date", "user_id", "category", "date"),
+)
+
+Table(
+    "stocks", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("symbol", String, nullable=False),
+    Column("shares", Integer, nullable=False),
+    Column("average_cost", Float, nullable=False),
+    Column("created_at", DateTime),
+    Column("user_id", Integer, nullable=False),
+    Index("ix_stocks_user_symbol_cost", "user_id", "symbol", "average_cost"),
+)
+
+Table(
+    "budget", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("monthly_limit", Integer, nullable=False),
+    Column("updated_at", DateTime),
+    # effective_from 與它的索引交給 v0007 (SQLite 重建時這裡沒有的欄位不會搬，v0007 會從 updated_at 補回來)
+    Column("user_id", Integer, nullable=False),
+)
+
+Table(
+    "achievements", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("name", String),
+    Column("description", String),
+    Column("tier", Integer),
+    Column("icon", String),
+    Column("code", String),
+    Column("is_unlocked", Boolean),
+    Column("unlocked_at", DateTime, nullable=True),
+    Column("user_id", Integer, nullable=False),
+    UniqueConstraint("user_id", "code", name="uq_achievements_user_code"),
+    UniqueConstraint("user_id", "name", name="uq_achievements_user_name"),
+)
+
+Table(
+    "monthly_totals", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("month", String, primary_key=True),
+    Column("record_type", String, primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+Table(
+    "achievement_state", metadata,
+    Column("user_id", Integer, primary_key=True),  # 取代原本固定為 1 的 id
+    Column("record_count", Integer, nullable=False),
+    Column("settled_month", String, nullable=True),
+    Column("total_savings", Integer, nullable=False),
+    Column("streak_over", Integer, nullable=False),
+    Column("streak_under", Integer, nullable=False),
+    Column("max_streak_over", Integer, nullable=False),
+    Column("max_streak_under", Integer, nullable=False),
+    Column("failed_months", Integer, nullable=False),
+    Column("succeeded_months", Integer, nullable=False),
+    Column("super_save_months", Integer, nullable=False),
+)
+
+Table(
+    "monthly_settlements", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("month", String, primary_key=True),
+    Column("total_expense", Integer, nullable=False),
+    Column("total_income", Integer, nullable=False),
+    Column("expense_count", Integer, nullable=False),
+    Column("budget", Integer, nullable=False),
+    Column("savings", Integer, nullable=False),
+    Column("settled_at", DateTime),
+)
+
+Table(
+    "daily_totals", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("date", Date, primary_key=True),
+    Column("record_type", String, primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+# 被「以 user_id 開頭」的版本取代的舊索引
+OLD_INDEXES = [
+    "ix_expenses_date", "ix_expenses_record_type_date", "ix_expenses_category_date",
+    "ix_stocks_symbol_average_cost", "ix_budget_effective_from",
+]
+# 主鍵要加上 user_id 的表
+REKEYED_TABLES = ["monthly_totals", "daily_totals", "monthly_settlements", "achievement_state"]
+
+
+def _rebuild_sqlite(conn, table):
+    # SQLite 不能改主鍵 / 唯一限制：改名 -> 用新結構建表 -> 搬資料 -> 刪舊表
+    old_name = f"_old_{table.name}"
+    insp = inspect(conn)
+    old_columns = {c["name"] for c in insp.get_columns(table.name)}
+    for index in insp.get_indexes(table.name):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')  # 索引名稱是全域的，先讓出來
+
+    conn.exec_driver_sql(f'ALTER TABLE "{table.name}" RENAME TO "{old_name}"')
+    table.create(conn)
+    columns = ", ".join(f'"{c.name}"' for c in table.columns if c.name in old_columns)
+    conn.exec_driver_sql(
+        f'INSERT INTO "{table.name}" ({columns}, user_id) SELECT {columns}, {LEGACY_USER_ID} FROM "{old_name}"'
+    )
+    conn.exec_driver_sql(f'DROP TABLE "{old_name}"')
+
+def _upgrade_postgresql(conn):
+    insp = inspect(conn)
+    for table in metadata.sorted_tables:
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} ADD COLUMN user_id INTEGER NOT NULL DEFAULT {LEGACY_USER_ID}")
+        conn.exec_driver_sql(f"ALTER TABLE {table.name} ALTER COLUMN user_id DROP DEFAULT")
+
+    for name in OLD_INDEXES:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {name}")
+    for constraint in insp.get_unique_constraints("achievements"):
+        conn.exec_driver_sql(f'ALTER TABLE achievements DROP CONSTRAINT "{constraint["name"]}"')
+    for name in REKEYED_TABLES:
+        pk_name = insp.get_pk_constraint(name)["name"]
+        conn.exec_driver_sql(f'ALTER TABLE {name} DROP CONSTRAINT "{pk_name}"')
+    conn.exec_driver_sql("ALTER TABLE achievement_state DROP COLUMN id")
+
+    for name in REKEYED_TABLES:
+        conn.execute(AddConstraint(metadata.tables[name].primary_key))
+    for constraint in metadata.tables["achievements"].constraints:
+        if isinstance(constraint, UniqueConstraint):
+            conn.execute(AddConstraint(constraint))
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(conn, checkfirst=True)
+
+
+def upgrade(conn):
+    if conn.dialect.name == "sqlite":
+        for table in metadata.sorted_tables:
+            _rebuild_sqlite(conn, table)
+    else:
+        _upgrade_postgresql(conn)
@@ -0,0 +1,27 @@
+from sqlalchemy import JSON, Column, DateTime, Index, Integer, MetaData, String, Table, Text, UniqueConstraint
+
+DESCRIPTION = "背景工作佇列 (jobs)：寫入後的衍生工作排進資料表，由 worker 處理"
+
+metadata = MetaData()
+
+jobs = Table(
+    "jobs", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("user_id", Integer, nullable=False),
+    Column("kind", String, nullable=False),
+    Column("payload", JSON, nullable=False),
+    Column("idempotency_key", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("run_after", DateTime, nullable=False),
+    Column("locked_at", DateTime, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", DateTime, nullable=False),
+    Column("finished_at", DateTime, nullable=True),
+    UniqueConstraint("user_id", "idempotency_key", name="uq_jobs_user_idempotency_key"),
+    Index("ix_jobs_status_run_after", "status", "run_after"),
+)
+
+
+def upgrade(conn):
+    jobs.create(conn, checkfirst=True)
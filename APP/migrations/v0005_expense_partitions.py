@@ -0,0 +1,79 @@
+from datetime import date
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect
+
+DESCRIPTION = "帳務封存：expense_archives 紀錄表；PostgreSQL 的 expenses 改為依年份分區 (range partition)"
+
+metadata = MetaData()
+
+Table(
+    "expense_archives", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("year", Integer, nullable=False, index=True),
+    Column("path", String, nullable=False),
+    Column("rows", Integer, nullable=False),
+    Column("total_amount", Integer, nullable=False),
+    Column("archived_at", DateTime, nullable=False),
+)
+
+# 分區後的 expenses (主鍵一定要包含分區欄位，所以是 (id, date)；id 仍由同一個 sequence 產生，不會重複)
+PARTITIONED_EXPENSES = """
+    CREATE TABLE expenses (
+        id INTEGER NOT NULL DEFAULT nextval('{sequence}'),
+        amount INTEGER NOT NULL,
+        category VARCHAR NOT NULL,
+        description VARCHAR,
+        date DATE NOT NULL,
+        record_type VARCHAR NOT NULL,
+        created_at TIMESTAMP WITHOUT TIME ZONE,
+        user_id INTEGER NOT NULL,
+        PRIMARY KEY (id, date)
+    ) PARTITION BY RANGE (date)
+"""
+COLUMNS = "id, amount, category, description, date, record_type, created_at, user_id"
+INDEXES = [
+    ("ix_expenses_id", "id"),
+    ("ix_expenses_user_date", "user_id, date"),
+    ("ix_expenses_user_type_date", "user_id, record_type, date"),
+    ("ix_expenses_user_category_date", "user_id, category, date"),
+]
+
+
+def _partition_expenses(conn):
+    first, last = conn.exec_driver_sql(
+        "SELECT CAST(EXTRACT(YEAR FROM MIN(date)) AS INTEGER), CAST(EXTRACT(YEAR FROM MAX(date)) AS INTEGER) FROM expenses"
+    ).one()
+    this_year = date.today().year
+    first = first or this_year
+    last = max(last or this_year, this_year) + 1  # 明年的分區也先建好
+
+    # 舊表讓出名稱 (表名、主鍵、索引名稱都是整個 schema 共用的)
+    sequence = conn.exec_driver_sql("SELECT pg_get_serial_sequence('expenses', 'id')").scalar()
+    pk_name = inspect(conn).get_pk_constraint("expenses")["name"]
+    for index in inspect(conn).get_indexes("expenses"):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    conn.exec_driver_sql("ALTER TABLE expenses RENAME TO expenses_unpartitioned")
+    conn.exec_driver_sql(f'ALTER TABLE expenses_unpartitioned RENAME CONSTRAINT "{pk_name}" TO expenses_unpartitioned_pkey')
+    conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+
+    conn.exec_driver_sql(PARTITIONED_EXPENSES.format(sequence=sequence))
+    conn.exec_driver_sql(f"ALTER SEQUENCE {sequence} OWNED BY expenses.id")
+    for year in range(first, last + 1):
+        conn.exec_driver_sql(
+            f"CREATE TABLE expenses_y{year} PARTITION OF expenses "
+            f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+        )
+    # 沒有對應年份分區的資料 (例如很久以前補登的帳) 放這裡
+    conn.exec_driver_sql("CREATE TABLE expenses_default PARTITION OF expenses DEFAULT")
+
+    conn.exec_driver_sql(f"INSERT INTO expenses ({COLUMNS}) SELECT {COLUMNS} FROM expenses_unpartitioned")
+    conn.exec_driver_sql("DROP TABLE expenses_unpartitioned")
+    # 建在母表上，各分區會自動建立自己的索引
+    for name, columns in INDEXES:
+        conn.exec_driver_sql(f"CREATE INDEX {name} ON expenses ({columns})")
+
+
+def upgrade(conn):
+    metadata.create_all(conn, checkfirst=True)
+    # SQLite 沒有分區，封存時直接把該年的資料從 expenses 刪掉
+    if conn.dialect.name == "postgresql":
+        _partition_expenses(conn)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Date, DateTime, Integer, MetaData, String, Table
+
+DESCRIPTION = "封存彙總：鎖定期限之後的日 / 月收支依類型與分類封存 (sealed_totals)，以及每人封存到哪一天 (seal_states)"
+
+metadata = MetaData()
+
+Table(
+    "sealed_totals", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("period", String, primary_key=True),
+    Column("start", Date, primary_key=True),
+    Column("record_type", String, primary_key=True),
+    Column("category", String, primary_key=True),
+    Column("total", Integer, nullable=False),
+    Column("count", Integer, nullable=False),
+)
+
+Table(
+    "seal_states", metadata,
+    Column("user_id", Integer, primary_key=True),
+    Column("sealed_through", Date, nullable=True),
+    Column("sealed_at", DateTime, nullable=True),
+)
+
+
+def upgrade(conn):
+    # 資料表建好就好，第一次封存由排程 (或查詢前的 seal) 從 expenses 補上
+    metadata.create_all(conn, checkfirst=True)
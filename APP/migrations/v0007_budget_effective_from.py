@@ -0,0 +1,47 @@
+from sqlalchemy import Column, Date, DateTime, Index, Integer, MetaData, Table, inspect
+
+DESCRIPTION = "預算歷史：budget 加上 effective_from (既有的每一筆從 updated_at 那天開始生效)"
+
+metadata = MetaData()
+
+budget = Table(
+    "budget", metadata,
+    Column("id", Integer, primary_key=True, index=True),
+    Column("monthly_limit", Integer, nullable=False),
+    Column("updated_at", DateTime),
+    Column("effective_from", Date, nullable=False),
+    Column("user_id", Integer, nullable=False),
+    Index("ix_budget_user_effective_from", "user_id", "effective_from"),
+)
+
+# updated_at 是空的 (理論上不會有) 就當作今天才開始生效
+BACKFILL = {
+    "sqlite": "UPDATE budget SET effective_from = COALESCE(date(updated_at), date('now')) WHERE effective_from IS NULL",
+    "postgresql": "UPDATE budget SET effective_from = COALESCE(CAST(updated_at AS DATE), CURRENT_DATE) WHERE effective_from IS NULL",
+}
+
+
+def _rebuild_sqlite(conn):
+    # SQLite 不能事後把欄位改成 NOT NULL：改名 -> 用新結構建表 -> 搬資料 -> 刪舊表
+    for index in inspect(conn).get_indexes("budget"):
+        conn.exec_driver_sql(f'DROP INDEX "{index["name"]}"')
+    conn.exec_driver_sql('ALTER TABLE budget RENAME TO "_old_budget"')
+    budget.create(conn)
+    columns = ", ".join(c.name for c in budget.columns)
+    conn.exec_driver_sql(f'INSERT INTO budget ({columns}) SELECT {columns} FROM "_old_budget"')
+    conn.exec_driver_sql('DROP TABLE "_old_budget"')
+
+
+def upgrade(conn):
+    columns = {c["name"]: c for c in inspect(conn).get_columns("budget")}
+    if "effective_from" not in columns:
+        conn.exec_driver_sql("ALTER TABLE budget ADD COLUMN effective_from DATE")
+    conn.exec_driver_sql(BACKFILL[conn.dialect.name])
+
+    if conn.dialect.name == "sqlite":
+        if "effective_from" not in columns or columns["effective_from"]["nullable"]:
+            _rebuild_sqlite(conn)
+    else:
+        conn.exec_driver_sql("ALTER TABLE budget ALTER COLUMN effective_from SET NOT NULL")
+    for index in budget.indexes:
+        index.create(conn, checkfirst=True)
@@ -1,11 +1,26 @@
-from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Boolean, Float
+from sqlalchemy import Column, Integer, String, Date, ForeignKey, DateTime, Boolean, Float, Index, JSON, Text, UniqueConstraint
+from datetime import timedelta
 from sqlalchemy.sql import func
 from APP.database import Base
+from APP.tenancy import TenantMixin
 
 
-class Expense(Base):
+# 註：資料表結構的變更要同時新增一版 migration (APP/migrations)，這裡只是程式端的對照
+# 所有資料表都帶 user_id (TenantMixin)，索引一律以 user_id 開頭 (每個人只查得到自己的資料)
+
+# 帳務建立超過這段時間就鎖定，不能再刪除 (歷史帳務不會再變動)
+EXPENSE_LOCK = timedelta(hours=12)
+
+
+class Expense(TenantMixin, Base):
     __tablename__ = "expenses"
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "date"),
+        Index("ix_expenses_user_type_date", "user_id", "record_type", "date"),
+        Index("ix_expenses_user_category_date", "user_id", "category", "date"),
+    )
 
+    # PostgreSQL 上依年份分區，資料庫的主鍵是 (id, date)；id 本身仍然不會重複，程式照樣用 id 查
     id = Column(Integer, primary_key=True, index=True)
     amount = Column(Integer, nullable=False)
     category = Column(String, nullable=False)
@@ -18,8 +33,11 @@ class Expense(Base):
     created_at = Column(DateTime, default=func.now())
 
 
-class Stock(Base):
+class Stock(TenantMixin, Base):
     __tablename__ = "stocks"
+    __table_args__ = (
+        Index("ix_stocks_user_symbol_cost", "user_id", "symbol", "average_cost"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     symbol = Column(String, nullable=False)    # 股票代號
@@ -27,25 +45,141 @@ class Stock(Base):
     average_cost = Column(Float, nullable=False) # 平均成本
     created_at = Column(DateTime, default=func.now())
 
-class Budget(Base):
+class Budget(TenantMixin, Base):
     __tablename__ = "budget"
+    __table_args__ = (
+        Index("ix_budget_user_effective_from", "user_id", "effective_from"),
+    )
 
+    # 預算歷史：每次設定都新增一筆，舊的保留下來給歷史月份結算用
     id = Column(Integer, primary_key=True, index=True)
     monthly_limit = Column(Integer, nullable=False) # 每月預算上限
     updated_at = Column(DateTime, default=func.now()) # 上次設定的時間
+    effective_from = Column(Date, nullable=False) # 從哪一天開始生效
 
-class Achievement(Base):
+class Achievement(TenantMixin, Base):
     __tablename__ = "achievements"
+    __table_args__ = (
+        # 成就 upsert 靠 (user_id, code) 判斷衝突
+        UniqueConstraint("user_id", "code", name="uq_achievements_user_code"),
+        UniqueConstraint("user_id", "name", name="uq_achievements_user_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, unique=True) # 成就名稱 (ex: 🔰 起手式)
+    name = Column(String) # 成就名稱 (ex: 🔰 起手式)
     description = Column(String)       # 描述 (ex: 第一次記帳)
     tier = Column(Integer)             # 等級 (1:見習, 2:黑帶, 3:師父, 4:宗師)
     icon = Column(String)              # 圖示 (ex: 🔰)
     
     # 判斷代碼 (用來讓程式知道這是哪個成就)
-    code = Column(String, unique=True) # ex: "first_expense", "save_1000"
+    code = Column(String) # ex: "first_expense", "save_1000"
     
     # 狀態
     is_unlocked = Column(Boolean, default=False)
-    unlocked_at = Column(DateTime, nullable=True)
\ No newline at end of file
+    unlocked_at = Column(DateTime, nullable=True)
+
+class MonthlyTotal(TenantMixin, Base):
+    __tablename__ = "monthly_totals"
+
+    # 每人 x 每月 x 收支類型 的彙總，寫入時同步更新 (成就結算不必再掃整張 expenses)
+    user_id = Column(Integer, primary_key=True)
+    month = Column(String, primary_key=True)        # "2026-01"
+    record_type = Column(String, primary_key=True)  # 'expense' / 'income'
+    total = Column(Integer, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+class AchievementState(TenantMixin, Base):
+    __tablename__ = "achievement_state"
+
+    # 成就計算的累計狀態 (每個使用者一筆)
+    user_id = Column(Integer, primary_key=True)
+    record_count = Column(Integer, default=0, nullable=False)  # 總記帳筆數 (收入+支出)
+    settled_month = Column(String, nullable=True)              # 最後一個已結算的月份
+
+    # 以下只包含「已結算」月份
+    total_savings = Column(Integer, default=0, nullable=False)
+    streak_over = Column(Integer, default=0, nullable=False)      # 目前連續超標月數
+    streak_under = Column(Integer, default=0, nullable=False)     # 目前連續達標月數
+    max_streak_over = Column(Integer, default=0, nullable=False)
+    max_streak_under = Column(Integer, default=0, nullable=False)
+    failed_months = Column(Integer, default=0, nullable=False)
+    succeeded_months = Column(Integer, default=0, nullable=False)
+    super_save_months = Column(Integer, default=0, nullable=False)  # 省下的錢 > 花掉的錢
+
+class MonthlySettlement(TenantMixin, Base):
+    __tablename__ = "monthly_settlements"
+
+    # 月結算紀錄：每月 1 日把上個月凍結下來，之後不再更動
+    user_id = Column(Integer, primary_key=True)
+    month = Column(String, primary_key=True)          # "2026-01"
+    total_expense = Column(Integer, nullable=False)
+    total_income = Column(Integer, nullable=False)
+    expense_count = Column(Integer, nullable=False)   # 0 代表當月沒有支出紀錄 (不列入成就判定)
+    budget = Column(Integer, nullable=False)          # 結算當時適用的預算
+    savings = Column(Integer, nullable=False)         # budget - total_expense
+    settled_at = Column(DateTime, default=func.now())
+
+class DailyTotal(TenantMixin, Base):
+    __tablename__ = "daily_totals"
+
+    # 每人 x 每日 x 收支類型 的彙總 (預算進度、趨勢圖用)，跟 monthly_totals 一起在寫入時更新
+    user_id = Column(Integer, primary_key=True)
+    date = Column(Date, primary_key=True)
+    record_type = Column(String, primary_key=True)
+    total = Column(Integer, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+class Job(TenantMixin, Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # 同一個冪等鍵只會排入一次
+        UniqueConstraint("user_id", "idempotency_key", name="uq_jobs_user_idempotency_key"),
+        # worker 找下一個該跑的工作
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    # 寫入後的衍生工作 (彙總、成就、自動記帳)，由背景 worker 處理 (見 APP/job_queue.py)
+    id = Column(Integer, primary_key=True)
+    kind = Column(String, nullable=False)               # 工作種類 (對應 job_queue.HANDLERS)
+    payload = Column(JSON, nullable=False)
+    idempotency_key = Column(String, nullable=False)
+    status = Column(String, default="pending", nullable=False)  # pending / running / done / failed
+    attempts = Column(Integer, default=0, nullable=False)
+    run_after = Column(DateTime, nullable=False)        # 失敗重試時延後到這個時間
+    locked_at = Column(DateTime, nullable=True)         # 被 worker 領走的時間
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    finished_at = Column(DateTime, nullable=True)
+
+class SealedTotal(TenantMixin, Base):
+    __tablename__ = "sealed_totals"
+
+    # 已過鎖定期限的日 / 月，依收支類型與分類的合計 (見 APP/services/seal_service.py)
+    # 封存後只會被「補登到這段期間的帳」以增量調整，不再從明細重算
+    user_id = Column(Integer, primary_key=True)
+    period = Column(String, primary_key=True)       # day / month
+    start = Column(Date, primary_key=True)          # 該日 / 該月 1 日
+    record_type = Column(String, primary_key=True)
+    category = Column(String, primary_key=True)
+    total = Column(Integer, default=0, nullable=False)
+    count = Column(Integer, default=0, nullable=False)
+
+class SealState(TenantMixin, Base):
+    __tablename__ = "seal_states"
+
+    # 每人封存到哪一天 (含)；寫入端以這一列當鎖，跟封存互相排隊
+    user_id = Column(Integer, primary_key=True)
+    sealed_through = Column(Date, nullable=True)
+    sealed_at = Column(DateTime, nullable=True)
+
+class ExpenseArchive(Base):
+    __tablename__ = "expense_archives"
+
+    # 已經搬到 Parquet 檔的帳務 (所有使用者一起、一年一段，見 APP/services/archive_service.py)
+    # 封存後又補登進同一年的帳，下次封存會再多一段
+    id = Column(Integer, primary_key=True)
+    year = Column(Integer, nullable=False, index=True)
+    path = Column(String, nullable=False)            # 檔案位置 (相對於 ARCHIVE_DIR)
+    rows = Column(Integer, nullable=False)
+    total_amount = Column(Integer, nullable=False)   # 封存時的金額總和 (核對用)
+    archived_at = Column(DateTime, nullable=False)
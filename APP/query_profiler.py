@@ -0,0 +1,142 @@
+"""
+SQL 查詢分析 (除錯模式，QUERY_PROFILE=1 才開)。
+
+每個請求記下執行過的每一句 SQL、花費時間、是從專案裡哪一行發出的，然後標出：
+- 重複查詢：同一句 SQL 在一個請求裡跑了 QUERY_REPEAT_THRESHOLD 次以上 (典型的 N+1)
+- 慢查詢：單句超過 SLOW_QUERY_MS 毫秒
+結果放在回應的 X-Query-Profile header，並寫一行 JSON log (logger: APP.query_profiler)。
+"""
+import json
+import logging
+import os
+import sys
+import time
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import NamedTuple
+from greenlet import getcurrent
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+QUERY_PROFILE = os.getenv("QUERY_PROFILE", "0") == "1"
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+REPEAT_THRESHOLD = int(os.getenv("QUERY_REPEAT_THRESHOLD", "5"))
+
+_APP_DIR = os.path.dirname(os.path.abspath(__file__))
+# 這些是基礎設施，不算「發出查詢的地方」
+_SKIP_FILES = {os.path.abspath(__file__), os.path.join(_APP_DIR, "metrics.py"), os.path.join(_APP_DIR, "tenancy.py")}
+
+_current = ContextVar("query_profile", default=None)
+
+
+class QueryRecord(NamedTuple):
+    statement: str
+    duration_ms: float
+    call_site: str
+
+
+def _frames():
+    frame = sys._getframe()
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+    # async 引擎的 SQL 是在另一個 greenlet 裡跑的，呼叫端 (router / service) 的 frame 在上一層 greenlet
+    parent = getcurrent().parent
+    frame = parent.gr_frame if parent is not None else None
+    while frame is not None:
+        yield frame
+        frame = frame.f_back
+
+def _call_site() -> str:
+    for frame in _frames():
+        filename = os.path.abspath(frame.f_code.co_filename)
+        if filename.startswith(_APP_DIR) and filename not in _SKIP_FILES:
+            return f"{os.path.relpath(filename, os.path.dirname(_APP_DIR))}:{frame.f_lineno} ({frame.f_code.co_name})"
+    return "?"
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("profile_start", []).append((time.perf_counter(), _call_site()))
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    records = _current.get()
+    if records is None or not conn.info.get("profile_start"):
+        return
+    start, call_site = conn.info["profile_start"].pop()
+    records.append(QueryRecord(statement, (time.perf_counter() - start) * 1000, call_site))
+
+def _on_error(context):
+    starts = context.connection.info.get("profile_start") if context.connection is not None else None
+    if starts:
+        starts.pop()
+
+def summarize(records: list[QueryRecord]) -> dict:
+    by_statement = defaultdict(list)
+    for r in records:
+        by_statement[r.statement].append(r)
+
+    repeated = [
+        {
+            "statement": statement[:200],
+            "count": len(rs),
+            "total_ms": round(sum(r.duration_ms for r in rs), 2),
+            "call_sites": sorted({r.call_site for r in rs}),
+        }
+        for statement, rs in by_statement.items() if len(rs) >= REPEAT_THRESHOLD
+    ]
+    slow = [
+        {"statement": r.statement[:200], "ms": round(r.duration_ms, 2), "call_site": r.call_site}
+        for r in records if r.duration_ms >= SLOW_QUERY_MS
+    ]
+    return {
+        "queries": len(records),
+        "db_ms": round(sum(r.duration_ms for r in records), 2),
+        "repeated": sorted(repeated, key=lambda x: -x["count"]),
+        "slow": slow,
+        "statements": [{"ms": round(r.duration_ms, 2), "call_site": r.call_site, "statement": r.statement[:200]} for r in records],
+    }
+
+
+class QueryProfilerMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        records = []
+        token = _current.set(records)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                summary = summarize(records)
+                header = (
+                    f"queries={summary['queries']}; db_ms={summary['db_ms']}; "
+                    f"repeated={len(summary['repeated'])}; slow={len(summary['slow'])}"
+                )
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(b"x-query-profile", header.encode())]
+
+                level = logging.WARNING if summary["repeated"] or summary["slow"] else logging.INFO
+                logger.log(level, json.dumps(
+                    {"method": scope["method"], "path": scope["path"], **summary}, ensure_ascii=False
+                ))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            _current.reset(token)
+
+
+def install(app):
+    """除錯模式才掛上 (關閉時完全沒有成本)"""
+    if not QUERY_PROFILE:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Engine, "handle_error", _on_error)
+    app.add_middleware(QueryProfilerMiddleware)
@@ -0,0 +1,22 @@
+"""
+大型清單的快速回應。
+
+一般的 API 回傳 ORM 物件，FastAPI 會依 response_model 逐筆重新驗證、再用標準 json 轉成文字。
+清單很長時 (上萬筆帳) 這兩步會吃掉大部分的 CPU。
+這裡的做法：查詢只取回應需要的欄位，直接用 orjson 一次轉成 bytes (原生支援 date / datetime)，
+不再經過 Pydantic。資料是自己資料庫查出來的，欄位與型別由查詢保證，不需要再驗證。
+
+注意：欄位要跟 router 上標註的 response_model 一致 (它仍然負責 API 文件)。
+壓縮交給 main.py 的 GZipMiddleware (依 Accept-Encoding 協商，太小的回應不壓)。
+"""
+import orjson
+from fastapi import Response
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        # content 是 dict / list 組成的純資料 (例如 [dict(r) for r in result.mappings()])
+        return orjson.dumps(content)
+
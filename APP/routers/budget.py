@@ -1,9 +1,10 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
-from APP.database import get_db
-from APP import models
-from APP.schemas.budget import BudgetCreate, BudgetResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from datetime import date, datetime, timedelta
+from APP.database import get_db, get_primary_read_db, get_read_db
+from APP import cache_bus, models
+from APP.services import budget_service, pace_service
+from APP.schemas.budget import BudgetCreate, BudgetResponse, BudgetPace
 
 router = APIRouter(
     prefix="/budget",
@@ -14,9 +15,9 @@ router = APIRouter(
 LOCK_PERIOD_DAYS = 90
 
 @router.get("/", response_model=BudgetResponse)
-def get_budget(db: Session = Depends(get_db)):
-    # 預設只有一筆預算設定 (單人使用)
-    budget = db.query(models.Budget).first()
+async def get_budget(db: AsyncSession = Depends(get_read_db)):
+    # 取目前生效中的版本 (歷史版本保留給月結算用)
+    budget = await budget_service.current_budget(db)
     
     if not budget:
         # 如果還沒設定過，回傳預設值 (0)，並且說是可設定的
@@ -41,31 +42,35 @@ def get_budget(db: Session = Depends(get_db)):
         next_update_date=next_date
     )
 
-@router.post("/", response_model=BudgetResponse)
-def set_budget(data: BudgetCreate, db: Session = Depends(get_db)):
-    budget = db.query(models.Budget).first()
+# 本月預算進度與月底預估 (從日/月彙總計算，結果快取到下一次記帳為止)
+# 結果會被快取，所以讀主資料庫，避免把副本延遲的舊資料快取起來 (純查詢，不拿寫入鎖)
+@router.get("/pace", response_model=BudgetPace)
+async def get_budget_pace(db: AsyncSession = Depends(get_primary_read_db)):
+    return await pace_service.get_pace(db)
 
-    # 1. 如果是第一次設定 -> 直接建立
-    if not budget:
-        new_budget = models.Budget(monthly_limit=data.amount, updated_at=datetime.now())
-        db.add(new_budget)
-        db.commit()
-        db.refresh(new_budget)
-        return get_budget(db) # 重用上面的邏輯回傳
+@router.post("/", response_model=BudgetResponse)
+async def set_budget(data: BudgetCreate, db: AsyncSession = Depends(get_db)):
+    budget = await budget_service.current_budget(db)
 
-    # 2. 如果已經有設定 -> 檢查是否鎖定中
-    time_passed = datetime.now() - budget.updated_at
-    if time_passed < timedelta(days=LOCK_PERIOD_DAYS):
-        # 計算還剩幾天
-        days_left = LOCK_PERIOD_DAYS - time_passed.days
-        raise HTTPException(
-            status_code=400, 
-            detail=f"🔒 預算修煉進行中！為了養成習慣，請堅持原本的設定。還有 {days_left} 天才能更改。"
-        )
+    # 1. 如果已經有設定 -> 檢查是否鎖定中
+    if budget:
+        time_passed = datetime.now() - budget.updated_at
+        if time_passed < timedelta(days=LOCK_PERIOD_DAYS):
+            # 計算還剩幾天
+            days_left = LOCK_PERIOD_DAYS - time_passed.days
+            raise HTTPException(
+                status_code=400, 
+                detail=f"🔒 預算修煉進行中！為了養成習慣，請堅持原本的設定。還有 {days_left} 天才能更改。"
+            )
 
-    # 3. 解鎖了 -> 更新預算與時間
-    budget.monthly_limit = data.amount
-    budget.updated_at = datetime.now() # 重置鎖定時間
-    db.commit()
+    # 2. 第一次設定或已解鎖 -> 新增一個版本 (不覆蓋舊的，已結算的月份才對得上當時的預算)
+    new_budget = models.Budget(
+        monthly_limit=data.amount,
+        updated_at=datetime.now(), # 重置鎖定時間
+        effective_from=date.today()
+    )
+    db.add(new_budget)
+    await cache_bus.publish(db, budget_service.CACHE_TOPIC)  # 預算變了，各程序的進度都要重算 (commit 後生效)
+    await db.commit()
     
-    return get_budget(db)
\ No newline at end of file
+    return await get_budget(db)
\ No newline at end of file
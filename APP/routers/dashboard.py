@@ -9,7 +9,7 @@ router = APIRouter(
 )
 
 @router.get("/", response_model=DashboardResponse)
-def get_dashboard():
+async def get_dashboard():
     # 呼叫 Service 取得資料
     data = dashboard_service.get_dashboard_data()
     return data
\ No newline at end of file
@@ -1,10 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import func, extract
-from sqlalchemy.orm import Session
-from APP.database import get_db
-from APP import models
-from APP.schemas.expense import ExpenseCreate, ExpenseResponse, AnnualSummary
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP.database import get_db, get_read_db, with_read_session
+from APP import job_queue, models, singleflight
+from APP.responses import FastJSONResponse
+from APP.services import achievement_service, seal_service, series_service
+from APP.tenancy import get_user_id
+from APP.schemas.expense import ExpenseCreate, ExpenseResponse, AnnualSummary, ExpenseSeries, ExpenseBreakdown
+from typing import List, Literal
 from datetime import date, datetime, timedelta
 
 router = APIRouter(
@@ -12,9 +15,11 @@ router = APIRouter(
     tags=["Expenses (記帳功能)"]
 )
 
+SERIES_MAX_DAYS = 366 * 100
+
 # 新增一筆支出
 @router.post("/", response_model=ExpenseResponse)
-def create_expense(expense_data: ExpenseCreate, db: Session = Depends(get_db)):
+async def create_expense(expense_data: ExpenseCreate, db: AsyncSession = Depends(get_db)):
     # 1. 把 Pydantic 資料轉換成 SQLAlchemy 模型
     new_expense = models.Expense(
         amount=expense_data.amount,
@@ -23,27 +28,71 @@ def create_expense(expense_data: ExpenseCreate, db: Session = Depends(get_db)):
         date=expense_data.date
     )
     
-    # 2. 加入資料庫並存檔
+    # 2. 加入資料庫；月彙總與成就排進背景工作 (跟這筆帳一起 commit，存檔後馬上回應)
+    await achievement_service.get_state(db)  # 第一次記帳時先建立成就狀態 (之後背景只需要做增量)
     db.add(new_expense)
-    db.commit()
-    
-    # 3. 重新整理 (拿回自動產生的 ID)
-    db.refresh(new_expense)
+    await db.flush()  # 取得 ID、套用欄位預設值 (record_type)
+    await seal_service.apply_record(db, new_expense)  # 補登到已封存的日子：封存合計要跟著改 (同一個 transaction)
+    # 不用 id 當冪等鍵：SQLite 刪掉最新一筆後 id 會被重複使用，同一個 key 的新工作會被當成重複丟掉
+    # (工作跟這筆帳在同一個 transaction 排入，本來就不會重複排)
+    await job_queue.enqueue(db, "record_change", achievement_service.record_change_payload(new_expense))
+    await db.commit()
     
+    # 3. ID 在 flush 時就拿回來了，commit 後物件也不會過期，不需要再 refresh 多查一次
     return new_expense
 
-# 取得所有支出
+async def list_expenses(skip: int = 0, limit: int = 100, *, db: AsyncSession) -> list[dict]:
+    # 只取 ExpenseResponse 要的欄位，不建 ORM 物件
+    E = models.Expense
+    rows = (await db.execute(
+        select(E.id, E.amount, E.category, E.description, E.date, E.record_type).offset(skip).limit(limit)
+    )).mappings()
+    return [dict(r) for r in rows]
+
+# 取得所有支出 (查出來直接轉成 JSON，不再逐筆驗證，見 APP/responses.py)
 @router.get("/", response_model=List[ExpenseResponse])
-def read_expenses(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
-    #這行翻譯成 SQL 就是: SELECT * FROM expenses LIMIT 100 OFFSET 0;
-    expenses = db.query(models.Expense).offset(skip).limit(limit).all()
-    return expenses
+async def read_expenses(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_read_db)):
+    return FastJSONResponse(await list_expenses(skip, limit, db=db))
+
+# 收支趨勢 (補齊沒有紀錄的區間，點數太多時降採樣)
+# 注意要寫在 /{expense_id} 之類的路徑之前
+@router.get("/series", response_model=ExpenseSeries)
+async def get_series(
+    start: date | None = Query(None, alias="from", description="起始日 (預設為結束日的一年前)"),
+    end: date | None = Query(None, alias="to", description="結束日 (預設今天)"),
+    bucket: Literal["day", "week", "month"] = "month",
+    type: Literal["expense", "income"] | None = Query(None, description="只要收入或支出 (預設兩者都要)"),
+    points: int = Query(500, ge=3, le=5000, description="每條序列最多幾點"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    end = end or date.today()
+    start = start or end - timedelta(days=365)
+    if start > end:
+        raise HTTPException(status_code=400, detail="起始日不能晚於結束日")
+    if (end - start).days > SERIES_MAX_DAYS:
+        raise HTTPException(status_code=400, detail="查詢區間最多 100 年")
+
+    record_types = (type,) if type else series_service.RECORD_TYPES
+    return await series_service.get_series(db, start, end, bucket, record_types, points)
+
+# 各收支類型 x 分類的合計 (圓餅圖、排行榜用)；已過鎖定期限的日子讀封存彙總，見 APP/services/seal_service.py
+@router.get("/breakdown", response_model=ExpenseBreakdown)
+async def get_breakdown(
+    start: date | None = Query(None, alias="from", description="起始日 (預設本月 1 日)"),
+    end: date | None = Query(None, alias="to", description="結束日 (預設今天)"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    end = end or date.today()
+    start = start or end.replace(day=1)
+    if start > end:
+        raise HTTPException(status_code=400, detail="起始日不能晚於結束日")
+    return await seal_service.period_totals(db, start, end)
 
 # 刪除支出
 @router.delete("/{expense_id}", status_code=204)
-def delete_expense(expense_id: int, db: Session = Depends(get_db)):
+async def delete_expense(expense_id: int, db: AsyncSession = Depends(get_db)):
     # 1. 尋找該筆紀錄
-    expense = db.query(models.Expense).filter(models.Expense.id == expense_id).first()
+    expense = await db.get(models.Expense, expense_id)
     
     # 2. 如果找不到，回傳 404
     if not expense:
@@ -55,7 +104,7 @@ def delete_expense(expense_id: int, db: Session = Depends(get_db)):
         time_diff = datetime.now() - expense.created_at
         
         # 設定時限：12 小時
-        limit = timedelta(hours=12)
+        limit = models.EXPENSE_LOCK
         
         # 測試功能 : 10 秒
         #limit = timedelta(seconds=10)
@@ -67,45 +116,49 @@ def delete_expense(expense_id: int, db: Session = Depends(get_db)):
                 detail=f"🔒 此紀錄已超過 12 小時，無法刪除 (歷史帳務已鎖定)"
             )
 
-    # 4. 通過檢查，執行刪除
-    db.delete(expense)
-    db.commit()
+    # 4. 通過檢查，執行刪除 (月彙總交給背景工作扣回來)
+    await achievement_service.get_state(db)
+    await db.delete(expense)
+    await seal_service.apply_record(db, expense, sign=-1)
+    await job_queue.enqueue(db, "record_change", achievement_service.record_change_payload(expense, sign=-1))
+    await db.commit()
     
     return None
 
 # --- 年度損益分析 (只抓近 3 年) ---
 @router.get("/annual_summary", response_model=List[AnnualSummary])
-def get_annual_summary(db: Session = Depends(get_db)):
+async def get_annual_summary(user_id: int = Depends(get_user_id)):
+    # 同一使用者同時間只算一次 (/overview/ 也共用，見 APP/singleflight.py)
+    return await singleflight.run(("annual_summary", user_id), with_read_session, user_id, compute_annual_summary)
+
+async def compute_annual_summary(db: AsyncSession) -> List[AnnualSummary]:
     # 1. 計算年份範圍 (今年, 去年, 前年)
     current_year = date.today().year
     start_year = current_year - 2
     
-    # 2. 利用 SQL 聚合查詢：按年份與類型加總
-    # SELECT year, record_type, SUM(amount) ...
-    results = db.query(
-        extract('year', models.Expense.date).label('year'),
-        models.Expense.record_type,
-        func.sum(models.Expense.amount).label('total')
+    # 2. 從月彙總表加總 (最多 36 個月 x 2 種類型，不必掃整張 expenses)
+    # 月份是 "YYYY-MM" 字串，直接比字串就好，不用 extract 之類各資料庫寫法不同的日期函式
+    results = (await db.execute(select(
+        models.MonthlyTotal.month,
+        models.MonthlyTotal.record_type,
+        models.MonthlyTotal.total
     ).filter(
-        extract('year', models.Expense.date) >= start_year
-    ).group_by(
-        'year', models.Expense.record_type
-    ).all()
+        models.MonthlyTotal.month >= f"{start_year}-01",
+        models.MonthlyTotal.count > 0  # 帳都被刪光的月份不算
+    ))).all()
     
     # 3. 整理數據結構
     # 格式轉變: {2024: {'income': 100, 'expense': 50}, 2025: ...}
     data_map = {}
     for r in results:
-        y = int(r.year)
+        y = int(r.month[:4])
         if y not in data_map:
             data_map[y] = {"income": 0, "expense": 0}
         
         # r.record_type 可能是 'income' 或 'expense'
-        # r.total 是總金額
-        if r.record_type == "income":
-            data_map[y]["income"] = r.total
-        elif r.record_type == "expense":
-            data_map[y]["expense"] = r.total
+        # r.total 是該月總金額
+        if r.record_type in ("income", "expense"):
+            data_map[y][r.record_type] += r.total
 
     # 4. 計算損益與成長率
     summary_list = []
@@ -0,0 +1,50 @@
+import os
+import time
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+from APP import job_queue, metrics, singleflight
+from APP.services import lot_service
+from APP.database import pool_status
+
+router = APIRouter(tags=["System (系統狀態)"])
+
+POOL_GAUGES = {
+    "checked_out": "使用中的連線數",
+    "idle": "池中閒置的連線數",
+    "checkouts": "累計取出連線次數",
+    "wait_seconds": "累計等待連線的秒數",
+}
+
+# 要查資料庫的指標 (佇列長度、庫存破碎程度) 隔多久才重算一次：
+# 成本跟資料量成正比，不能每次抓取都掃一遍；中間的抓取直接讀上次的結果
+DB_GAUGE_TTL = float(os.getenv("METRICS_DB_TTL", "60"))
+_db_gauges = {"expires": 0.0, "extra": []}
+
+
+async def _collect_db_gauges() -> list:
+    depth = await job_queue.queue_depth()
+    lots = await lot_service.fragmentation()
+    return [
+        ("job_queue_depth", "背景工作佇列中的工作數", ("status",), {(k,): v for k, v in depth.items()}),
+        ("stock_positions", "持股部位數 (使用者 x 代號)", (), {(): lots["positions"]}),
+        ("stock_lots", "庫存批次總數 (除以部位數 = 平均每個代號幾筆)", (), {(): lots["lots"]}),
+        ("stock_lots_per_symbol_max", "單一部位最多的批次數", (), {(): lots["max_lots"]}),
+    ]
+
+async def db_gauges() -> list:
+    if time.monotonic() >= _db_gauges["expires"]:
+        # 好幾個 Prometheus 同時抓也只算一次
+        extra = await singleflight.run(("metrics_db_gauges",), _collect_db_gauges)
+        _db_gauges.update(extra=extra, expires=time.monotonic() + DB_GAUGE_TTL)
+    return _db_gauges["extra"]
+
+# Prometheus 抓取用 (text format 0.0.4)
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    pools = pool_status()
+    extra = [
+        (f"db_pool_{key}", doc, ("pool",), {(name,): stats[key] for name, stats in pools.items()})
+        for key, doc in POOL_GAUGES.items()
+    ]
+    extra += await db_gauges()
+    return PlainTextResponse(metrics.render(extra), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,37 @@
+import asyncio
+from fastapi import APIRouter, Depends
+from APP import singleflight
+from APP.database import with_read_session
+from APP.routers import budget, expense, stock
+from APP.schemas.overview import OverviewResponse
+from APP.tenancy import get_user_id
+
+router = APIRouter(
+    prefix="/overview",
+    tags=["Overview (資產總覽)"]
+)
+
+# 四個區塊彼此獨立，用 asyncio.gather 同時計算
+# (股票要去 Yahoo 抓價，最慢，其他查詢可以趁它等待時一起跑完)
+# 同一個 AsyncSession 不能同時跑多個查詢，每個任務各自開一個 (純查詢，走唯讀連線)
+
+async def _build_overview(user_id: int, skip: int, limit: int) -> OverviewResponse:
+    budget_data, expenses, stocks, annual = await asyncio.gather(
+        with_read_session(user_id, budget.get_budget),
+        with_read_session(user_id, expense.list_expenses, skip, limit),
+        # 這兩塊跟 /stocks/、/expenses/annual_summary 正在算的結果共用
+        stock.shared_stocks(user_id),
+        expense.get_annual_summary(user_id),
+    )
+
+    return OverviewResponse(
+        budget=budget_data,
+        expenses=expenses,
+        stocks=stocks,
+        annual_summary=annual
+    )
+
+@router.get("/", response_model=OverviewResponse)
+async def get_overview(skip: int = 0, limit: int = 100, user_id: int = Depends(get_user_id)):
+    # 多個分頁同時打開總覽時只算一次 (見 APP/singleflight.py)
+    return await singleflight.run(("overview", user_id, skip, limit), _build_overview, user_id, skip, limit)
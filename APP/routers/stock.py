@@ -1,12 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List
-import yfinance as yf  # <--- 引入抓股價神器
-from APP.database import get_db
-from APP import models
-from APP.schemas.stock import StockCreate, StockResponse, StockSell, StockSellResponse, StockSellSmart
-from sqlalchemy import func
-from datetime import date
+from APP.database import get_db, with_read_session
+from APP import job_queue, models, singleflight
+from APP.responses import FastJSONResponse
+from APP.services import journal_service, lot_service, quote_service
+from APP.tenancy import get_user_id
+from APP.schemas.stock import StockCreate, StockResponse, StockSell, StockSellResponse, StockSellSmart, LotCompactionResponse
 
 router = APIRouter(
     prefix="/stocks",
@@ -15,48 +16,34 @@ router = APIRouter(
 
 # 1. 買入股票 (維持不變)
 @router.post("/", response_model=StockResponse)
-def create_stock(stock_data: StockCreate, db: Session = Depends(get_db)):
+async def create_stock(stock_data: StockCreate, db: AsyncSession = Depends(get_db)):
     new_stock = models.Stock(
         symbol=stock_data.symbol,
         shares=stock_data.shares,
         average_cost=stock_data.price
     )
     db.add(new_stock)
-    db.commit()
-    db.refresh(new_stock)
+    await db.commit()  # 回傳的欄位都已經在物件上 (ID 在 flush 時取得)，不必再 refresh
     return new_stock
 
-# 2. 查詢庫存 (大幅升級！自動算損益)
-@router.get("/", response_model=List[StockResponse])
-def read_stocks(db: Session = Depends(get_db)):
-    stocks = db.query(models.Stock).all()
+# 庫存加上即時報價試算 (資產總覽也共用)
+async def list_stocks(db: AsyncSession) -> list[dict]:
+    S = models.Stock
+    stocks = (await db.execute(select(S.id, S.symbol, S.shares, S.average_cost))).all()
     
     # 如果沒有股票，直接回傳空清單
     if not stocks:
         return []
 
     # --- 自動抓股價邏輯 ---
+    # 同一代號只查一次，所有代號同時去 Yahoo 抓 (不佔用執行緒，等待時可以服務其他請求)
+    quotes = await quote_service.get_quotes(s.symbol for s in stocks)
+
     results = []
     for stock in stocks:
-        # 處理台股代號：如果是數字結尾 (如 2330)，要加上 ".TW" 才能讓 Yahoo 讀懂
-        ticker = stock.symbol
-        if ticker.isdigit(): 
-            ticker = f"{ticker}.TW"
-            
-        try:
-            # 去 Yahoo 抓最新價格
-            # period="1d" 代表抓一天的資料
-            data = yf.Ticker(ticker)
-            history = data.history(period="1d")
-            
-            if not history.empty:
-                # 拿到最新一筆收盤價
-                current_price = history['Close'].iloc[-1]
-            else:
-                current_price = stock.average_cost # 抓不到就先用成本價代替
-                
-        except Exception:
-            current_price = stock.average_cost # 網路錯誤也先用成本價
+        current_price = quotes.get(stock.symbol)
+        if current_price is None:
+            current_price = stock.average_cost # 抓不到就先用成本價代替
 
         # 開始計算
         market_value = current_price * stock.shares     # 市值
@@ -65,24 +52,33 @@ def read_stocks(db: Session = Depends(get_db)):
 
         # 整理資料回傳
         # 這裡我們不存入資料庫，只是「算」給前端看
-        stock_data = StockResponse(
-            id=stock.id,
-            symbol=stock.symbol,
-            shares=stock.shares,
-            average_cost=stock.average_cost,
-            current_price=round(current_price, 2),
-            market_value=round(market_value, 0),
-            profit=round(profit, 0)
-        )
-        results.append(stock_data)
+        results.append({
+            "id": stock.id,
+            "symbol": stock.symbol,
+            "shares": stock.shares,
+            "average_cost": float(stock.average_cost),
+            "current_price": round(float(current_price), 2),
+            "market_value": round(float(market_value), 0),
+            "profit": round(float(profit), 0),
+        })
         
     return results
 
+# 2. 查詢庫存 (大幅升級！自動算損益)
+@router.get("/", response_model=List[StockResponse])
+async def read_stocks(user_id: int = Depends(get_user_id)):
+    # 欄位同 StockResponse，直接轉成 JSON 不再逐筆驗證 (見 APP/responses.py)
+    return FastJSONResponse(await shared_stocks(user_id))
+
+async def shared_stocks(user_id: int) -> list[dict]:
+    # 同一使用者同時間的庫存試算只做一次 (/stocks/ 與 /overview/ 共用，見 APP/singleflight.py)
+    return await singleflight.run(("stocks", user_id), with_read_session, user_id, list_stocks)
+
 # 3. 賣出股票 (維持不變)
 @router.post("/{stock_id}/sell", response_model=StockSellResponse)
-def sell_stock(stock_id: int, sell_data: StockSell, db: Session = Depends(get_db)):
+async def sell_stock(stock_id: int, sell_data: StockSell, db: AsyncSession = Depends(get_db)):
     # 1. 找股票
-    stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
+    stock = await db.get(models.Stock, stock_id)
     if not stock:
         raise HTTPException(status_code=404, detail="找不到這檔股票")
     
@@ -98,35 +94,16 @@ def sell_stock(stock_id: int, sell_data: StockSell, db: Session = Depends(get_db
     # 4. 處理庫存
     stock.shares -= sell_data.shares
     if stock.shares == 0:
-        db.delete(stock) # 賣光了就刪掉庫存紀錄
+        await db.delete(stock) # 賣光了就刪掉庫存紀錄
 
     # --- 5. 關鍵功能：自動寫入記帳本 (Auto-Journaling) ---
-    
-    # 判斷是賺錢還是賠錢
-    if profit_loss > 0:
-        # 賺錢 -> 記為「收入」
-        new_record = models.Expense(
-            amount=int(profit_loss),
-            category="投資獲利",
-            description=f"賣出 {stock.symbol} {sell_data.shares} 股 (獲利)",
-            date=date.today(),
-            record_type="income" # <--- 標記為收入
-        )
-        db.add(new_record)
-        
-    elif profit_loss <= 0:
-        # 賠錢 -> 記為「支出」 (虧損視為一種支出)
-        new_record = models.Expense(
-            amount=int(abs(profit_loss)), # 轉為正數存入
-            category="投資虧損",
-            description=f"賣出 {stock.symbol} {sell_data.shares} 股 (停損)",
-            date=date.today(),
-            record_type="expense" # <--- 標記為支出
-        )
-        db.add(new_record)
+    # 賺錢記為收入、賠錢記為支出 (見 journal_service)；排進背景工作，跟庫存變動一起 commit
+    await job_queue.enqueue(
+        db, "auto_journal", journal_service.auto_journal_payload(stock.symbol, sell_data.shares, profit_loss, "獲利")
+    )
 
     # 6. 全部存檔
-    db.commit()
+    await db.commit()
 
     return StockSellResponse(
         symbol=stock.symbol,
@@ -136,17 +113,18 @@ def sell_stock(stock_id: int, sell_data: StockSell, db: Session = Depends(get_db
 
 # --- 智慧賣出 API (優先賣出低成本庫存) ---
 @router.post("/sell/smart", response_model=StockSellResponse)
-def sell_stock_smart(sell_data: StockSellSmart, db: Session = Depends(get_db)):
+async def sell_stock_smart(sell_data: StockSellSmart, db: AsyncSession = Depends(get_db)):
     symbol = sell_data.symbol.upper()
     total_sell_shares = sell_data.shares
     sell_price = sell_data.price
     
     # 1. 撈出這檔股票的所有庫存，並依照「成本 (average_cost)」由低到高排序
     #    這樣我們就會先賣便宜的 -> 獲利最大化
-    inventory = db.query(models.Stock)\
-        .filter(models.Stock.symbol == symbol)\
-        .order_by(models.Stock.average_cost.asc())\
-        .all()
+    inventory = (await db.execute(
+        select(models.Stock)
+        .filter(models.Stock.symbol == symbol)
+        .order_by(models.Stock.average_cost.asc())
+    )).scalars().all()
     
     # 2. 檢查總庫存夠不夠賣
     current_total_shares = sum(s.shares for s in inventory)
@@ -177,32 +155,29 @@ def sell_stock_smart(sell_data: StockSellSmart, db: Session = Depends(get_db)):
         
         # 如果這筆庫存被掏空了，就刪除紀錄
         if stock.shares == 0:
-            db.delete(stock)
+            await db.delete(stock)
             
-    # 4. 自動記帳 (Income/Expense)
-    if total_profit_loss > 0:
-        new_record = models.Expense(
-            amount=int(total_profit_loss),
-            category="投資獲利",
-            description=f"賣出 {symbol} {total_sell_shares} 股 (低買高賣)",
-            date=date.today(),
-            record_type="income"
-        )
-        db.add(new_record)
-    elif total_profit_loss < 0:
-        new_record = models.Expense(
-            amount=int(abs(total_profit_loss)),
-            category="投資虧損",
-            description=f"賣出 {symbol} {total_sell_shares} 股 (停損)",
-            date=date.today(),
-            record_type="expense"
+    # 4. 自動記帳 (Income/Expense)，不賺不賠就不記；排進背景工作，跟庫存變動一起 commit
+    if total_profit_loss != 0:
+        await job_queue.enqueue(
+            db, "auto_journal", journal_service.auto_journal_payload(symbol, total_sell_shares, total_profit_loss, "低買高賣")
         )
-        db.add(new_record)
 
-    db.commit()
+    await db.commit()
 
     return StockSellResponse(
         symbol=symbol,
         sold_shares=total_sell_shares,
         realized_profit=round(total_profit_loss, 0)
-    )
\ No newline at end of file
+    )
+
+# --- 合併庫存批次 (同代號、同成本的零碎買入併成一筆，見 lot_service) ---
+@router.post("/compact", response_model=LotCompactionResponse)
+async def compact_lots(
+    symbol: str | None = None,
+    tolerance: float = Query(lot_service.LOT_COST_TOLERANCE, ge=0, le=0.1, description="成本相對誤差，0 = 只併成本完全相同的"),
+    db: AsyncSession = Depends(get_db)
+):
+    result = await lot_service.compact(db, symbol.upper() if symbol else None, tolerance)
+    await db.commit()
+    return result
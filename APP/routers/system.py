@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP.database import get_primary_read_db, pool_status
+from APP.job_queue import pending_count
+
+router = APIRouter(
+    prefix="/system",
+    tags=["System (系統狀態)"]
+)
+
+# 連線池使用狀況：checked_out 長期接近 size + overflow、wait_seconds 持續增加，就代表池不夠用
+@router.get("/pool")
+async def get_pool_status():
+    return pool_status()
+
+# 目前使用者還在排隊 / 處理中的背景工作 (彙總、成就)：寫入後輪詢到 0，衍生資料才是新的
+# 讀主資料庫 (副本可能還沒看到剛完成的工作)，純查詢，不拿寫入鎖
+@router.get("/jobs")
+async def get_pending_jobs(db: AsyncSession = Depends(get_primary_read_db)):
+    return {"pending": await pending_count(db)}
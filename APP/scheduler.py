@@ -0,0 +1,141 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import select, union
+from APP import job_queue, models
+from APP.database import PrimaryReadSessionLocal, SessionLocal
+from APP.services import archive_service, lot_service, rollup_service, seal_service, settlement_service
+
+logger = logging.getLogger(__name__)
+
+# 多個 worker 同時啟動時，可以只讓其中一個跑排程 (SCHEDULER_ENABLED=0 關閉)
+SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "1") != "0"
+# 每天自動合併庫存批次 (選用，預設關閉；隨時都可以用 POST /stocks/compact 手動合併)
+LOT_COMPACTION_ENABLED = os.getenv("LOT_COMPACTION_ENABLED", "0") == "1"
+
+
+def next_month_start(now: datetime) -> datetime:
+    # 下個月 1 日 00:00 (多留幾秒，避免時鐘誤差剛好落在月底)
+    if now.month == 12:
+        first = datetime(now.year + 1, 1, 1)
+    else:
+        first = datetime(now.year, now.month + 1, 1)
+    return first + timedelta(seconds=5)
+
+def next_day_start(now: datetime) -> datetime:
+    return datetime(now.year, now.month, now.day) + timedelta(days=1, seconds=5)
+
+def next_seal_time(now: datetime) -> datetime:
+    # 每天 00:00 + 鎖定期限 (12:00)：前一天剛好全部鎖定，可以封存
+    run = datetime(now.year, now.month, now.day) + models.EXPENSE_LOCK + timedelta(seconds=5)
+    return run if run > now else run + timedelta(days=1)
+
+async def _user_ids() -> list[int]:
+    # 有記過帳、或已經有成就狀態的使用者 (不綁使用者的 Session 才看得到所有人)
+    async with PrimaryReadSessionLocal() as db:
+        rows = await db.scalars(union(
+            select(models.Expense.user_id),
+            select(models.AchievementState.user_id)
+        ))
+        return sorted(rows)
+
+async def _month_close_for(user_id: int):
+    async with SessionLocal(info={"user_id": user_id}) as db:
+        try:
+            # 結算靠彙總表，先確認彙總表是完整的
+            await rollup_service.ensure_backfilled(db)
+            months = await settlement_service.settle_due_months(db)
+            if months:
+                logger.info("使用者 %s 月結算完成: %s", user_id, ", ".join(months))
+        except Exception:
+            logger.exception("使用者 %s 月結算失敗", user_id)
+            await db.rollback()
+
+async def run_month_close():
+    # 一次結算一個使用者 (每人各自一個 transaction，某人失敗不影響其他人)
+    for user_id in await _user_ids():
+        await _month_close_for(user_id)
+
+
+async def run_lot_compaction():
+    async with PrimaryReadSessionLocal() as db:
+        user_ids = (await db.scalars(select(models.Stock.user_id).distinct())).all()
+    for user_id in user_ids:
+        async with SessionLocal(info={"user_id": user_id}) as db:
+            try:
+                result = await lot_service.compact(db)
+                await db.commit()
+                if result["lots_after"] < result["lots_before"]:
+                    logger.info("使用者 %s 庫存批次合併: %s -> %s 筆", user_id, result["lots_before"], result["lots_after"])
+            except Exception:
+                logger.exception("使用者 %s 庫存批次合併失敗", user_id)
+                await db.rollback()
+
+
+class Scheduler:
+    """
+    很陽春的背景排程：啟動時先把每個工作跑一次 (補上停機期間錯過的結算)，
+    之後在 event loop 的背景 task 裡睡到下一次該執行的時間。
+    """
+
+    def __init__(self):
+        # (名稱, 工作函式 (async), 計算下次執行時間的函式)
+        self.jobs = []
+        self._task = None
+
+    def add_job(self, name, func, next_run):
+        self.jobs.append((name, func, next_run))
+
+    async def _run(self, name, func):
+        # 某個工作失敗 (例如資料庫暫時連不上) 只記錄下來，不能讓啟動失敗、也不能讓排程停擺
+        try:
+            await func()
+        except Exception:
+            logger.exception("排程工作 %s 執行失敗", name)
+
+    async def _loop(self, schedule):
+        while True:
+            name = min(schedule, key=schedule.get)
+            wait = (schedule[name] - datetime.now()).total_seconds()
+            # 最多睡一小時就醒來重新檢查一次 (電腦休眠、調整時鐘都不怕)
+            if wait > 0:
+                await asyncio.sleep(min(wait, 3600))
+            if datetime.now() < schedule[name]:
+                continue
+
+            _, func, next_run = next(job for job in self.jobs if job[0] == name)
+            await self._run(name, func)
+            schedule[name] = next_run(datetime.now())
+
+    async def start(self):
+        if self._task is not None or not self.jobs:
+            return
+
+        # 啟動時先補跑一次 (等它跑完)，確保開始接請求前狀態已經是最新的
+        schedule = {}
+        for name, func, next_run in self.jobs:
+            await self._run(name, func)
+            schedule[name] = next_run(datetime.now())
+
+        self._task = asyncio.create_task(self._loop(schedule), name="scheduler")
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+scheduler = Scheduler()
+scheduler.add_job("month_close", run_month_close, next_month_start)
+scheduler.add_job("purge_jobs", job_queue.purge_finished, next_day_start)
+scheduler.add_job("seal_totals", seal_service.seal_all, next_seal_time)
+# PostgreSQL 的年份分區提前建好 (SQLite 沒有分區，什麼都不做)
+scheduler.add_job("ensure_partitions", archive_service.ensure_partitions, next_day_start)
+if LOT_COMPACTION_ENABLED:
+    scheduler.add_job("compact_lots", run_lot_compaction, next_day_start)
@@ -12,4 +12,15 @@ class BudgetResponse(BaseModel):
     next_update_date: Optional[datetime] = None # 如果不能改，什麼時候解鎖？
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class BudgetPace(BaseModel):
+    month: str                  # 本月 (例如 "2026-01")
+    budget: int                 # 本月適用的預算
+    spent: int                  # 本月到今天為止的支出
+    allowance: float            # 依天數平均分配，到今天為止「應該」花多少
+    pace_pct: float | None      # spent / allowance (%)，超過 100 代表花太快
+    daily_rate: float           # 最近每日花費 (加權移動平均，越近權重越高)
+    projected_total: float      # 預估月底總支出
+    days_until_breach: int | None  # 照目前速度幾天後超標 (已超標為 0；沒在花錢為 None)
+    on_track: bool              # 預估月底是否守得住預算
@@ -1,5 +1,6 @@
 from pydantic import BaseModel
 from datetime import date
+from typing import List
 
 # 這是新增記帳時用的 (目前前端還沒做手動選收入，先預設 expense 或選填)
 class ExpenseCreate(BaseModel):
@@ -29,4 +30,29 @@ class AnnualSummary(BaseModel):
     growth_pct: float | None # 成長率 (第一年會是 None)
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+# --- 收支時間序列 (GET /expenses/series) ---
+class SeriesPoint(BaseModel):
+    start: date  # 區間的第一天 (週 = 週一、月 = 1 日)
+    total: int
+
+class ExpenseSeries(BaseModel):
+    bucket: str         # day / week / month
+    start: date
+    end: date
+    downsampled: bool   # 點數超過上限、有經過降採樣
+    series: dict[str, List[SeriesPoint]]  # 'expense' / 'income' -> 依時間排序的點
+
+# --- 分類合計 (GET /expenses/breakdown) ---
+class CategoryTotal(BaseModel):
+    record_type: str
+    category: str
+    total: int
+    count: int
+
+class ExpenseBreakdown(BaseModel):
+    start: date
+    end: date
+    sealed_through: date | None  # 這一天以前 (含) 讀的是封存彙總
+    items: List[CategoryTotal]   # 依類型、金額由大到小排序
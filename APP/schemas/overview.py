@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+from typing import List
+from APP.schemas.budget import BudgetResponse
+from APP.schemas.expense import ExpenseResponse, AnnualSummary
+from APP.schemas.stock import StockResponse
+
+# 資產總覽一次打包回傳 (前端只需要一趟請求)
+class OverviewResponse(BaseModel):
+    budget: BudgetResponse
+    expenses: List[ExpenseResponse]
+    stocks: List[StockResponse]
+    annual_summary: List[AnnualSummary]
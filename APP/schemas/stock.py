@@ -34,4 +34,10 @@ class StockSellSmart(BaseModel):
 class StockSellResponse(BaseModel):
     symbol: str
     sold_shares: int
-    realized_profit: float  # 實現損益
\ No newline at end of file
+    realized_profit: float  # 實現損益
+
+# --- 3. 批次合併 ---
+class LotCompactionResponse(BaseModel):
+    symbols: int      # 檢查了幾個代號
+    lots_before: int  # 合併前的批次數
+    lots_after: int   # 合併後的批次數
\ No newline at end of file
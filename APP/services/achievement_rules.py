@@ -0,0 +1,77 @@
+from graphlib import TopologicalSorter
+from typing import NamedTuple, Optional
+
+# 可用的指標 (對應 AchievementState 的欄位)，判定時會先整理成一個 {指標: 數值} 的字典
+METRICS = (
+    "record_count",       # 總記帳筆數 (即時)
+    "total_savings",      # 已結算月份累計節省金額
+    "failed_months",      # 超標的月數
+    "succeeded_months",   # 達標的月數
+    "max_streak_over",    # 最長連續超標月數
+    "max_streak_under",   # 最長連續達標月數
+    "super_save_months",  # 「省下的錢 > 花掉的錢」的月數
+)
+
+
+class AchievementRule(NamedTuple):
+    code: str
+    tier: int                 # 等級 (1:見習, 2:黑帶, 3:師父, 4:宗師)
+    icon: str
+    name: str
+    desc: str
+    metric: str               # 看哪個指標
+    threshold: int            # 指標 >= threshold 就達成
+    prerequisite: Optional[str] = None  # 前置成就代碼 (需先解鎖才能挑戰)
+
+
+# --- 成就規則表 ---
+# 新增成就只要在這裡加一行，不用再改判定程式
+ACHIEVEMENT_RULES = [
+    # Level 1
+    AchievementRule("first_expense", 1, "🔰", "起手式", "完成第 1 筆記帳", "record_count", 1),
+    AchievementRule("first_fail",    1, "🥴", "馬步未穩", "單月支出首次超過預算", "failed_months", 1),
+    AchievementRule("save_1",        1, "🧘", "聚氣凝神", "累計節省超過 $1 元", "total_savings", 1),
+
+    # Level 2 (需完成 Level 1 對應項目)
+    AchievementRule("first_success", 2, "🎯", "氣聚丹田", "單月支出首次低於預算", "succeeded_months", 1),
+    AchievementRule("save_300",      2, "🍱", "辟穀修練", "累計節省超過 $300 元", "total_savings", 300, "save_1"),
+    AchievementRule("save_1000",     2, "🦸", "丐幫弟子", "累計節省超過 $1,000 元", "total_savings", 1000, "save_300"),
+    AchievementRule("fail_streak_3", 2, "🌪️", "氣息紊亂", "連續 3 個月支出超標", "max_streak_over", 3, "first_fail"),
+
+    # Level 3
+    AchievementRule("success_streak_3", 3, "🍃", "步履輕盈", "連續 3 個月支出低於預算", "max_streak_under", 3, "first_success"),
+    AchievementRule("save_5000",        3, "🧮", "鐵算盤", "累計節省超過 $5,000 元", "total_savings", 5000, "save_1000"),
+    AchievementRule("fail_streak_6",    3, "🔥", "走火入魔", "連續 6 個月支出超標", "max_streak_over", 6, "fail_streak_3"),
+
+    # Level 4
+    AchievementRule("success_streak_6", 4, "⛰️", "不動如山", "連續 6 個月支出低於預算", "max_streak_under", 6, "success_streak_3"),
+    AchievementRule("save_10000",       4, "🔔", "金鐘罩頂", "累計節省超過 $10,000 元", "total_savings", 10000, "save_5000"),
+    # 高階技巧：需要先學會連3月達標
+    AchievementRule("super_save",       4, "📜", "守財真經", "單月節省金額 > 單月總支出", "super_save_months", 1, "success_streak_3"),
+]
+
+RULES_BY_CODE = {r.code: r for r in ACHIEVEMENT_RULES}
+# 規則表的原始順序 (寫入時照這個順序，前端同等級內的排列才會跟規則表一致)
+RULE_POSITION = {r.code: i for i, r in enumerate(ACHIEVEMENT_RULES)}
+
+
+def _topological_order(rules):
+    # 前置成就一定排在後面的成就之前，這樣一輪掃過去就能一次解鎖多級
+    for r in rules:
+        if r.metric not in METRICS:
+            raise ValueError(f"成就 {r.code} 使用了未知的指標: {r.metric}")
+        if r.prerequisite is not None and r.prerequisite not in RULES_BY_CODE:
+            raise ValueError(f"成就 {r.code} 的前置成就不存在: {r.prerequisite}")
+
+    graph = {r.code: ({r.prerequisite} if r.prerequisite else set()) for r in rules}
+    return [RULES_BY_CODE[code] for code in TopologicalSorter(graph).static_order()]
+
+# import 時就排好並檢查 (規則表寫錯會直接啟動失敗，而不是默默不解鎖)
+ORDERED_RULES = _topological_order(ACHIEVEMENT_RULES)
+
+def crosses_threshold(metric: str, before: int, after: int) -> bool:
+    """指標從 before 變成 after 時，是否有任何規則的門檻被跨過 (純記憶體判斷，不查資料庫)"""
+    return any(
+        r.metric == metric and before < r.threshold <= after
+        for r in ACHIEVEMENT_RULES
+    )
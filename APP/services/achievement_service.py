@@ -0,0 +1,153 @@
+from datetime import date, datetime
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from APP import models
+from APP.database import dialect_insert
+from APP.tenancy import tenant_id
+from APP.services import rollup_service
+from APP.services.achievement_rules import METRICS, ORDERED_RULES, RULE_POSITION, crosses_threshold
+
+
+def _reset_counters(state: models.AchievementState):
+    state.total_savings = 0
+    state.streak_over = 0
+    state.streak_under = 0
+    state.max_streak_over = 0
+    state.max_streak_under = 0
+    state.failed_months = 0
+    state.succeeded_months = 0
+    state.super_save_months = 0
+
+def apply_settlement(state: models.AchievementState, settlement: models.MonthlySettlement):
+    """把一筆月結算紀錄併入累計狀態 (O(1))"""
+    # 沒有支出紀錄的月份不算達標也不算超標
+    if settlement.expense_count == 0:
+        return
+
+    spent = settlement.total_expense
+    savings = settlement.savings
+
+    if savings > 0:
+        state.total_savings += savings
+        state.succeeded_months += 1
+        state.streak_under += 1
+        state.streak_over = 0
+
+        # 判斷守財真經 (省 > 花)
+        if savings > spent:
+            state.super_save_months += 1
+    else:
+        state.failed_months += 1
+        state.streak_over += 1
+        state.streak_under = 0
+
+    state.max_streak_under = max(state.max_streak_under, state.streak_under)
+    state.max_streak_over = max(state.max_streak_over, state.streak_over)
+
+async def _bootstrap(db: AsyncSession) -> models.AchievementState:
+    # 第一次啟用：從既有帳務重建月彙總，並把已有的月結算紀錄併入狀態
+    # (尚未結算的月份交給排程的月結算處理)
+    record_count = await rollup_service.backfill(db)
+
+    state = models.AchievementState(user_id=tenant_id(db), record_count=record_count, settled_month=None)
+    _reset_counters(state)
+    settlements = await db.scalars(select(models.MonthlySettlement).order_by(models.MonthlySettlement.month))
+    for settlement in settlements:
+        apply_settlement(state, settlement)
+        state.settled_month = settlement.month
+    db.add(state)
+
+    await evaluate(db, state)
+    await db.flush()
+    return state
+
+async def get_state(db: AsyncSession) -> models.AchievementState:
+    state = await db.get(models.AchievementState, tenant_id(db))
+    if state is None:
+        state = await _bootstrap(db)
+    return state
+
+async def evaluate(db: AsyncSession, state: models.AchievementState):
+    """
+    依目前累計狀態判定並解鎖成就 (不 commit，交給呼叫端一起存檔)。
+    不管有幾條規則，都只有兩句 SQL：一次讀出現況，一次批次 upsert (含初始化)。
+    """
+    table = models.Achievement.__table__
+    user_id = tenant_id(db)
+    # Core 查詢不會自動加上使用者條件，要自己帶
+    current = {row.code: row for row in (await db.execute(select(table).where(table.c.user_id == user_id))).all()}
+
+    # 指標向量：所有規則共用，只算一次
+    metrics = {m: getattr(state, m) for m in METRICS}
+    unlocked = {code for code, row in current.items() if row.is_unlocked}
+    now = datetime.now()
+
+    changes = []
+    for rule in ORDERED_RULES:  # 已依前置關係排序，前置一定先判定
+        row = current.get(rule.code)
+        is_unlocked = row is not None and row.is_unlocked
+        unlocked_at = row.unlocked_at if row is not None else None
+
+        if (not is_unlocked
+                and metrics[rule.metric] >= rule.threshold
+                and (rule.prerequisite is None or rule.prerequisite in unlocked)):
+            is_unlocked = True
+            unlocked_at = now
+            unlocked.add(rule.code)
+
+        values = {
+            "user_id": user_id, "code": rule.code, "name": rule.name, "description": rule.desc,
+            "tier": rule.tier, "icon": rule.icon,
+            "is_unlocked": is_unlocked, "unlocked_at": unlocked_at,
+        }
+        # 只寫入有變化的列 (新規則、剛解鎖、或是規則表改了名稱/圖示)
+        if row is None or any(getattr(row, k) != v for k, v in values.items()):
+            changes.append(values)
+
+    if not changes:
+        return
+
+    changes.sort(key=lambda v: RULE_POSITION[v["code"]])
+    stmt = dialect_insert(db, table).values(changes)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[table.c.user_id, table.c.code],
+        set_={k: stmt.excluded[k] for k in ("name", "description", "tier", "icon", "is_unlocked", "unlocked_at")}
+    )
+    await db.execute(stmt)
+
+# --- 寫入端的掛勾 (背景工作 record_change，見 APP/job_queue.py) ---
+
+async def on_record_change(db: AsyncSession, record_date: date, record_type: str, amount: int, sign: int = 1):
+    """
+    新增 (sign=1) 或刪除 (sign=-1) 一筆帳之後呼叫：
+    1. 更新該月彙總 (O(1))
+    2. 更新即時型指標 (記帳筆數)，只有跨過某條規則的門檻時才重新判定成就
+    已結算的月份不會因此改變 (月結算紀錄是凍結的)。
+    """
+    state = await db.get(models.AchievementState, tenant_id(db))
+    if state is None:
+        # 第一次啟用：重建彙總時已經把這筆 (刪除的話是少了這筆) 算進去了，不能再加一次
+        await _bootstrap(db)
+        return
+
+    await rollup_service.apply_record(db, record_date, record_type, amount, sign)
+    # 在資料庫裡原子加減 (不是讀出來 +1 再寫回去：多個 worker 同時處理同一人的帳會少算)
+    S = models.AchievementState
+    after = await db.scalar(
+        update(S).where(S.user_id == state.user_id).values(record_count=S.record_count + sign).returning(S.record_count)
+    )
+    set_committed_value(state, "record_count", after)
+    before = after - sign
+
+    if crosses_threshold("record_count", before, after):
+        await evaluate(db, state)
+
+def record_change_payload(record: models.Expense, sign: int = 1) -> dict:
+    # 排進佇列的內容 (刪除時那筆帳已經不在了，所以要帶著欄位值)
+    return {"date": record.date.isoformat(), "record_type": record.record_type, "amount": record.amount, "sign": sign}
+
+async def handle_record_change(db: AsyncSession, payload: dict):
+    await on_record_change(
+        db, date.fromisoformat(payload["date"]), payload["record_type"], payload["amount"], payload["sign"]
+    )
@@ -0,0 +1,165 @@
+"""
+帳務封存：把鎖定的舊年份帳務搬出資料庫，存成壓縮的 Parquet 檔。
+
+帳務建立超過 12 小時就不能刪除 (models.EXPENSE_LOCK)，舊年份實際上是唯讀的，
+沒必要一直留在寫入熱區：新增、最近清單與索引維護只需要面對近幾年的資料。
+
+- PostgreSQL 的 expenses 依年份分區 (migration v0005)，封存時整個分區 DETACH + DROP；
+  SQLite 沒有分區，直接刪掉該年的資料
+- 只封存今年往前數 ARCHIVE_KEEP_YEARS 年以前、而且最後一筆帳也已經鎖定的年份
+- 匯出、刪除、寫封存紀錄在同一個 transaction：檔案寫好才刪資料，失敗就整個 rollback (檔案重跑會覆蓋)
+- 封存後又補登進同一年的帳會留在資料庫 (PostgreSQL 落在預設分區)，下次封存再多存一段
+
+分析端不受影響：年度統計、趨勢、預算進度、月結算都讀彙總表 (monthly_totals / daily_totals)，
+彙總表不封存；需要從明細重建彙總時 (rollup_service.backfill) 會把封存檔一起算進去。
+"""
+import asyncio
+import logging
+import os
+from datetime import date, datetime
+from pathlib import Path
+from sqlalchemy import delete, extract, func, insert, select, text
+from APP import models
+from APP.database import engine
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "archive"))
+ARCHIVE_KEEP_YEARS = int(os.getenv("ARCHIVE_KEEP_YEARS", "3"))  # 今年 + 前 2 年留在資料庫
+
+COLUMNS = ("id", "user_id", "date", "record_type", "category", "amount", "description", "created_at")
+
+
+class ArchiveError(RuntimeError):
+    pass
+
+
+def _year_range(year: int):
+    expenses = models.Expense.__table__
+    return (expenses.c.date >= date(year, 1, 1)) & (expenses.c.date < date(year + 1, 1, 1))
+
+async def _is_partitioned(conn) -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    kind = (await conn.execute(text("SELECT relkind FROM pg_class WHERE relname = 'expenses'"))).scalar()
+    return kind == "p"
+
+async def ensure_partitions(today: date | None = None):
+    """PostgreSQL：先把今年和明年的分區建好 (排程每天檢查，沒有分區的資料會落進預設分區)"""
+    today = today or date.today()
+    async with engine.begin() as conn:
+        if not await _is_partitioned(conn):
+            return
+        for year in (today.year, today.year + 1):
+            try:
+                async with conn.begin_nested():
+                    await conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS expenses_y{year} PARTITION OF expenses "
+                        f"FOR VALUES FROM ('{year}-01-01') TO ('{year + 1}-01-01')"
+                    ))
+            except Exception:
+                # 預設分區裡已經有這一年的資料時建不起來，資料照樣查得到，只是沒享受到分區
+                logger.exception("建立 expenses_y%s 分區失敗", year)
+
+async def year_summaries(before_year: int) -> list:
+    """before_year 以前每一年的 (year, rows, total_amount, latest_created_at)，在資料庫裡分組，不把帳讀出來"""
+    E = models.Expense
+    year = extract("year", E.date)  # SQLite 會編成 strftime('%Y', ...)
+    async with engine.connect() as conn:
+        return (await conn.execute(
+            select(
+                year.label("year"), func.count().label("rows"),
+                func.sum(E.amount).label("total_amount"), func.max(E.created_at).label("latest")
+            ).where(E.date < date(before_year, 1, 1)).group_by(year).order_by(year)
+        )).all()
+
+async def archivable_years(keep_years: int = ARCHIVE_KEEP_YEARS, now: datetime | None = None) -> list[int]:
+    """可以封存的年份：早於保留範圍、而且該年最後一筆帳已經鎖定"""
+    now = now or datetime.now()
+    return [
+        int(s.year) for s in await year_summaries(now.year - keep_years + 1)
+        if s.latest is None or now - s.latest >= models.EXPENSE_LOCK
+    ]
+
+def _write_parquet(rows, path: Path):
+    # pyarrow 很大，只有封存 / 讀封存檔時才載入
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ("id", pa.int64()), ("user_id", pa.int32()), ("date", pa.date32()), ("record_type", pa.string()),
+        ("category", pa.string()), ("amount", pa.int64()), ("description", pa.string()),
+        ("created_at", pa.timestamp("us")),
+    ])
+    table = pa.Table.from_pydict({c: [getattr(r, c) for r in rows] for c in COLUMNS}, schema=schema)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    pq.write_table(table, tmp, compression="zstd")
+    os.replace(tmp, path)
+
+async def archive_year(year: int, now: datetime | None = None) -> dict | None:
+    """把某一年的帳務搬到 Parquet 檔，回傳封存紀錄 (該年沒有資料就回傳 None)"""
+    now = now or datetime.now()
+    E = models.Expense
+    year_filter = _year_range(year)
+    async with engine.begin() as conn:
+        partition = f"expenses_y{year}"
+        partitioned = await _is_partitioned(conn)
+        if partitioned:
+            # 封存期間不讓這一年再寫入 (SQLite 的寫入交易本來就是獨佔的)
+            exists = (await conn.execute(text("SELECT to_regclass(:name)"), {"name": partition})).scalar()
+            if exists:
+                await conn.execute(text(f"LOCK TABLE {partition} IN SHARE MODE"))
+
+        rows = (await conn.execute(
+            select(*(E.__table__.c[c] for c in COLUMNS)).where(year_filter).order_by(E.user_id, E.date, E.id)
+        )).all()
+        if not rows:
+            return None
+        latest = max(filter(None, (r.created_at for r in rows)), default=None)
+        if latest is not None and now - latest < models.EXPENSE_LOCK:
+            raise ArchiveError(f"{year} 年還有尚未鎖定的帳 (建立於 {latest})，晚點再封存")
+
+        relative = Path("expenses") / str(year) / f"segment-{now:%Y%m%d%H%M%S}.parquet"
+        await asyncio.to_thread(_write_parquet, rows, ARCHIVE_DIR / relative)
+
+        if partitioned and exists:
+            await conn.execute(text(f"ALTER TABLE expenses DETACH PARTITION {partition}"))
+            await conn.execute(text(f"DROP TABLE {partition}"))
+        # 不在年份分區裡的 (SQLite 全部、PostgreSQL 預設分區裡的補登資料)
+        await conn.execute(delete(E.__table__).where(year_filter))
+
+        record = {
+            "year": year, "path": relative.as_posix(), "rows": len(rows),
+            "total_amount": sum(r.amount for r in rows), "archived_at": now,
+        }
+        await conn.execute(insert(models.ExpenseArchive.__table__).values(**record))
+    logger.info("%s 年帳務已封存: %s 筆 -> %s", year, len(rows), relative)
+    return record
+
+async def list_archives() -> list:
+    A = models.ExpenseArchive
+    async with engine.connect() as conn:
+        return (await conn.execute(select(A).order_by(A.year, A.id))).all()
+
+
+# --- 讀封存檔 ---
+
+def _aggregate_daily(paths: list[Path], user_id: int, by: tuple[str, ...]) -> list[tuple]:
+    import pyarrow.parquet as pq
+
+    result = []
+    for path in paths:
+        table = pq.read_table(path, columns=["user_id", *by, "amount"], filters=[("user_id", "=", user_id)])
+        if table.num_rows == 0:
+            continue
+        grouped = table.group_by(list(by)).aggregate([("amount", "sum"), ("amount", "count")])
+        result.extend(zip(*(grouped.column(c).to_pylist() for c in (*by, "amount_sum", "amount_count"))))
+    return result
+
+async def archived_daily_totals(db, by: tuple[str, ...] = ("date", "record_type")) -> list[tuple]:
+    """目前使用者封存檔依 by 分組的 (*by, 金額合計, 筆數)；沒有封存過就是空的 (不會載入 pyarrow)"""
+    paths = (await db.scalars(select(models.ExpenseArchive.path))).all()
+    if not paths:
+        return []
+    return await asyncio.to_thread(_aggregate_daily, [ARCHIVE_DIR / p for p in paths], db.info["user_id"], by)
@@ -0,0 +1,42 @@
+from bisect import bisect_right
+from calendar import monthrange
+from datetime import date
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import models
+
+# 沒設定預算時的預設值
+DEFAULT_MONTHLY_BUDGET = 30000
+# 預算有變動時發出的快取失效通知 (見 APP/cache_bus.py)
+CACHE_TOPIC = "budgets"
+
+
+async def current_budget(db: AsyncSession) -> models.Budget | None:
+    # 目前生效中的那一版 (生效日最新的)
+    return await db.scalar(
+        select(models.Budget)
+        .filter(models.Budget.effective_from <= date.today())
+        .order_by(models.Budget.effective_from.desc(), models.Budget.id.desc())
+        .limit(1)
+    )
+
+def _month_end(month_key: str) -> date:
+    year, month = map(int, month_key.split("-"))
+    return date(year, month, monthrange(year, month)[1])
+
+async def budgets_for_months(db: AsyncSession, months: list[str]) -> dict[str, int]:
+    """
+    一次查出所有版本 (依生效日排序，走 effective_from 索引)，再用 bisect 找出每個月適用的預算。
+    某個月適用的是「月底那天生效中」的版本；在第一次設定之前的月份用預設值。
+    """
+    versions = (await db.execute(
+        select(models.Budget.effective_from, models.Budget.monthly_limit)
+        .order_by(models.Budget.effective_from, models.Budget.id)
+    )).all()
+    dates = [v.effective_from for v in versions]
+
+    result = {}
+    for m in months:
+        i = bisect_right(dates, _month_end(m))
+        result[m] = versions[i - 1].monthly_limit if i > 0 else DEFAULT_MONTHLY_BUDGET
+    return result
@@ -0,0 +1,33 @@
+from datetime import date
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import models
+from APP.services import achievement_service, seal_service
+
+
+def auto_journal_payload(symbol: str, shares: int, profit: float, gain_note: str) -> dict:
+    # 賣出當下就決定記帳日期 (背景工作晚一點才跑，也不會記到隔天)
+    return {"symbol": symbol, "shares": shares, "profit": profit, "gain_note": gain_note, "date": date.today().isoformat()}
+
+async def auto_journal(db: AsyncSession, payload: dict):
+    """
+    背景工作 auto_journal：把賣股的已實現損益記進帳本 (Auto-Journaling)
+    - 賺錢 -> 記為「收入」(投資獲利)
+    - 賠錢 -> 記為「支出」(投資虧損，虧損視為一種支出)
+    """
+    profit = payload["profit"]
+    if profit > 0:
+        category, record_type, note = "投資獲利", "income", payload["gain_note"]
+    else:
+        category, record_type, note = "投資虧損", "expense", "停損"
+
+    record = models.Expense(
+        amount=int(abs(profit)),  # 轉為正數存入
+        category=category,
+        description=f"賣出 {payload['symbol']} {payload['shares']} 股 ({note})",
+        date=date.fromisoformat(payload["date"]),
+        record_type=record_type
+    )
+    db.add(record)
+    # 記帳日期是賣出當天，工作拖到那天封存之後才跑的話，封存合計也要補上
+    await seal_service.apply_record(db, record)
+    await achievement_service.on_record_change(db, record.date, record.record_type, record.amount)
@@ -0,0 +1,74 @@
+"""
+庫存批次合併 (compaction)。
+
+每買一次就新增一筆 Stock，定期定額久了同一檔會有上千筆小批次，智慧賣出與查詢庫存每次都要全部掃過。
+合併規則：同一代號依成本由低到高排好，成本相同 (或在容許誤差內) 的相鄰批次併成一筆：
+- 股數相加、成本改為加權平均 -> 總成本不變
+- 每一組的成本範圍互不重疊，平均後仍落在原本的範圍內 -> 「先賣低成本」的順序不變
+- 容許誤差 0 (預設) 只合併成本完全相同的批次，之後賣出的損益跟合併前一模一樣；
+  大於 0 時同一組改用平均成本計算，總額不變，但只賣一部分時損益會跟逐筆計算有些微差異
+"""
+import os
+from collections import defaultdict
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import metrics, models
+from APP.database import PrimaryReadSessionLocal, SessionLocal
+
+# 相對誤差：0.01 代表成本差 1% 以內的批次可以併在一起 (以該組最低成本為基準)
+LOT_COST_TOLERANCE = float(os.getenv("LOT_COST_TOLERANCE", "0"))
+
+
+def plan_groups(lots, tolerance: float = 0.0) -> list[list[models.Stock]]:
+    """同一代號的批次分組 (依成本由低到高)，每組之後併成一筆"""
+    groups = []
+    for lot in sorted(lots, key=lambda s: (s.average_cost, s.id)):
+        if groups and lot.average_cost <= groups[-1][0].average_cost * (1 + tolerance):
+            groups[-1].append(lot)
+        else:
+            groups.append([lot])
+    return groups
+
+async def compact(db: AsyncSession, symbol: str | None = None, tolerance: float = LOT_COST_TOLERANCE) -> dict:
+    """合併目前使用者的庫存批次 (不 commit)，回傳合併前後的筆數"""
+    query = select(models.Stock).with_for_update()  # 合併途中不讓賣出改到同一批
+    if symbol is not None:
+        query = query.filter(models.Stock.symbol == symbol)
+    lots = (await db.execute(query)).scalars().all()
+
+    by_symbol = defaultdict(list)
+    for lot in lots:
+        by_symbol[lot.symbol].append(lot)
+
+    merged = 0
+    for symbol_lots in by_symbol.values():
+        for group in plan_groups(symbol_lots, tolerance):
+            if len(group) == 1:
+                continue
+            # 留最早的那筆 (ID 最小)，其他併進來後刪掉
+            keep = min(group, key=lambda s: s.id)
+            shares = sum(s.shares for s in group)
+            costs = {s.average_cost for s in group}
+            if len(costs) == 1:
+                average_cost = keep.average_cost  # 成本都一樣就不要重算 (避免浮點誤差)
+            else:
+                average_cost = sum(s.shares * s.average_cost for s in group) / shares
+            keep.shares = shares
+            keep.average_cost = average_cost
+            for lot in group:
+                if lot is not keep:
+                    await db.delete(lot)
+            merged += len(group) - 1
+
+    await db.flush()
+    metrics.lots_compacted.inc(amount=merged)
+    return {"symbols": len(by_symbol), "lots_before": len(lots), "lots_after": len(lots) - merged}
+
+async def fragmentation() -> dict:
+    """所有使用者的庫存破碎程度 (給 /metrics 用)：持股部位數、批次總數、單一部位最多幾筆"""
+    S = models.Stock
+    async with PrimaryReadSessionLocal() as db:  # 不綁使用者：看全部
+        counts = (await db.scalars(
+            select(func.count()).select_from(S).group_by(S.user_id, S.symbol)
+        )).all()
+    return {"positions": len(counts), "lots": sum(counts), "max_lots": max(counts, default=0)}
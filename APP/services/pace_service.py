@@ -0,0 +1,95 @@
+import math
+from calendar import monthrange
+from datetime import date, timedelta
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import cache_bus, metrics, models
+from APP.schemas.budget import BudgetPace
+from APP.services import budget_service, rollup_service
+from APP.tenancy import tenant_id
+
+# 加權移動平均看最近幾天
+WINDOW_DAYS = 14
+
+# 快取：算好的進度一直用到「下一次有帳務寫入 / 預算變更」或「換日」為止
+# 寫入可能發生在別的程序 (其他 uvicorn worker、背景 worker)，靠 cache_bus 通知
+# key 是 (使用者, 日期)；全部在 event loop 裡執行，不需要上鎖
+_cache = {}
+
+
+@cache_bus.subscribe(rollup_service.CACHE_TOPIC, budget_service.CACHE_TOPIC)
+def invalidate(user_id: int | None = None):
+    # 只清該使用者的；沒指定就全部清掉
+    if user_id is None:
+        _cache.clear()
+        return
+    for key in [k for k in _cache if k[0] == user_id]:
+        del _cache[key]
+
+async def _daily_rate(db: AsyncSession, today: date) -> float:
+    """最近 WINDOW_DAYS 天 (含今天) 的每日支出，線性加權平均 (越近的日子權重越大)"""
+    start = today - timedelta(days=WINDOW_DAYS - 1)
+    rows = (await db.execute(select(models.DailyTotal.date, models.DailyTotal.total).filter(
+        models.DailyTotal.record_type == "expense",
+        models.DailyTotal.date >= start,
+        models.DailyTotal.date <= today
+    ))).all()
+
+    # numpy 很大，第一次算進度時才載入 (不拖慢 worker 啟動)
+    import numpy as np
+
+    # 沒記帳的日子補 0
+    spend = np.zeros(WINDOW_DAYS)
+    for r in rows:
+        spend[(r.date - start).days] = r.total
+
+    weights = np.arange(1, WINDOW_DAYS + 1, dtype=float)
+    return float(np.dot(spend, weights) / weights.sum())
+
+async def compute_pace(db: AsyncSession, today: date | None = None) -> BudgetPace:
+    today = today or date.today()
+    month = rollup_service.month_key(today)
+    days_in_month = monthrange(today.year, today.month)[1]
+
+    monthly = await db.get(models.MonthlyTotal, {"user_id": tenant_id(db), "month": month, "record_type": "expense"})
+    spent = monthly.total if monthly else 0
+    budget = (await budget_service.budgets_for_months(db, [month]))[month]
+
+    allowance = budget * today.day / days_in_month
+    daily_rate = await _daily_rate(db, today)
+    projected_total = spent + daily_rate * (days_in_month - today.day)
+
+    if spent >= budget:
+        days_until_breach = 0
+    elif daily_rate > 0:
+        days_until_breach = math.ceil((budget - spent) / daily_rate)
+    else:
+        days_until_breach = None
+
+    return BudgetPace(
+        month=month,
+        budget=budget,
+        spent=spent,
+        allowance=round(allowance, 0),
+        pace_pct=round(spent / allowance * 100, 1) if allowance > 0 else None,
+        daily_rate=round(daily_rate, 0),
+        projected_total=round(projected_total, 0),
+        days_until_breach=days_until_breach,
+        on_track=projected_total <= budget
+    )
+
+async def get_pace(db: AsyncSession) -> BudgetPace:
+    today = date.today()
+    key = (tenant_id(db), today)
+    cached = _cache.get(key)
+    if cached is not None:
+        metrics.cache_requests.inc("pace", "hit")
+        return cached
+    metrics.cache_requests.inc("pace", "miss")
+
+    pace = await compute_pace(db, today)
+    # 只留今天的
+    for old in [k for k in _cache if k[1] != today]:
+        del _cache[old]
+    _cache[key] = pace
+    return pace
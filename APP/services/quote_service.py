@@ -0,0 +1,93 @@
+import asyncio
+import logging
+import os
+import time
+from typing import TYPE_CHECKING
+from APP import metrics, singleflight
+
+if TYPE_CHECKING:
+    from curl_cffi.requests import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+# Yahoo Finance 的報價 API (yfinance 底層用的也是它)；壓力測試時可以指向本機的假報價服務
+CHART_URL = os.getenv("QUOTE_API_URL", "https://query1.finance.yahoo.com/v8/finance/chart/{ticker}")
+QUOTE_TIMEOUT = 10      # 秒
+MAX_CONCURRENCY = int(os.getenv("QUOTE_MAX_CONCURRENCY", "8"))   # 同時對 Yahoo 發出的請求上限，避免被擋
+# 同一代號的報價用多久 (秒)：/stocks/、/overview/ 與不同使用者持有同一檔時共用，不必每個請求都去查
+# 查不到 (None) 也一樣快取，Yahoo 出問題時不會每個請求都再等一次逾時
+QUOTE_CACHE_SECONDS = float(os.getenv("QUOTE_CACHE_SECONDS", "30"))
+
+_semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+# 整個程序共用一個 session (連線保持 keep-alive 重複使用)；第一次查價時才建，lifespan 結束時 close()
+_session: "AsyncSession | None" = None
+# 代號 -> (到期時間, 價格)；全部在 event loop 裡執行，不需要上鎖
+_cache: dict[str, tuple[float, float | None]] = {}
+
+
+def to_ticker(symbol: str) -> str:
+    # 處理台股代號：如果是數字 (如 2330)，要加上 ".TW" 才能讓 Yahoo 讀懂
+    return f"{symbol}.TW" if symbol.isdigit() else symbol
+
+def _get_session() -> "AsyncSession":
+    global _session
+    if _session is None:
+        # curl_cffi 第一次查價時才載入 (沒有用到股票功能的 worker 不用付這個啟動成本)
+        from curl_cffi.requests import AsyncSession
+
+        # impersonate：模擬瀏覽器的 TLS 指紋，跟 yfinance 一樣避免被 Yahoo 擋下來
+        _session = AsyncSession(impersonate="chrome", max_clients=MAX_CONCURRENCY)
+    return _session
+
+async def close():
+    """關掉共用的 session (lifespan 結束時呼叫)"""
+    global _session
+    if _session is not None:
+        session, _session = _session, None
+        await session.close()
+    _cache.clear()
+
+async def _fetch(symbol: str) -> float | None:
+    ticker = to_ticker(symbol)
+    session = _get_session()
+    async with _semaphore:
+        start = time.perf_counter()
+        try:
+            res = await session.get(
+                CHART_URL.format(ticker=ticker),
+                params={"range": "1d", "interval": "1d"},
+                timeout=QUOTE_TIMEOUT
+            )
+            res.raise_for_status()
+            meta = res.json()["chart"]["result"][0]["meta"]
+            price = float(meta["regularMarketPrice"])
+            metrics.quote_requests.inc("ok")
+            return price
+        except Exception as e:
+            logger.warning("抓不到 %s 的報價: %s", ticker, e)
+            metrics.quote_requests.inc("error")
+            return None
+        finally:
+            metrics.quote_latency.observe(time.perf_counter() - start)
+
+async def _quote(symbol: str) -> float | None:
+    cached = _cache.get(symbol)
+    if cached is not None and cached[0] > time.monotonic():
+        metrics.cache_requests.inc("quote", "hit")
+        return cached[1]
+    metrics.cache_requests.inc("quote", "miss")
+    # 同一代號同時只查一次，其他請求等同一個結果
+    price = await singleflight.run(("quote", symbol), _fetch, symbol)
+    _cache[symbol] = (time.monotonic() + QUOTE_CACHE_SECONDS, price)
+    return price
+
+async def get_quotes(symbols) -> dict[str, float | None]:
+    """
+    一次查多檔股票的最新價格 (同一代號只查一次，各代號同時查，QUOTE_CACHE_SECONDS 內直接用快取)。
+    抓不到的回傳 None，由呼叫端決定要用什麼替代 (例如成本價)。
+    """
+    unique = list(dict.fromkeys(symbols))
+    if not unique:
+        return {}
+    prices = await asyncio.gather(*(_quote(s) for s in unique))
+    return dict(zip(unique, prices))
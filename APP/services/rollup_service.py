@@ -0,0 +1,105 @@
+from collections import defaultdict
+from datetime import date, datetime
+from sqlalchemy import delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import cache_bus, models
+from APP.database import increment
+from APP.tenancy import tenant_id
+from APP.services import archive_service
+
+# 彙總表有變動時發出的快取失效通知 (commit 之後所有程序都會收到，見 APP/cache_bus.py)
+CACHE_TOPIC = "rollups"
+
+
+def month_key(d: date) -> str:
+    return d.strftime("%Y-%m")
+
+async def apply_record(db: AsyncSession, record_date: date, record_type: str, amount: int, sign: int = 1) -> str:
+    """
+    新增 (sign=1) 或刪除 (sign=-1) 一筆帳時，同步調整該日與該月份的彙總。
+    各只動一列，不需要重掃歷史資料 (資料庫端原子加減，多個 worker 同時更新同一天也不會少算)。
+    回傳受影響的月份字串。
+    """
+    key = month_key(record_date)
+    user_id = tenant_id(db)
+    deltas = {"total": sign * amount, "count": sign}
+    await increment(db, models.MonthlyTotal.__table__, {"user_id": user_id, "month": key, "record_type": record_type}, **deltas)
+    await increment(db, models.DailyTotal.__table__, {"user_id": user_id, "date": record_date, "record_type": record_type}, **deltas)
+    await cache_bus.publish(db, CACHE_TOPIC)
+    return key
+
+async def backfill(db: AsyncSession) -> int:
+    """
+    從 expenses 重建 monthly_totals / daily_totals (只有第一次啟用彙總表時需要)。
+    用 SQL 按日期聚合，再在 Python 歸到月份，避免依賴特定資料庫的日期函式。
+    已經封存到 Parquet 的舊年份也要算進去 (archive_service)。
+    回傳重建時看到的總筆數。
+    """
+    # 還沒處理的 record_change 工作，它們的帳已經在 expenses 裡、會被這次重建算進去，
+    # 同一個 transaction 裡直接結掉，不然 worker 之後又加一次就重複了
+    # (正在跑的那幾個最後對不上 locked_at，結果會被丟掉，見 job_queue._still_ours)
+    J = models.Job
+    await db.execute(update(J).where(
+        J.kind == "record_change", J.status.in_(["pending", "running"]), J.id != db.info.get("job_id", -1)
+    ).values(status="done", locked_at=None, finished_at=datetime.now(), last_error="已由彙總重建取代"))
+
+    rows = (await db.execute(select(
+        models.Expense.date,
+        models.Expense.record_type,
+        func.sum(models.Expense.amount).label("total"),
+        func.count(models.Expense.id).label("count")
+    ).group_by(models.Expense.date, models.Expense.record_type))).all()
+
+    # 同一天可能一部分在封存檔、一部分 (封存後補登的) 還在資料庫
+    daily = defaultdict(lambda: [0, 0])
+    for d, record_type, total, count in [*await archive_service.archived_daily_totals(db), *rows]:
+        bucket = daily[(d, record_type)]
+        bucket[0] += total
+        bucket[1] += count
+
+    buckets = defaultdict(lambda: [0, 0])
+    for (d, record_type), (total, count) in daily.items():
+        bucket = buckets[(month_key(d), record_type)]
+        bucket[0] += total
+        bucket[1] += count
+
+    await db.execute(delete(models.MonthlyTotal))
+    await db.execute(delete(models.DailyTotal))
+    for (m, record_type), (total, count) in buckets.items():
+        db.add(models.MonthlyTotal(month=m, record_type=record_type, total=total, count=count))
+    for (d, record_type), (total, count) in daily.items():
+        db.add(models.DailyTotal(date=d, record_type=record_type, total=total, count=count))
+    # 被結掉的工作原本也要調整記帳筆數，一併對齊 (還沒有成就狀態的話由建立的人帶入)
+    count = sum(count for _, count in daily.values())
+    await db.execute(update(models.AchievementState).values(record_count=count))
+    await db.flush()
+    await cache_bus.publish(db, CACHE_TOPIC)
+    return count
+
+async def ensure_backfilled(db: AsyncSession):
+    # 有帳但日彙總是空的 (例如從舊版升級上來) -> 重建一次
+    has_daily = await db.scalar(select(models.DailyTotal.date).limit(1)) is not None
+    if not has_daily and await db.scalar(select(models.Expense.id).limit(1)) is not None:
+        await backfill(db)
+        await db.commit()
+
+def previous_month_key(today: date | None = None) -> str:
+    today = today or date.today()
+    if today.month == 1:
+        return f"{today.year - 1}-12"
+    return f"{today.year}-{today.month - 1:02d}"
+
+def next_month_key(key: str) -> str:
+    year, month = map(int, key.split("-"))
+    if month == 12:
+        return f"{year + 1}-01"
+    return f"{year}-{month + 1:02d}"
+
+def month_range(first: str, last: str) -> list[str]:
+    """first ~ last (含) 之間的所有月份字串"""
+    months = []
+    m = first
+    while m <= last:
+        months.append(m)
+        m = next_month_key(m)
+    return months
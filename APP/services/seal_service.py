@@ -0,0 +1,197 @@
+"""
+封存彙總 (sealed segments)：歷史期間的收支合計只算一次。
+
+帳務建立超過 EXPENSE_LOCK (12 小時) 就不能刪除，某一天結束 12 小時之後，
+那天的帳只剩「補登」(新增一筆日期在過去的帳) 會改變它。這裡把這樣的日子封存起來：
+- 依 日 / 月 x 收支類型 x 分類 存合計 (sealed_totals)，之後查詢直接讀，不再掃 expenses
+- 每人記一個封存水位 (seal_states.sealed_through)：水位以前 (含) 都已封存，由排程每天往前推
+- 寫入 (新增 / 刪除) 落在水位以前的帳時，在同一個 transaction 裡直接調整封存列 (apply_record)；
+  賣股自動記帳記在賣出當天，通常在水位之後，背景工作拖很久才跑時也一樣走增量
+- 查詢任意期間 = 封存的整月 + 頭尾零散的封存日 + 水位之後的少量明細 (一天半左右)
+
+封存跟寫入靠 seal_states 那一列排隊 (封存 FOR UPDATE、寫入 FOR SHARE)：寫入要嘛在封存前 commit
+(封存會算到它)，要嘛等封存完看到新水位、自己補增量，不會漏算也不會重複。SQLite 的寫入交易本來就一個一個來。
+"""
+import logging
+from calendar import monthrange
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from sqlalchemy import and_, func, insert, or_, select, union
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import models
+from APP.database import PrimaryReadSessionLocal, SessionLocal, dialect_insert, increment
+from APP.services import archive_service
+from APP.tenancy import tenant_id
+
+logger = logging.getLogger(__name__)
+
+
+def horizon(now: datetime | None = None) -> date:
+    """現在可以封存到哪一天 (含)：那天結束之後已經過了鎖定期限"""
+    now = now or datetime.now()
+    return (now - models.EXPENSE_LOCK).date() - timedelta(days=1)
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+def _month_end(d: date) -> date:
+    return d.replace(day=monthrange(d.year, d.month)[1])
+
+async def _state(db: AsyncSession, for_update: bool) -> models.SealState:
+    """鎖住目前使用者的封存狀態 (沒有就先建一列，讓寫入和封存有東西可以排隊)"""
+    query = select(models.SealState).with_for_update(read=not for_update)
+    state = await db.scalar(query)
+    if state is None:
+        table = models.SealState.__table__
+        await db.execute(dialect_insert(db, table).values(user_id=tenant_id(db)).on_conflict_do_nothing(
+            index_elements=[table.c.user_id]
+        ))
+        state = await db.scalar(query)
+    return state
+
+
+# --- 寫入端 ---
+
+async def apply_record(db: AsyncSession, record: models.Expense, sign: int = 1):
+    """
+    新增 (sign=1) 或刪除 (sign=-1) 一筆帳時呼叫 (跟那筆帳同一個 transaction，不 commit)。
+    帳的日期已經封存的話，調整該日 (與已封存的該月) 的合計；還沒封存就什麼都不用做。
+    """
+    state = await _state(db, for_update=False)
+    if state.sealed_through is None or record.date > state.sealed_through:
+        return
+    # 資料庫端原子加減：FOR SHARE 只擋住封存，同時寫入的彼此不會排隊，不能讀出來改完再寫回去
+    table = models.SealedTotal.__table__
+    pk = {"user_id": tenant_id(db), "record_type": record.record_type, "category": record.category}
+    deltas = {"total": sign * record.amount, "count": sign}
+    await increment(db, table, {**pk, "period": "day", "start": record.date}, **deltas)
+    if _month_end(record.date) <= state.sealed_through:
+        await increment(db, table, {**pk, "period": "month", "start": _month_start(record.date)}, **deltas)
+
+
+# --- 封存 ---
+
+async def seal(db: AsyncSession, now: datetime | None = None) -> date:
+    """把目前使用者封存到 horizon (不 commit)，回傳新的水位"""
+    through = horizon(now)
+    state = await _state(db, for_update=True)
+    since = state.sealed_through
+    if since is not None and since >= through:
+        return since
+
+    E = models.Expense
+    query = select(
+        E.date, E.record_type, E.category, func.sum(E.amount), func.count(E.id)
+    ).where(E.date <= through).group_by(E.date, E.record_type, E.category)
+    if since is not None:
+        query = query.where(E.date > since)
+
+    # 已經搬到 Parquet 的舊年份也算進來 (正常情況封存在前、搬走在後，這裡通常是空的)
+    daily = defaultdict(lambda: [0, 0])
+    archived = await archive_service.archived_daily_totals(db, by=("date", "record_type", "category"))
+    for d, record_type, category, total, count in [*archived, *(await db.execute(query)).all()]:
+        if d <= through and (since is None or d > since):
+            bucket = daily[(d, record_type, category)]
+            bucket[0] += total
+            bucket[1] += count
+
+    user_id = tenant_id(db)
+    table = models.SealedTotal.__table__
+    if daily:
+        await db.execute(insert(table), [
+            {"user_id": user_id, "period": "day", "start": d, "record_type": t, "category": c, "total": total, "count": count}
+            for (d, t, c), (total, count) in daily.items()
+        ])
+
+    # 這次整個月都封存完的月份：由該月的封存日加總
+    first = since + timedelta(days=1) if since is not None else min((d for d, _, _ in daily), default=through)
+    last = through if through == _month_end(through) else _month_start(through) - timedelta(days=1)
+    if first <= last:
+        T = models.SealedTotal
+        rows = (await db.execute(select(T.start, T.record_type, T.category, T.total, T.count).where(
+            T.period == "day", T.start >= _month_start(first), T.start <= last
+        ))).all()
+        monthly = defaultdict(lambda: [0, 0])
+        for r in rows:
+            bucket = monthly[(_month_start(r.start), r.record_type, r.category)]
+            bucket[0] += r.total
+            bucket[1] += r.count
+        if monthly:
+            await db.execute(insert(table), [
+                {"user_id": user_id, "period": "month", "start": m, "record_type": t, "category": c, "total": total, "count": count}
+                for (m, t, c), (total, count) in monthly.items()
+            ])
+
+    state.sealed_through = through
+    state.sealed_at = now or datetime.now()
+    await db.flush()
+    return through
+
+async def seal_all(now: datetime | None = None):
+    """排程：每個使用者各自一個 transaction 封存到 horizon"""
+    async with PrimaryReadSessionLocal() as db:  # 不綁使用者：看全部
+        user_ids = sorted(await db.scalars(union(
+            select(models.Expense.user_id), select(models.SealState.user_id)
+        )))
+    for user_id in user_ids:
+        async with SessionLocal(info={"user_id": user_id}) as db:
+            try:
+                await seal(db, now)
+                await db.commit()
+            except Exception:
+                logger.exception("使用者 %s 封存彙總失敗", user_id)
+                await db.rollback()
+
+
+# --- 查詢 ---
+
+async def period_totals(db: AsyncSession, start: date, end: date) -> dict:
+    """
+    start ~ end (含) 依 收支類型 x 分類 的合計。
+    封存的部分：中間的整月各一列、頭尾不滿一個月的日子各一列；水位之後才掃 expenses。
+    """
+    state = await db.get(models.SealState, tenant_id(db))
+    sealed_through = state.sealed_through if state else None
+
+    totals = defaultdict(lambda: [0, 0])
+    tail_start = start
+    if sealed_through is not None and start <= sealed_through:
+        sealed_end = min(end, sealed_through)
+        first_month = start if start.day == 1 else _month_end(start) + timedelta(days=1)
+        last_month_end = sealed_end if sealed_end == _month_end(sealed_end) else _month_start(sealed_end) - timedelta(days=1)
+
+        T = models.SealedTotal
+        if first_month <= last_month_end:
+            segments = or_(
+                and_(T.period == "month", T.start >= first_month, T.start <= last_month_end),
+                and_(T.period == "day", T.start >= start, T.start < first_month),
+                and_(T.period == "day", T.start > last_month_end, T.start <= sealed_end),
+            )
+        else:
+            segments = and_(T.period == "day", T.start >= start, T.start <= sealed_end)
+        rows = (await db.execute(
+            select(T.record_type, T.category, func.sum(T.total), func.sum(T.count))
+            .where(segments).group_by(T.record_type, T.category)
+        )).all()
+        for record_type, category, total, count in rows:
+            totals[(record_type, category)][0] += total
+            totals[(record_type, category)][1] += count
+        tail_start = sealed_end + timedelta(days=1)
+
+    if tail_start <= end:
+        E = models.Expense
+        rows = (await db.execute(
+            select(E.record_type, E.category, func.sum(E.amount), func.count(E.id))
+            .where(E.date >= tail_start, E.date <= end).group_by(E.record_type, E.category)
+        )).all()
+        for record_type, category, total, count in rows:
+            totals[(record_type, category)][0] += total
+            totals[(record_type, category)][1] += count
+
+    items = [
+        {"record_type": record_type, "category": category, "total": total, "count": count}
+        for (record_type, category), (total, count) in totals.items()
+        if count > 0  # 帳都被刪光的分類不列
+    ]
+    items.sort(key=lambda i: (i["record_type"], -i["total"], i["category"]))
+    return {"start": start, "end": end, "sealed_through": sealed_through, "items": items}
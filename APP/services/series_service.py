@@ -0,0 +1,129 @@
+"""
+收支時間序列 (趨勢圖用)。
+
+- 資料來源是日彙總 (daily_totals)，不掃整張 expenses
+- 按日 / 週 (週一開始) / 月分桶，沒有紀錄的區間也要有一點 (補 0)，補值在 SQL 裡做：
+  PostgreSQL 用 generate_series，SQLite 用遞迴 CTE 產生日曆
+- 頭尾的區間只加總查詢範圍內的日子 (例如從 1/15 查，1 月那一點只算 15 日以後)
+- 點數超過上限時用 LTTB (Largest-Triangle-Three-Buckets) 降採樣：保留形狀上重要的點 (尖峰、低谷)，
+  十年的日資料也只回傳幾百點
+"""
+from datetime import date
+from sqlalchemy import Date, Integer, bindparam, text
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP.tenancy import tenant_id
+
+BUCKETS = ("day", "week", "month")
+RECORD_TYPES = ("expense", "income")
+
+# 各資料庫的分桶寫法 (bucket 只會是 BUCKETS 裡的值，可以直接組進 SQL)
+_PG_STEP = {"day": "1 day", "week": "1 week", "month": "1 month"}
+_SQLITE_TRUNC = {
+    "day": "date({col})",
+    "week": "date({col}, 'weekday 0', '-6 days')",  # 先跳到該週日，再退回週一
+    "month": "date({col}, 'start of month')",
+}
+_SQLITE_STEP = {"day": "+1 day", "week": "+7 days", "month": "+1 month"}
+
+_TOTALS = """
+    SELECT {trunc} AS start,
+           SUM(CASE WHEN record_type = 'expense' THEN total ELSE 0 END) AS expense,
+           SUM(CASE WHEN record_type = 'income' THEN total ELSE 0 END) AS income
+    FROM daily_totals
+    WHERE user_id = :user_id AND date >= :start AND date <= :end
+    GROUP BY 1
+"""
+
+
+def _postgresql_sql(bucket: str) -> str:
+    trunc = f"CAST(date_trunc('{bucket}', date) AS date)"
+    return f"""
+        WITH buckets AS (
+            SELECT CAST(generate_series(date_trunc('{bucket}', CAST(:start AS date)), CAST(:end AS date),
+                                        INTERVAL '{_PG_STEP[bucket]}') AS date) AS start
+        ), totals AS ({_TOTALS.format(trunc=trunc)})
+        SELECT b.start, COALESCE(t.expense, 0) AS expense, COALESCE(t.income, 0) AS income
+        FROM buckets b LEFT JOIN totals t ON t.start = b.start
+        ORDER BY b.start
+    """
+
+def _sqlite_sql(bucket: str) -> str:
+    trunc = _SQLITE_TRUNC[bucket]
+    step = _SQLITE_STEP[bucket]
+    return f"""
+        WITH RECURSIVE buckets(start) AS (
+            SELECT {trunc.format(col=':start')}
+            UNION ALL
+            SELECT date(start, '{step}') FROM buckets WHERE date(start, '{step}') <= :end
+        ), totals AS ({_TOTALS.format(trunc=trunc.format(col='date'))})
+        SELECT b.start, COALESCE(t.expense, 0) AS expense, COALESCE(t.income, 0) AS income
+        FROM buckets b LEFT JOIN totals t ON t.start = b.start
+        ORDER BY b.start
+    """
+
+async def bucket_totals(db: AsyncSession, start: date, end: date, bucket: str) -> list:
+    """start ~ end (含) 每個區間的收支合計，沒有紀錄的區間是 0"""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        sql = _postgresql_sql(bucket)
+    elif dialect == "sqlite":
+        sql = _sqlite_sql(bucket)
+    else:
+        raise NotImplementedError(f"不支援的資料庫: {dialect}")
+
+    stmt = text(sql).bindparams(
+        bindparam("start", type_=Date), bindparam("end", type_=Date), bindparam("user_id", type_=Integer)
+    ).columns(start=Date, expense=Integer, income=Integer)
+    return (await db.execute(stmt, {"start": start, "end": end, "user_id": tenant_id(db)})).all()
+
+
+def lttb(points: list[tuple], threshold: int) -> list[tuple]:
+    """
+    Largest-Triangle-Three-Buckets 降採樣 (points 是依時間排序的 (x, y))。
+    頭尾一定保留；中間切成 threshold - 2 桶，每桶挑一點：跟「上一個選中的點」以及「下一桶的平均點」
+    圍成的三角形面積最大的那個 (也就是最偏離趨勢線的點)。
+    """
+    n = len(points)
+    if threshold >= n or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (n - 2) / (threshold - 2)
+    a = 0  # 上一個選中的點
+    for i in range(threshold - 2):
+        # 這一桶的範圍
+        lo = int(i * every) + 1
+        hi = int((i + 1) * every) + 1
+        # 下一桶的平均點 (最後一桶就用最後一點)
+        nxt_lo, nxt_hi = hi, min(int((i + 2) * every) + 1, n)
+        if nxt_lo >= nxt_hi:
+            nxt_lo, nxt_hi = n - 1, n
+        avg_x = sum(p[0] for p in points[nxt_lo:nxt_hi]) / (nxt_hi - nxt_lo)
+        avg_y = sum(p[1] for p in points[nxt_lo:nxt_hi]) / (nxt_hi - nxt_lo)
+
+        ax, ay = points[a]
+        best, best_area = lo, -1.0
+        for j in range(lo, hi):
+            x, y = points[j]
+            area = abs((ax - avg_x) * (y - ay) - (ax - x) * (avg_y - ay))
+            if area > best_area:
+                best, best_area = j, area
+        sampled.append(points[best])
+        a = best
+
+    sampled.append(points[-1])
+    return sampled
+
+async def get_series(db: AsyncSession, start: date, end: date, bucket: str,
+                     record_types=RECORD_TYPES, max_points: int = 500) -> dict:
+    rows = await bucket_totals(db, start, end, bucket)
+    series = {}
+    downsampled = False
+    for record_type in record_types:
+        # x 用日序數 (區間長度不一時，例如月份，也能正確算面積)
+        points = [(r.start.toordinal(), getattr(r, record_type)) for r in rows]
+        if len(points) > max_points:
+            points = lttb(points, max_points)
+            downsampled = True
+        series[record_type] = [{"start": date.fromordinal(x), "total": y} for x, y in points]
+    return {"bucket": bucket, "start": start, "end": end, "downsampled": downsampled, "series": series}
@@ -0,0 +1,69 @@
+from datetime import date
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from APP import job_queue, models
+from APP.services import achievement_service, budget_service, rollup_service
+
+
+async def settle_due_months(db: AsyncSession, today: date | None = None) -> list[str]:
+    """
+    月結算：把上次結算之後、到上個月為止的每個月凍結成 MonthlySettlement，
+    依序併入成就狀態，最後只判定一次成就。
+    平常每月只會結算一個月；排程停擺過的話，下次啟動時會一次補齊。
+    回傳這次結算的月份。
+    """
+    state = await achievement_service.get_state(db)
+    upto = rollup_service.previous_month_key(today)
+    if state.settled_month is not None and state.settled_month >= upto:
+        return []
+    # 月彙總是背景工作更新的：還沒做完 (或失敗) 的帳先在這裡補進去，不然結算會凍結少算的數字
+    await job_queue.apply_pending(db, "record_change")
+
+    if state.settled_month is None:
+        # 從來沒結算過：從第一筆帳的月份開始 (還沒有任何已結束月份的帳就先不動)
+        start = await db.scalar(select(func.min(models.MonthlyTotal.month)))
+        if start is None or start > upto:
+            await db.commit()
+            return []
+    else:
+        start = rollup_service.next_month_key(state.settled_month)
+
+    months = rollup_service.month_range(start, upto)
+    totals = {
+        (r.month, r.record_type): r
+        for r in await db.scalars(select(models.MonthlyTotal).filter(
+            models.MonthlyTotal.month >= start,
+            models.MonthlyTotal.month <= upto
+        ))
+    }
+    # 每個月用當時生效的預算 (補跑好幾個月時也不會全部套用今天的預算)
+    budgets = await budget_service.budgets_for_months(db, months)
+
+    for m in months:
+        monthly_budget = budgets[m]
+        expense = totals.get((m, "expense"))
+        income = totals.get((m, "income"))
+        total_expense = expense.total if expense else 0
+
+        settlement = models.MonthlySettlement(
+            month=m,
+            total_expense=total_expense,
+            total_income=income.total if income else 0,
+            expense_count=expense.count if expense else 0,
+            budget=monthly_budget,
+            savings=monthly_budget - total_expense
+        )
+        db.add(settlement)
+        achievement_service.apply_settlement(state, settlement)
+
+    state.settled_month = upto
+    await achievement_service.evaluate(db, state)
+
+    try:
+        await db.commit()
+    except IntegrityError:
+        # 其他 worker 已經搶先結算了同一個月份，這次就算了
+        await db.rollback()
+        return []
+    return months
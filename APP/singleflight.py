@@ -0,0 +1,37 @@
+"""
+請求合併 (single-flight)：同一時間、相同 key 的計算只做一次，其他人等同一個結果。
+
+例如好幾個分頁同時打開總覽，每個 GET /stocks/ 本來都會各自去 Yahoo 抓同一批報價、
+各自重算一次庫存損益；合併後只有第一個請求真的計算，其他請求直接拿它的結果。
+
+- key 由呼叫端決定，要包含「路徑 + 參數 + 使用者」，不同使用者絕對不能共用
+- 計算跑在獨立的 task 裡：發起的請求中途斷線 (被取消) 不會連帶取消其他人在等的結果
+- 不做快取：計算一結束就從表裡移除，下一個請求會重新算 (拿到的永遠是最新資料)
+- 計算不能用某個請求的 Session (那個請求結束就關了)，要自己開，見 database.with_read_session
+- 全部在 event loop 裡執行，不需要上鎖
+"""
+import asyncio
+from APP import metrics
+
+_inflight: dict[tuple, asyncio.Task] = {}
+
+
+def _forget(key, task):
+    if _inflight.get(key) is task:
+        del _inflight[key]
+    # 發起的請求被取消時，例外可能沒人讀，先讀掉避免 "exception was never retrieved" 警告
+    if not task.cancelled():
+        task.exception()
+
+async def run(key: tuple, fn, *args):
+    """執行 fn(*args)；如果相同 key 的計算正在進行中，就等它的結果"""
+    task = _inflight.get(key)
+    if task is None:
+        metrics.singleflight_requests.inc(key[0], "leader")
+        task = asyncio.ensure_future(fn(*args))
+        _inflight[key] = task
+        task.add_done_callback(lambda t: _forget(key, t))
+    else:
+        metrics.singleflight_requests.inc(key[0], "shared")
+    # shield：自己被取消時只是不等了，計算照常跑完給其他人
+    return await asyncio.shield(task)
@@ -0,0 +1,78 @@
+"""
+API 啟動成本分析：
+1. import-time：用 python -X importtime 在乾淨的子程序載入 APP.main，依模組 / 套件列出耗時
+2. lifespan：實際跑一次啟動流程 (檢查資料庫版本、補跑排程)，量測接請求前還要等多久
+
+用法：python -m APP --profile-startup [--top 20]
+"""
+import asyncio
+import subprocess
+import sys
+import time
+from collections import defaultdict
+
+APP_MODULE = "APP.main"
+
+
+def import_times(module: str = APP_MODULE) -> list[tuple[str, int, int]]:
+    """回傳 [(模組, 自身耗時 us, 累計耗時 us)]，在子程序執行，才不會被目前程序已載入的模組影響"""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True, text=True
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"載入 {module} 失敗:\n{proc.stderr[-2000:]}")
+
+    rows = []
+    for line in proc.stderr.splitlines():
+        # 格式: "import time:  self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "[us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def _print_table(title: str, rows, top: int):
+    print(f"\n{title}")
+    print(f"{'ms':>9}  模組")
+    for name, us in rows[:top]:
+        print(f"{us / 1000:9.1f}  {name}")
+
+def report_imports(top: int):
+    rows = import_times()
+    total = next((cum for name, _, cum in rows if name == APP_MODULE), sum(s for _, s, _ in rows))
+    print(f"import {APP_MODULE}: {total / 1000:.1f} ms (共 {len(rows)} 個模組)")
+
+    # 依第三方套件加總 (看是哪個依賴最拖)
+    by_package = defaultdict(int)
+    for name, self_us, _ in rows:
+        by_package[name.split(".")[0]] += self_us
+    _print_table("依套件 (自身耗時加總):", sorted(by_package.items(), key=lambda x: -x[1]), top)
+
+    # 專案自己的模組 (累計耗時 = 連同它引入的依賴)
+    own = [(name, cum) for name, _, cum in rows if name.split(".")[0] == "APP"]
+    _print_table("專案模組 (累計耗時):", sorted(own, key=lambda x: -x[1]), top)
+
+async def _run_lifespan(app):
+    start = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+    return ready - start, time.perf_counter() - ready
+
+def report_lifespan():
+    start = time.perf_counter()
+    from APP.main import app
+    imported = time.perf_counter() - start
+
+    try:
+        startup, shutdown = asyncio.run(_run_lifespan(app))
+    except Exception as e:
+        print(f"\nlifespan: 啟動失敗 ({type(e).__name__}: {e})")
+        return
+    print(f"\n本程序 import: {imported * 1000:.1f} ms")
+    print(f"lifespan 啟動 (版本檢查 + 排程補跑): {startup * 1000:.1f} ms")
+    print(f"lifespan 關閉: {shutdown * 1000:.1f} ms")
+
+def profile_startup(top: int = 20):
+    report_imports(top)
+    report_lifespan()
@@ -0,0 +1,68 @@
+"""
+多租戶：每一筆資料都屬於某個使用者 (user_id)。
+
+- API 請求的使用者由 X-User-Id header 決定，但只有帶著正確的 X-Gateway-Secret 才算數：
+  header 是用戶端自己填的，誰都能改；只有前面的登入閘道 / 反向代理 (知道 GATEWAY_SECRET) 帶進來的才能信
+- 沒有設定 GATEWAY_SECRET 就是單人模式：所有請求都是使用者 1，指定其他使用者直接拒絕
+- get_db 開出來的 Session 會記住 user_id (session.info["user_id"])，之後：
+  * 所有 ORM 查詢 / 批次更新 / 刪除自動加上 WHERE user_id = ?
+  * 新增的物件自動填上 user_id
+- 直接寫 Core SQL (例如 upsert) 的地方要自己用 tenant_id(db) 帶條件
+- 沒有 user_id 的 Session (例如排程找出有哪些使用者) 不會被限制，只給系統內部使用
+"""
+import hmac
+import os
+from fastapi import Header, HTTPException
+from sqlalchemy import Column, Integer, event
+from sqlalchemy.orm import Session, with_loader_criteria
+
+# 單人使用 (沒有登入閘道) 時，所有資料都算這個使用者的
+DEFAULT_USER_ID = 1
+# 登入閘道跟後端共用的密鑰 (閘道驗證完使用者後，連同 X-User-Id 一起帶進來)
+GATEWAY_SECRET = os.getenv("GATEWAY_SECRET") or None
+
+
+class TenantMixin:
+    # 資料屬於哪個使用者 (複合主鍵的表會在類別裡改成 primary_key=True)
+    user_id = Column(Integer, nullable=False)
+
+
+def get_user_id(
+    x_user_id: int | None = Header(None, gt=0),
+    x_gateway_secret: str | None = Header(None)
+) -> int:
+    if GATEWAY_SECRET is None:
+        if x_user_id not in (None, DEFAULT_USER_ID):
+            raise HTTPException(status_code=401, detail="單人模式 (沒有設定 GATEWAY_SECRET) 不能指定其他使用者")
+        return DEFAULT_USER_ID
+    if x_gateway_secret is None or not hmac.compare_digest(x_gateway_secret.encode(), GATEWAY_SECRET.encode()):
+        raise HTTPException(status_code=401, detail="請透過登入閘道存取")
+    if x_user_id is None:
+        raise HTTPException(status_code=401, detail="缺少 X-User-Id")
+    return x_user_id
+
+def tenant_id(db) -> int:
+    """目前 Session 所屬的使用者 (寫 Core SQL 時用)"""
+    user_id = db.info.get("user_id")
+    if user_id is None:
+        raise RuntimeError("這個 Session 沒有指定使用者")
+    return user_id
+
+@event.listens_for(Session, "do_orm_execute")
+def _scope_to_tenant(execute_state):
+    user_id = execute_state.session.info.get("user_id")
+    if user_id is None or execute_state.is_column_load or execute_state.is_relationship_load:
+        return
+    if execute_state.is_select or execute_state.is_update or execute_state.is_delete:
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(TenantMixin, lambda cls: cls.user_id == user_id, include_aliases=True)
+        )
+
+@event.listens_for(Session, "before_flush")
+def _assign_tenant(session, flush_context, instances):
+    user_id = session.info.get("user_id")
+    if user_id is None:
+        return
+    for obj in session.new:
+        if isinstance(obj, TenantMixin) and obj.user_id is None:
+            obj.user_id = user_id
@@ -0,0 +1,51 @@
+"""
+獨立的背景工作程序 (API 那邊設 JOB_WORKERS=0，工作全部交給這裡)：
+
+    python -m APP.worker                 # worker 數預設同 JOB_WORKERS
+    python -m APP.worker --concurrency 4
+
+可以同時開好幾個，也可以跟 API 內建的 worker 一起跑 (見 APP/job_queue.py)。
+Ctrl+C / SIGTERM 會等手上的工作做完再結束。
+只支援 PostgreSQL：SQLite 的快取失效通知出不了程序 (見 APP/cache_bus.py)，
+這裡更新的彙總 API 那邊永遠不會知道；SQLite 請用 API 內建的 worker (JOB_WORKERS >= 1)。
+"""
+import argparse
+import asyncio
+import logging
+import signal
+import sys
+from APP import migrations
+from APP.database import dispose_engines, engine
+from APP.job_queue import JOB_WORKERS, worker_pool
+
+logger = logging.getLogger("APP.worker")
+
+
+async def main(concurrency: int):
+    await migrations.verify(engine)
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+
+    await worker_pool.start(concurrency)
+    logger.info("背景工作 worker 已啟動 (%s 個)", concurrency)
+    try:
+        await stop.wait()
+    finally:
+        await worker_pool.stop()
+        await dispose_engines()
+    logger.info("背景工作 worker 已停止")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m APP.worker", description="背景工作 worker")
+    parser.add_argument("--concurrency", type=int, default=max(JOB_WORKERS, 1), help="同時處理幾個工作")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        sys.exit("獨立 worker 需要 PostgreSQL (SQLite 沒有跨程序的快取失效通知)，請改用 API 內建的 worker (JOB_WORKERS >= 1)")
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    asyncio.run(main(args.concurrency))
@@ -0,0 +1,48 @@
+"""
+比較兩次效能測試的結果 (中位數)：
+    python -m benchmarks.compare benchmarks/results/舊.json benchmarks/results/新.json [--threshold 10]
+變慢超過 threshold% 的項目會標出來，並以 exit code 1 結束 (可以放進 CI)。
+"""
+import argparse
+import json
+import sys
+
+
+def _medians(result: dict) -> dict:
+    return {
+        (run["size"], name): stats["median_ms"]
+        for run in result["runs"]
+        for name, stats in run["endpoints"].items()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.compare", description="比較兩次效能測試")
+    parser.add_argument("base")
+    parser.add_argument("head")
+    parser.add_argument("--threshold", type=float, default=10.0, help="變慢超過幾 %% 算退步 (預設 10)")
+    args = parser.parse_args()
+
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+    before, after = _medians(base), _medians(head)
+
+    print(f"{base.get('commit')} -> {head.get('commit')}")
+    print(f"{'筆數':>10}  {'端點':16} {'之前 ms':>10} {'之後 ms':>10} {'變化':>8}")
+    regressions = 0
+    for key in sorted(before.keys() & after.keys()):
+        size, name = key
+        change = (after[key] - before[key]) / before[key] * 100 if before[key] else 0.0
+        flag = ""
+        if change > args.threshold:
+            flag = "  ⚠️ 變慢"
+            regressions += 1
+        print(f"{size:>10,}  {name:16} {before[key]:10.2f} {after[key]:10.2f} {change:+7.1f}%{flag}")
+
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+API 端點效能測試：在 1k / 100k / 1M 筆資料下量測各端點的回應時間。
+
+    python -m benchmarks.endpoints                      # 預設 1000,100000,1000000 筆，暫存 SQLite
+    python -m benchmarks.endpoints --sizes 1000,100000 --repeat 30
+    python -m benchmarks.endpoints --database-url postgresql://...   # 用 Postgres (會清空 BENCH_USER_ID 的資料)
+
+每個資料量在獨立的子程序裡跑 (引擎在 import 時就依 DATABASE_URL 建好)，
+股價用固定的假報價，不連網。結果寫成 JSON (含 commit 編號)，可以跨 commit 比較：
+    python -m benchmarks.compare benchmarks/results/舊.json benchmarks/results/新.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import secrets
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+BENCH_USER_ID = 4242  # 專門給效能測試用的使用者，不會碰到真的資料
+RESULTS_DIR = Path(__file__).parent / "results"
+
+# (名稱, 方法, 路徑, body)
+ENDPOINTS = [
+    ("expenses_list", "GET", "/expenses/", None),
+    ("annual_summary", "GET", "/expenses/annual_summary", None),
+    ("stocks_list", "GET", "/stocks/", None),
+    ("sell_smart", "POST", "/stocks/sell/smart", {"symbol": "2330", "shares": 1, "price": 600}),
+    ("achievements", "GET", "/achievements/", None),
+    ("budget", "GET", "/budget/", None),
+]
+
+
+def _git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def summarize(samples_ms: list[float]) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "runs": len(ordered),
+        "min_ms": round(ordered[0], 3),
+        "median_ms": round(statistics.median(ordered), 3),
+        "p95_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        "mean_ms": round(statistics.fmean(ordered), 3),
+    }
+
+
+# --- 子程序：準備資料並量測 ---
+
+async def stub_quotes(symbols):
+    # 固定的假報價 (依代號算出來，每次都一樣)
+    return {s: float(100 + sum(map(ord, s)) % 900) for s in symbols}
+
+def run_size(size: int, repeat: int, warmup: int) -> dict:
+    from unittest.mock import patch
+    from fastapi.testclient import TestClient
+    from APP import migrations
+    from APP.database import engine
+    from APP.services import quote_service
+    from benchmarks.seed import seed
+
+    async def prepare():
+        await migrations.upgrade(engine)
+        start = time.perf_counter()
+        # 庫存與代號數跟著資料量放大 (1k -> 20 筆 / 1M -> 2 萬筆)
+        lots = max(20, size // 50)
+        info = await seed(BENCH_USER_ID, expenses=size, years=3, lots=lots, symbols=20)
+        info["seed_seconds"] = round(time.perf_counter() - start, 2)
+        await engine.dispose()
+        return info
+
+    info = asyncio.run(prepare())
+    headers = {"X-User-Id": str(BENCH_USER_ID), "X-Gateway-Secret": os.environ["GATEWAY_SECRET"]}
+    results = {}
+    from APP.main import app
+    with patch.object(quote_service, "get_quotes", stub_quotes), TestClient(app) as client:
+        for name, method, path, body in ENDPOINTS:
+            samples = []
+            for i in range(warmup + repeat):
+                start = time.perf_counter()
+                res = client.request(method, path, json=body, headers=headers)
+                elapsed = (time.perf_counter() - start) * 1000
+                if res.status_code >= 400:
+                    raise RuntimeError(f"{method} {path} 回應 {res.status_code}: {res.text[:200]}")
+                if i >= warmup:
+                    samples.append(elapsed)
+            results[name] = summarize(samples)
+    return {"size": size, "dataset": info, "endpoints": results}
+
+# --- 主程序：每個資料量開一個子程序 ---
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.endpoints", description="API 端點效能測試")
+    parser.add_argument("--sizes", default=",".join(map(str, DEFAULT_SIZES)), help="資料筆數，逗號分隔")
+    parser.add_argument("--repeat", type=int, default=20, help="每個端點量測幾次")
+    parser.add_argument("--warmup", type=int, default=3, help="量測前先跑幾次暖身 (不計入)")
+    parser.add_argument("--database-url", help="指定資料庫 (預設每個資料量各用一個暫存 SQLite 檔)")
+    parser.add_argument("--out", help="結果檔路徑 (預設 benchmarks/results/<commit>.json)")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)  # 子程序用
+    args = parser.parse_args()
+
+    if args.worker_size is not None:
+        print(json.dumps(run_size(args.worker_size, args.repeat, args.warmup)))
+        return
+
+    # 量測用的使用者要經過閘道驗證 (見 APP/tenancy.py)，沒有設定就臨時產生一把
+    os.environ.setdefault("GATEWAY_SECRET", secrets.token_hex(16))
+    commit = _git_commit()
+    runs = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.sizes.split(",")):
+            url = args.database_url or f"sqlite:///{Path(tmp) / f'bench_{size}.db'}"
+            env = {**os.environ, "DATABASE_URL": url, "SCHEDULER_ENABLED": "0", "QUERY_PROFILE": "0"}
+            print(f"[{size:,} 筆] 準備資料與量測中...", file=sys.stderr)
+            proc = subprocess.run(
+                [sys.executable, "-m", "benchmarks.endpoints", "--worker-size", str(size),
+                 "--repeat", str(args.repeat), "--warmup", str(args.warmup)],
+                env=env, capture_output=True, text=True, cwd=Path(__file__).parent.parent
+            )
+            if proc.returncode != 0:
+                sys.exit(f"{size} 筆的量測失敗:\n{proc.stderr[-3000:]}")
+            run = json.loads(proc.stdout.strip().splitlines()[-1])
+            runs.append(run)
+            for name, stats in run["endpoints"].items():
+                print(f"  {name:16} median {stats['median_ms']:9.2f} ms   p95 {stats['p95_ms']:9.2f} ms", file=sys.stderr)
+
+    result = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "database": "custom" if args.database_url else "sqlite",
+        "repeat": args.repeat,
+        "runs": runs,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"{commit or 'unknown'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"結果已寫入 {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+壓力測試：對本機的 uvicorn 送混合流量，逐步加大併發數，看吞吐量、延遲分布與錯誤率。
+
+    python -m benchmarks.load                                   # 暫存 SQLite + 合成資料
+    python -m benchmarks.load --concurrency 1,8,32,128 --duration 15 --quote-latency-ms 300
+    python -m benchmarks.load --url http://127.0.0.1:8000       # 打已經在跑的服務 (不另外啟動)
+
+流程：
+1. 啟動本機假報價服務 (模擬 Yahoo 的回應與延遲)，uvicorn 透過 QUOTE_API_URL 指向它
+2. 準備資料庫 (升級 + benchmarks.seed)，啟動 uvicorn
+3. 每個併發等級跑 --duration 秒，同時用一條「探針」持續打最輕的 GET /：
+   探針延遲暴增代表 event loop 或執行緒池被卡住 (例如同步阻塞的外部呼叫)，不是單純排隊
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import secrets
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+import httpx
+from benchmarks.endpoints import BENCH_USER_ID, RESULTS_DIR, _git_commit
+
+# 流量組成: 名稱 -> (權重, 方法, 路徑, body)
+WORKLOAD = {
+    "dashboard": (40, "GET", "/overview/", None),
+    "stocks_list": (30, "GET", "/stocks/", None),
+    "expense_insert": (15, "POST", "/expenses/", None),  # body 每次產生
+    "achievements": (10, "GET", "/achievements/", None),
+    "sell_smart": (5, "POST", "/stocks/sell/smart", {"symbol": "2330", "shares": 1, "price": 600}),
+}
+DEFAULT_CONCURRENCY = (1, 4, 16, 64)
+PROBE_INTERVAL = 0.05  # 秒
+# 探針 p95 超過基準的幾倍，就判定為阻塞
+BLOCKED_FACTOR = 10
+
+
+# --- 假報價服務 ---
+
+def start_quote_stub(latency_ms: float) -> tuple[ThreadingHTTPServer, str]:
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(latency_ms / 1000)
+            ticker = self.path.split("?")[0].rsplit("/", 1)[-1]
+            price = float(100 + sum(map(ord, ticker)) % 900)
+            body = json.dumps({"chart": {"result": [{"meta": {"regularMarketPrice": price}}]}}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v8/finance/chart/{{ticker}}"
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# --- 啟動被測服務 ---
+
+def start_server(env: dict, port: int, expenses: int, lots: int) -> subprocess.Popen:
+    root = Path(__file__).parent.parent
+    for cmd in (
+        [sys.executable, "-m", "APP.migrations", "upgrade"],
+        [sys.executable, "-m", "benchmarks.seed", "--expenses", str(expenses), "--lots", str(lots),
+         "--symbols", "20", "--user-id", str(BENCH_USER_ID)],
+    ):
+        subprocess.run(cmd, env=env, cwd=root, check=True, capture_output=True)
+
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "APP.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        env=env, cwd=root
+    )
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            if httpx.get(f"http://127.0.0.1:{port}/", timeout=1).status_code == 200:
+                return proc
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("uvicorn 30 秒內沒有啟動完成")
+
+
+# --- 產生流量 ---
+
+def percentile(ordered: list[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+def _latency_stats(samples: list[float]) -> dict:
+    ordered = sorted(samples)
+    return {
+        "p50_ms": round(percentile(ordered, 50), 2),
+        "p95_ms": round(percentile(ordered, 95), 2),
+        "p99_ms": round(percentile(ordered, 99), 2),
+        "mean_ms": round(statistics.fmean(ordered), 2) if ordered else 0.0,
+    }
+
+async def _worker(client, stop_at, rng, latencies, errors):
+    names = list(WORKLOAD)
+    weights = [WORKLOAD[n][0] for n in names]
+    while time.perf_counter() < stop_at:
+        name = rng.choices(names, weights=weights)[0]
+        _, method, path, body = WORKLOAD[name]
+        if name == "expense_insert":
+            body = {"amount": rng.randint(50, 800), "category": "飲食", "description": "load test",
+                    "date": date.today().isoformat()}
+
+        start = time.perf_counter()
+        try:
+            res = await client.request(method, path, json=body)
+            if res.status_code >= 400:
+                errors[name][str(res.status_code)] += 1
+        except httpx.HTTPError as e:
+            errors[name][type(e).__name__] += 1
+        latencies[name].append((time.perf_counter() - start) * 1000)
+
+async def _probe(client, stop_at, samples):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        try:
+            await client.get("/")
+        except httpx.HTTPError:
+            pass
+        samples.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(PROBE_INTERVAL)
+
+async def run_level(base_url: str, concurrency: int, duration: float, seed: int) -> dict:
+    latencies, errors, probe = defaultdict(list), defaultdict(lambda: defaultdict(int)), []
+    limits = httpx.Limits(max_connections=concurrency + 1, max_keepalive_connections=concurrency + 1)
+    headers = {"X-User-Id": str(BENCH_USER_ID), "X-Gateway-Secret": os.environ["GATEWAY_SECRET"]}
+    async with httpx.AsyncClient(base_url=base_url, headers=headers, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        stop_at = started + duration
+        await asyncio.gather(
+            _probe(client, stop_at, probe),
+            *(_worker(client, stop_at, random.Random(seed + i), latencies, errors) for i in range(concurrency))
+        )
+        # 最後一批請求會超過 duration 才回來，用實際經過的時間算吞吐量
+        elapsed = time.perf_counter() - started
+
+    total = sum(len(v) for v in latencies.values())
+    failed = sum(sum(e.values()) for e in errors.values())
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "throughput_rps": round(total / elapsed, 1),
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        **_latency_stats([x for v in latencies.values() for x in v]),
+        "probe": _latency_stats(probe),
+        "operations": {
+            name: {"requests": len(samples), "errors": dict(errors[name]), **_latency_stats(samples)}
+            for name, samples in latencies.items()
+        },
+    }
+
+def diagnose(levels: list[dict]) -> list[str]:
+    """從各等級的結果找出飽和點與阻塞跡象"""
+    notes = []
+    baseline = levels[0]["probe"]["p95_ms"] or 0.1
+    for prev, cur in zip(levels, levels[1:]):
+        gain = cur["throughput_rps"] / prev["throughput_rps"] if prev["throughput_rps"] else 0
+        if gain < 1.1:
+            notes.append(
+                f"併發 {prev['concurrency']} -> {cur['concurrency']} 吞吐量幾乎沒有增加 ({gain:.2f}x)，"
+                f"已經飽和，多出來的請求只是在排隊 (p95 {prev['p95_ms']} -> {cur['p95_ms']} ms)"
+            )
+            break
+    for level in levels:
+        if level["probe"]["p95_ms"] > baseline * BLOCKED_FACTOR:
+            notes.append(
+                f"併發 {level['concurrency']} 時連最輕的 GET / 都要 {level['probe']['p95_ms']} ms "
+                f"(基準 {baseline} ms)：event loop 或執行緒池被卡住，檢查是否有同步阻塞的呼叫"
+            )
+            break
+    return notes
+
+
+def main():
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.load", description="混合流量壓力測試")
+    parser.add_argument("--concurrency", default=",".join(map(str, DEFAULT_CONCURRENCY)), help="併發等級，逗號分隔")
+    parser.add_argument("--duration", type=float, default=10, help="每個等級跑幾秒")
+    parser.add_argument("--expenses", type=int, default=50000, help="合成資料的帳務筆數")
+    parser.add_argument("--lots", type=int, default=500, help="合成資料的庫存筆數")
+    parser.add_argument("--quote-latency-ms", type=float, default=200, help="假報價服務的回應延遲")
+    parser.add_argument("--database-url", help="指定資料庫 (預設暫存 SQLite)")
+    parser.add_argument("--url", help="直接打已經在跑的服務 (不啟動 uvicorn、不準備資料)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="結果檔路徑 (預設 benchmarks/results/load-<commit>.json)")
+    args = parser.parse_args()
+
+    # 量測用的使用者要經過閘道驗證 (見 APP/tenancy.py)；打外部服務 (--url) 時請設定跟它一樣的 GATEWAY_SECRET
+    os.environ.setdefault("GATEWAY_SECRET", secrets.token_hex(16))
+    stub, quote_url = start_quote_stub(args.quote_latency_ms)
+    server = None
+    tmp = tempfile.TemporaryDirectory()
+    try:
+        base_url = args.url
+        if base_url is None:
+            port = _free_port()
+            env = {
+                **os.environ,
+                "DATABASE_URL": args.database_url or f"sqlite:///{Path(tmp.name) / 'load.db'}",
+                "QUOTE_API_URL": quote_url,
+                "SCHEDULER_ENABLED": "0",
+                "QUERY_PROFILE": "0",
+            }
+            print("準備資料並啟動 uvicorn...", file=sys.stderr)
+            server = start_server(env, port, args.expenses, args.lots)
+            base_url = f"http://127.0.0.1:{port}"
+
+        levels = []
+        for concurrency in map(int, args.concurrency.split(",")):
+            level = asyncio.run(run_level(base_url, concurrency, args.duration, args.seed))
+            levels.append(level)
+            print(
+                f"併發 {concurrency:4}: {level['throughput_rps']:8.1f} req/s  "
+                f"p50 {level['p50_ms']:8.1f}  p95 {level['p95_ms']:8.1f}  p99 {level['p99_ms']:8.1f} ms  "
+                f"錯誤率 {level['error_rate']:.2%}  探針 p95 {level['probe']['p95_ms']:.1f} ms",
+                file=sys.stderr
+            )
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait(timeout=10)
+        stub.shutdown()
+        tmp.cleanup()
+
+    notes = diagnose(levels)
+    for note in notes:
+        print(f"⚠️ {note}", file=sys.stderr)
+
+    commit = _git_commit()
+    result = {
+        "commit": commit,
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "duration": args.duration,
+        "quote_latency_ms": args.quote_latency_ms,
+        "workload": {name: w[0] for name, w in WORKLOAD.items()},
+        "levels": levels,
+        "diagnosis": notes,
+    }
+    out = Path(args.out) if args.out else RESULTS_DIR / f"load-{commit or 'unknown'}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"結果已寫入 {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+"""
+合成資料產生器：固定亂數種子，同樣的參數每次都產生一模一樣的資料 (跨 commit 比較才有意義)。
+
+用法 (寫入 DATABASE_URL 指向的資料庫，資料庫要先升級到最新版)：
+    python -m benchmarks.seed --expenses 100000 --years 3 --lots 200 --symbols 20
+
+注意：會先清掉 --user-id 這個使用者原本的所有資料。
+"""
+import argparse
+import asyncio
+import random
+from datetime import date, datetime, timedelta
+from sqlalchemy import delete, insert
+from APP import migrations, models
+from APP.database import SessionLocal, engine
+from APP.services import achievement_service, settlement_service
+
+# 分類: (權重, 最小金額, 最大金額)
+EXPENSE_CATEGORIES = {
+    "飲食": (40, 50, 800),
+    "交通": (15, 20, 1500),
+    "購物": (12, 100, 5000),
+    "娛樂": (10, 100, 3000),
+    "居住": (5, 3000, 25000),
+    "醫療": (4, 100, 4000),
+    "教育": (4, 300, 8000),
+    "其他": (10, 20, 2000),
+}
+INCOME_CATEGORIES = {
+    "薪水": (70, 30000, 80000),
+    "獎金": (10, 5000, 50000),
+    "投資獲利": (20, 100, 20000),
+}
+INCOME_RATIO = 0.08  # 大約每 12 筆有一筆是收入
+
+# 常見的台股 / 美股代號，不夠再補流水號
+SYMBOLS = [
+    "2330", "2317", "2454", "0050", "0056", "2881", "2882", "2412", "1301", "2002",
+    "AAPL", "MSFT", "NVDA", "TSLA", "GOOGL", "AMZN", "META", "VOO", "QQQ", "TSM",
+]
+
+CHUNK_SIZE = 10000
+
+
+def _pick(rng: random.Random, categories: dict):
+    names = list(categories)
+    name = rng.choices(names, weights=[categories[n][0] for n in names])[0]
+    _, low, high = categories[name]
+    return name, rng.randint(low, high)
+
+def generate_expenses(rng: random.Random, n: int, years: int, today: date, user_id: int):
+    """n 筆帳，平均分布在最近 years 年 (到今天為止)"""
+    days = years * 365
+    for i in range(n):
+        d = today - timedelta(days=rng.randrange(days))
+        if rng.random() < INCOME_RATIO:
+            record_type = "income"
+            category, amount = _pick(rng, INCOME_CATEGORIES)
+        else:
+            record_type = "expense"
+            category, amount = _pick(rng, EXPENSE_CATEGORIES)
+        yield {
+            "user_id": user_id, "amount": amount, "category": category,
+            "description": f"{category} #{i}", "date": d, "record_type": record_type,
+            # 建立時間跟帳務日期一致 (舊帳都已經過了 12 小時的鎖定期)
+            "created_at": datetime.combine(d, datetime.min.time()) + timedelta(hours=12),
+        }
+
+def symbol_names(count: int) -> list[str]:
+    return SYMBOLS[:count] + [f"S{i:04d}" for i in range(max(0, count - len(SYMBOLS)))]
+
+def generate_lots(rng: random.Random, k: int, symbols: list[str], user_id: int):
+    """k 筆庫存，分散在各代號 (每個代號至少一筆)；同一代號的成本在基準價上下 30% 浮動"""
+    base = {s: rng.uniform(20, 1000) for s in symbols}
+    for i in range(k):
+        symbol = symbols[i] if i < len(symbols) else rng.choice(symbols)
+        yield {
+            "user_id": user_id, "symbol": symbol,
+            "shares": rng.choice((100, 200, 500, 1000)) if symbol.isdigit() else rng.randint(1, 50),
+            "average_cost": round(base[symbol] * rng.uniform(0.7, 1.3), 2),
+            "created_at": datetime.now() - timedelta(days=rng.randrange(365)),
+        }
+
+async def _insert_chunks(conn, table, rows):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= CHUNK_SIZE:
+            await conn.execute(insert(table), chunk)
+            chunk = []
+    if chunk:
+        await conn.execute(insert(table), chunk)
+
+async def seed(user_id: int = 1, expenses: int = 1000, years: int = 3, lots: int = 50, symbols: int = 10,
+               seed: int = 42, today: date | None = None) -> dict:
+    today = today or date.today()
+    rng = random.Random(seed)
+    symbol_list = symbol_names(symbols)
+
+    async with engine.begin() as conn:
+        # 先清掉這個使用者的舊資料
+        for table in models.Base.metadata.sorted_tables:
+            if "user_id" in table.c:
+                await conn.execute(delete(table).where(table.c.user_id == user_id))
+
+        await _insert_chunks(conn, models.Expense.__table__, generate_expenses(rng, expenses, years, today, user_id))
+        await _insert_chunks(conn, models.Stock.__table__, generate_lots(rng, lots, symbol_list, user_id))
+        # 預算：每年年初調整一次
+        await conn.execute(insert(models.Budget.__table__), [
+            {
+                "user_id": user_id, "monthly_limit": rng.randrange(20000, 60000, 1000),
+                "updated_at": datetime(today.year - y, 1, 1), "effective_from": date(today.year - y, 1, 1),
+            }
+            for y in range(years, -1, -1)
+        ])
+
+    # 重建彙總表與成就狀態，並把已結束的月份結算掉 (跟正式環境跑過排程後的狀態一樣)
+    async with SessionLocal(info={"user_id": user_id}) as db:
+        await achievement_service.get_state(db)
+        await db.commit()
+        settled = await settlement_service.settle_due_months(db, today)
+
+    return {"expenses": expenses, "lots": lots, "symbols": len(symbol_list), "settled_months": len(settled)}
+
+
+async def main(args):
+    try:
+        await migrations.verify(engine)
+        result = await seed(args.user_id, args.expenses, args.years, args.lots, args.symbols, args.seed)
+        print(f"已產生: {result}")
+    finally:
+        await engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.seed", description="產生合成測試資料")
+    parser.add_argument("--expenses", type=int, default=1000, help="帳務筆數")
+    parser.add_argument("--years", type=int, default=3, help="分布在最近幾年")
+    parser.add_argument("--lots", type=int, default=50, help="股票庫存筆數")
+    parser.add_argument("--symbols", type=int, default=10, help="股票代號數量")
+    parser.add_argument("--user-id", type=int, default=1, help="寫入哪個使用者 (會先清空他的資料)")
+    parser.add_argument("--seed", type=int, default=42, help="亂數種子")
+    asyncio.run(main(parser.parse_args()))
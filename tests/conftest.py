@@ -0,0 +1,114 @@
+"""
+測試共用：整個測試過程用一個暫存的 SQLite 資料庫 (跟 benchmarks 一樣，透過 DATABASE_URL 指定)。
+每個測試用自己的使用者 (X-User-Id)，資料彼此看不到，不必每次重建資料庫。
+背景工作不自動跑 (JOB_WORKERS=0)，測試自己呼叫 drain() 處理完，結果才是確定的。
+"""
+import asyncio
+import itertools
+import os
+import tempfile
+from datetime import date
+from pathlib import Path
+
+# 一定要在 import APP 之前設定 (engine 在 import 時就建好了)
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{Path(_tmp.name) / 'test.db'}"
+os.environ["SCHEDULER_ENABLED"] = "0"
+os.environ["JOB_WORKERS"] = "0"
+os.environ["QUERY_PROFILE"] = "0"
+os.environ["GATEWAY_SECRET"] = GATEWAY_SECRET = "test-gateway-secret"
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import func, select
+from APP import job_queue, migrations, models
+from APP.database import SessionLocal, engine
+from APP.main import app
+
+_user_ids = itertools.count(1000)
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    async def upgrade():
+        # 跟 python -m APP.migrations upgrade 一樣；連線跟著這個 loop 一起收掉，之後 app 自己再開
+        try:
+            await migrations.upgrade(engine)
+        finally:
+            await engine.dispose()
+
+    asyncio.run(upgrade())
+    yield
+    _tmp.cleanup()
+
+
+@pytest.fixture(scope="session")
+def app_client(database):
+    with TestClient(app, headers={"X-Gateway-Secret": GATEWAY_SECRET}) as client:
+        yield client
+
+
+@pytest.fixture
+def user_id():
+    return next(_user_ids)
+
+
+@pytest.fixture
+def client(app_client, user_id):
+    app_client.headers["X-User-Id"] = str(user_id)
+    return app_client
+
+
+@pytest.fixture
+def run(app_client):
+    """在 app 的 event loop 裡執行 async 函式 (資料庫連線都屬於那個 loop)"""
+    def call(fn, *args):
+        return app_client.portal.call(fn, *args)
+    return call
+
+
+async def _drain():
+    while (job := await job_queue._claim()) is not None:
+        await job_queue._run(job)
+
+
+@pytest.fixture
+def drain(run):
+    """把佇列裡的背景工作全部處理完"""
+    return lambda: run(_drain)
+
+
+@pytest.fixture
+def session(run, user_id):
+    """run(session(fn)) -> 在綁定目前使用者的 Session 裡執行 fn(db)"""
+    def bind(fn):
+        async def call():
+            async with SessionLocal(info={"user_id": user_id}) as db:
+                return await fn(db)
+        return call
+    return bind
+
+
+@pytest.fixture
+def add_expense(client):
+    """記一筆帳 (透過 API)，回傳 id"""
+    def post(amount, day=None, category="food"):
+        res = client.post("/expenses/", json={"amount": amount, "category": category, "date": str(day or date.today())})
+        assert res.status_code == 200, res.text
+        return res.json()["id"]
+    return post
+
+
+@pytest.fixture
+def totals(run, session):
+    """目前使用者的 (明細, 月彙總, 日彙總) 各自的 (金額合計, 筆數)，以及成就狀態記的筆數"""
+    async def read(db):
+        def summed(total, count):
+            return select(func.coalesce(func.sum(total), 0), func.coalesce(count, 0))
+        E, M, D = models.Expense, models.MonthlyTotal, models.DailyTotal
+        expenses = (await db.execute(summed(E.amount, func.count()))).one()
+        monthly = (await db.execute(summed(M.total, func.sum(M.count)))).one()
+        daily = (await db.execute(summed(D.total, func.sum(D.count)))).one()
+        state = await db.get(models.AchievementState, db.info["user_id"])
+        return tuple(expenses), tuple(monthly), tuple(daily), state.record_count if state else None
+    return lambda: run(session(read))
@@ -0,0 +1,48 @@
+"""
+成就：規則表的前置順序、門檻判斷，以及 API 讀到的結果。
+"""
+import pytest
+from APP.services import achievement_rules
+from APP.services.achievement_rules import ACHIEVEMENT_RULES, ORDERED_RULES, AchievementRule, crosses_threshold
+
+
+def test_prerequisites_come_first():
+    position = {r.code: i for i, r in enumerate(ORDERED_RULES)}
+    assert sorted(position) == sorted(r.code for r in ACHIEVEMENT_RULES)
+    for rule in ORDERED_RULES:
+        if rule.prerequisite:
+            assert position[rule.prerequisite] < position[rule.code]
+
+
+def test_broken_rule_tables_are_rejected(monkeypatch):
+    unknown_metric = AchievementRule("x", 1, "", "", "", "no_such_metric", 1)
+    with pytest.raises(ValueError):
+        achievement_rules._topological_order([unknown_metric])
+
+    a = AchievementRule("a", 1, "", "", "", "record_count", 1, "b")
+    b = AchievementRule("b", 1, "", "", "", "record_count", 1, "a")
+    monkeypatch.setattr(achievement_rules, "RULES_BY_CODE", {"a": a, "b": b})
+    with pytest.raises(Exception):  # graphlib.CycleError
+        achievement_rules._topological_order([a, b])
+
+
+def test_crosses_threshold():
+    assert crosses_threshold("record_count", 0, 1)
+    assert not crosses_threshold("record_count", 1, 2)
+    assert crosses_threshold("total_savings", 200, 1200)  # 一次跨過 300 和 1000
+    assert not crosses_threshold("total_savings", 1200, 200)
+
+
+def test_new_user_sees_every_rule_locked(client):
+    achievements = client.get("/achievements/").json()
+    assert [a["code"] for a in achievements] == [
+        r.code for r in sorted(ACHIEVEMENT_RULES, key=lambda r: r.tier)  # 同等級內照規則表順序
+    ]
+    assert not any(a["is_unlocked"] for a in achievements)
+
+
+def test_first_expense_unlocks_once_the_job_runs(client, add_expense, drain):
+    add_expense(100)
+    drain()
+    unlocked = {a["code"] for a in client.get("/achievements/").json() if a["is_unlocked"]}
+    assert unlocked == {"first_expense"}
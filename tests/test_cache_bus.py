@@ -0,0 +1,32 @@
+"""
+快取失效通知：commit 之後才送、rollback 不送；別的程序發的通知才處理。
+"""
+from sqlalchemy import text
+from APP import cache_bus
+from APP.services import rollup_service
+
+
+def test_cache_events_are_sent_only_after_commit(run, session, user_id, monkeypatch):
+    seen = []
+    monkeypatch.setitem(cache_bus._subscribers, "test_topic", [seen.append])
+
+    async def publish(db, commit):
+        await cache_bus.publish(db, "test_topic")
+        await cache_bus.publish(db, "test_topic")  # 同一個 transaction 裡只送一次
+        await db.execute(text("SELECT 1"))
+        assert seen == []
+        await (db.commit() if commit else db.rollback())
+
+    run(session(lambda db: publish(db, commit=False)))
+    assert seen == []
+    run(session(lambda db: publish(db, commit=True)))
+    assert seen == [user_id]
+
+
+def test_remote_notifications_skip_our_own(monkeypatch):
+    seen = []
+    monkeypatch.setitem(cache_bus._subscribers, rollup_service.CACHE_TOPIC, [seen.append])
+    cache_bus._on_notify(None, 0, cache_bus.CHANNEL, f'{{"origin": "{cache_bus.ORIGIN}", "topic": "rollups", "user_id": 1}}')
+    cache_bus._on_notify(None, 0, cache_bus.CHANNEL, '{"origin": "other", "topic": "rollups", "user_id": 2}')
+    cache_bus._on_notify(None, 0, cache_bus.CHANNEL, "not json")
+    assert seen == [2]
@@ -0,0 +1,24 @@
+"""
+SQLite 的寫入連線一開始就拿寫入鎖 (BEGIN IMMEDIATE)；只讀主資料庫的 API 不能跟著排隊。
+"""
+import asyncio
+import httpx
+from sqlalchemy import text
+from APP.database import SessionLocal
+from APP.main import app
+from conftest import GATEWAY_SECRET
+
+
+def test_primary_reads_do_not_wait_for_the_write_lock(run, user_id):
+    async def read_while_locked():
+        headers = {"X-Gateway-Secret": GATEWAY_SECRET, "X-User-Id": str(user_id)}
+        transport = httpx.ASGITransport(app=app)
+        async with SessionLocal() as writer, httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as http:
+            await writer.execute(text("SELECT 1"))  # 開始 transaction：寫入鎖到 rollback 才放
+            responses = await asyncio.wait_for(
+                asyncio.gather(http.get("/budget/pace"), http.get("/system/jobs")), timeout=2
+            )
+            await writer.rollback()
+        return [res.status_code for res in responses]
+
+    assert run(read_while_locked) == [200, 200]
@@ -0,0 +1,63 @@
+"""
+記帳 API：寫入之後背景工作更新的彙總要跟明細一致。
+"""
+from datetime import date
+from APP.services.series_service import lttb
+
+
+def test_rollups_follow_adds_and_deletes(client, add_expense, totals, drain):
+    ids = [add_expense(amount) for amount in (100, 200, 300)]
+    assert client.delete(f"/expenses/{ids[1]}").status_code == 204
+    drain()
+
+    expenses, monthly, daily, record_count = totals()
+    assert expenses == monthly == daily == (400, 2)
+    assert record_count == 2
+
+
+def test_readding_after_deleting_newest_expense(client, add_expense, totals, drain):
+    # SQLite 刪掉最新一筆後 id 會被重複使用，重新記的那筆也要算進彙總
+    add_expense(100)
+    newest = add_expense(200)
+    assert client.delete(f"/expenses/{newest}").status_code == 204
+    add_expense(700)
+    drain()
+
+    expenses, monthly, daily, record_count = totals()
+    assert expenses == monthly == daily == (800, 2)
+    assert record_count == 2
+
+
+def test_other_users_cannot_see_or_delete(client, add_expense, user_id):
+    expense_id = add_expense(100)
+    other = {"X-User-Id": str(user_id + 10_000)}
+
+    assert client.get("/expenses/", headers=other).json() == []
+    assert client.delete(f"/expenses/{expense_id}", headers=other).status_code == 404
+    assert [e["id"] for e in client.get("/expenses/").json()] == [expense_id]
+
+
+def test_series_fills_empty_buckets_and_clips_the_first_one(client, add_expense, drain):
+    add_expense(100, date(2026, 1, 15))
+    add_expense(50, date(2026, 1, 20))
+    add_expense(500, date(2026, 3, 2))
+    drain()
+
+    months = client.get("/expenses/series?bucket=month&from=2026-01-16&to=2026-03-31").json()["series"]
+    assert [(p["start"], p["total"]) for p in months["expense"]] == [("2026-01-01", 50), ("2026-02-01", 0), ("2026-03-01", 500)]
+    assert [p["total"] for p in months["income"]] == [0, 0, 0]
+
+    # 週從週一開始 (2026-01-12、01-19 都是週一)
+    weeks = client.get("/expenses/series?bucket=week&from=2026-01-12&to=2026-01-25&type=expense").json()["series"]
+    assert [(p["start"], p["total"]) for p in weeks["expense"]] == [("2026-01-12", 100), ("2026-01-19", 50)]
+
+
+def test_lttb_keeps_endpoints_and_peaks():
+    points = [(x, 0) for x in range(1000)]
+    points[437] = (437, 999)
+    sampled = lttb(points, 20)
+    assert len(sampled) == 20
+    assert sampled[0] == points[0] and sampled[-1] == points[-1]
+    assert (437, 999) in sampled
+    assert [x for x, _ in sampled] == sorted(x for x, _ in sampled)
+    assert lttb(points[:10], 20) == points[:10]
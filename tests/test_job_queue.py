@@ -0,0 +1,73 @@
+"""
+背景工作佇列：冪等鍵去重、失敗延後重試、超過次數標記 failed。
+"""
+from datetime import datetime
+import pytest
+from sqlalchemy import select, update
+from APP import job_queue, models
+
+
+def _jobs(run, session, kind):
+    async def read(db):
+        return (await db.scalars(select(models.Job).where(models.Job.kind == kind).order_by(models.Job.id))).all()
+    return run(session(read))
+
+
+def test_same_key_is_enqueued_once(run, session, drain, monkeypatch):
+    calls = []
+    async def handler(db, payload):
+        calls.append(payload["n"])
+    monkeypatch.setitem(job_queue.HANDLERS, "test_dedupe", handler)
+
+    async def enqueue(db):
+        await job_queue.enqueue(db, "test_dedupe", {"n": 1}, key="same")
+        await job_queue.enqueue(db, "test_dedupe", {"n": 2}, key="same")
+        await db.commit()
+        await job_queue.enqueue(db, "test_dedupe", {"n": 3}, key="same")
+        await job_queue.enqueue(db, "test_dedupe", {"n": 4})
+        await db.commit()
+    run(session(enqueue))
+    drain()
+
+    assert calls == [1, 4]
+    assert [j.status for j in _jobs(run, session, "test_dedupe")] == ["done", "done"]
+
+
+def test_failed_job_is_retried_then_marked_failed(run, session, drain, monkeypatch):
+    async def handler(db, payload):
+        db.add(models.Expense(amount=1, category="should-roll-back", date=datetime.now().date()))
+        await db.flush()
+        raise RuntimeError("boom")
+    monkeypatch.setitem(job_queue.HANDLERS, "test_fail", handler)
+    monkeypatch.setattr(job_queue, "JOB_MAX_ATTEMPTS", 2)
+
+    async def enqueue(db):
+        await job_queue.enqueue(db, "test_fail", {})
+        await db.commit()
+    run(session(enqueue))
+
+    drain()
+    [job] = _jobs(run, session, "test_fail")
+    assert (job.status, job.attempts, job.locked_at) == ("pending", 1, None)
+    assert job.run_after > datetime.now()
+    assert job.last_error == "RuntimeError: boom"
+
+    async def due_now(db):
+        await db.execute(update(models.Job).where(models.Job.id == job.id).values(run_after=datetime.now()))
+        await db.commit()
+    run(session(due_now))
+    drain()
+    [job] = _jobs(run, session, "test_fail")
+    assert (job.status, job.attempts) == ("failed", 2)
+
+    # 失敗的工作寫到一半的資料整個 rollback
+    async def leaked(db):
+        return await db.scalar(select(models.Expense.id).where(models.Expense.category == "should-roll-back"))
+    assert run(session(leaked)) is None
+
+
+def test_unknown_kind_is_rejected(run, session):
+    async def enqueue(db):
+        await job_queue.enqueue(db, "no_such_job", {})
+    with pytest.raises(ValueError):
+        run(session(enqueue))
@@ -0,0 +1,34 @@
+"""
+庫存批次合併：總股數、總成本不變，「先賣低成本」的順序也不變。
+"""
+from sqlalchemy import select
+from APP import models
+
+
+def _lots(run, session):
+    async def read(db):
+        rows = (await db.execute(select(models.Stock.shares, models.Stock.average_cost).order_by(models.Stock.average_cost))).all()
+        return [tuple(r) for r in rows]
+    return run(session(read))
+
+
+def test_compaction_keeps_shares_cost_and_order(client, run, session):
+    for shares, price in ((10, 100), (5, 100), (3, 120), (2, 121), (1, 90)):
+        assert client.post("/stocks/", json={"symbol": "2330", "shares": shares, "price": price}).status_code == 200
+    client.post("/stocks/", json={"symbol": "0050", "shares": 1, "price": 150})
+
+    res = client.post("/stocks/compact?symbol=2330").json()
+    assert res == {"symbols": 1, "lots_before": 5, "lots_after": 4}
+    assert _lots(run, session) == [(1, 90), (15, 100), (3, 120), (2, 121), (1, 150)]
+
+    # 1% 以內的併在一起：成本改成加權平均，總成本不變
+    res = client.post("/stocks/compact?tolerance=0.01").json()
+    assert res == {"symbols": 2, "lots_before": 5, "lots_after": 4}
+    lots = _lots(run, session)
+    assert lots[:2] == [(1, 90), (15, 100)]
+    assert lots[2][0] == 5 and abs(lots[2][1] * 5 - (3 * 120 + 2 * 121)) < 1e-9
+    assert lots[3] == (1, 150)
+
+    # 智慧賣出照樣先賣成本最低的
+    sold = client.post("/stocks/sell/smart", json={"symbol": "2330", "shares": 2, "price": 110}).json()
+    assert sold["realized_profit"] == (110 - 90) + (110 - 100)
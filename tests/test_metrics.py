@@ -0,0 +1,23 @@
+"""
+/metrics：要查資料庫的指標有快取，抓取頻率再高也不會每次都掃表。
+"""
+from APP.routers import metrics as metrics_router
+from APP.services import lot_service
+
+
+def test_db_gauges_are_cached(app_client, monkeypatch):
+    calls = []
+    async def fragmentation():
+        calls.append(1)
+        return {"positions": 2, "lots": 7, "max_lots": 5}
+    monkeypatch.setattr(lot_service, "fragmentation", fragmentation)
+    monkeypatch.setattr(metrics_router, "_db_gauges", {"expires": 0.0, "extra": []})
+
+    for _ in range(3):
+        body = app_client.get("/metrics").text
+        assert "stock_lots 7" in body and 'job_queue_depth{status="pending"}' in body
+    assert len(calls) == 1
+
+    metrics_router._db_gauges["expires"] = 0.0  # 過期之後重算
+    app_client.get("/metrics")
+    assert len(calls) == 2
@@ -0,0 +1,81 @@
+"""
+升級路徑測試：從導入 migration 之前 (baseline) 的資料庫一路升到最新版，既有資料要完整保留。
+"""
+import asyncio
+import sqlite3
+from datetime import date
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from APP import migrations
+from APP.services import budget_service
+
+# baseline 版本 create_all 在 SQLite 上建出來的結構
+BASELINE_SCHEMA = """
+CREATE TABLE expenses (
+    id INTEGER NOT NULL, amount INTEGER NOT NULL, category VARCHAR NOT NULL, description VARCHAR,
+    date DATE NOT NULL, record_type VARCHAR NOT NULL, created_at DATETIME, PRIMARY KEY (id)
+);
+CREATE INDEX ix_expenses_id ON expenses (id);
+CREATE TABLE stocks (
+    id INTEGER NOT NULL, symbol VARCHAR NOT NULL, shares INTEGER NOT NULL, average_cost FLOAT NOT NULL,
+    created_at DATETIME, PRIMARY KEY (id)
+);
+CREATE INDEX ix_stocks_id ON stocks (id);
+CREATE TABLE budget (
+    id INTEGER NOT NULL, monthly_limit INTEGER NOT NULL, updated_at DATETIME, PRIMARY KEY (id)
+);
+CREATE INDEX ix_budget_id ON budget (id);
+CREATE TABLE achievements (
+    id INTEGER NOT NULL, name VARCHAR, description VARCHAR, tier INTEGER, icon VARCHAR, code VARCHAR,
+    is_unlocked BOOLEAN, unlocked_at DATETIME, PRIMARY KEY (id), UNIQUE (name), UNIQUE (code)
+);
+CREATE INDEX ix_achievements_id ON achievements (id);
+
+INSERT INTO expenses VALUES (1, 120, 'food', 'lunch', '2025-03-02', 'expense', '2025-03-02 12:00:00');
+INSERT INTO expenses VALUES (2, 50000, 'salary', NULL, '2025-03-05', 'income', '2025-03-05 09:00:00');
+INSERT INTO stocks VALUES (1, '2330', 10, 580.5, '2025-03-01 10:00:00');
+INSERT INTO budget VALUES (1, 25000, '2025-02-14 20:30:00');
+INSERT INTO achievements VALUES (1, '🔰 起手式', '第一次記帳', 1, '🔰', 'first_expense', 1, '2025-03-02 12:00:00');
+"""
+
+
+def _baseline_db(path):
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.close()
+
+
+def test_upgrade_baseline_database_with_data(tmp_path):
+    path = tmp_path / "baseline.db"
+    _baseline_db(path)
+
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        try:
+            applied = await migrations.upgrade(engine)
+            assert applied == list(range(1, migrations.LATEST_VERSION + 1))
+            await migrations.verify(engine)
+
+            # 既有預算變成「從設定那天開始生效」的版本，屬於使用者 1
+            async with async_sessionmaker(engine)(info={"user_id": 1}) as db:
+                budget = await budget_service.current_budget(db)
+                assert budget.monthly_limit == 25000
+                assert budget.effective_from == date(2025, 2, 14)
+                months = await budget_service.budgets_for_months(db, ["2025-01", "2025-02"])
+                assert months == {"2025-01": budget_service.DEFAULT_MONTHLY_BUDGET, "2025-02": 25000}
+
+            # 再升級一次什麼都不做
+            assert await migrations.upgrade(engine) == []
+        finally:
+            await engine.dispose()
+
+    asyncio.run(run())
+
+    conn = sqlite3.connect(path)
+    assert conn.execute("SELECT id, amount, user_id FROM expenses ORDER BY id").fetchall() == [(1, 120, 1), (2, 50000, 1)]
+    assert conn.execute("SELECT symbol, shares, user_id FROM stocks").fetchall() == [("2330", 10, 1)]
+    assert conn.execute("SELECT code, is_unlocked, user_id FROM achievements").fetchall() == [("first_expense", 1, 1)]
+    budget_columns = {row[1]: row[3] for row in conn.execute("PRAGMA table_info(budget)")}
+    assert budget_columns["effective_from"] == 1  # NOT NULL
+    indexes = {row[1] for row in conn.execute("PRAGMA index_list(budget)")}
+    assert "ix_budget_user_effective_from" in indexes
+    conn.close()
@@ -0,0 +1,39 @@
+"""
+預算進度：加權移動平均推估月底支出；快取要在寫入 (任何程序) commit 之後失效。
+"""
+from datetime import date
+import pytest
+from APP.services import budget_service, pace_service
+
+
+def test_compute_pace(add_expense, run, session, drain):
+    add_expense(300, date(2026, 3, 1))
+    add_expense(140, date(2026, 3, 10))
+    add_expense(9999, date(2026, 2, 1))  # 在 14 天的視窗外
+    drain()
+
+    pace = run(session(lambda db: pace_service.compute_pace(db, date(2026, 3, 10))))
+    budget = budget_service.DEFAULT_MONTHLY_BUDGET
+    # 視窗從 2/25 開始：3/1 權重 5、3/10 權重 14，權重總和 1 + ... + 14 = 105
+    daily_rate = (300 * 5 + 140 * 14) / 105
+    assert pace.month == "2026-03"
+    assert (pace.budget, pace.spent) == (budget, 440)
+    assert pace.allowance == round(budget * 10 / 31)
+    assert pace.daily_rate == round(daily_rate)
+    assert pace.projected_total == round(440 + daily_rate * 21)
+    assert pace.on_track == (440 + daily_rate * 21 <= budget)
+
+
+def test_pace_cache_is_invalidated_after_a_write(client, add_expense, drain):
+    assert client.get("/budget/pace").json()["spent"] == 0
+    add_expense(123)
+    assert client.get("/budget/pace").json()["spent"] == 0  # 彙總還沒更新，快取的還是對的
+    drain()
+    assert client.get("/budget/pace").json()["spent"] == 123
+
+
+@pytest.mark.parametrize("user_id, remaining", [(1, {(2, "d")}), (None, set())])
+def test_pace_invalidate(user_id, remaining, monkeypatch):
+    monkeypatch.setattr(pace_service, "_cache", {(1, "d"): "a", (2, "d"): "b"})
+    pace_service.invalidate(user_id)
+    assert set(pace_service._cache) == remaining
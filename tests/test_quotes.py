@@ -0,0 +1,47 @@
+"""
+報價：整個程序共用一個連線 session；同一代號同時只查一次，快取期間內不再查。
+"""
+import asyncio
+from APP import metrics
+from APP.services import quote_service
+from benchmarks.load import start_quote_stub
+
+
+def test_quotes_are_shared_and_cached(monkeypatch):
+    stub, url = start_quote_stub(latency_ms=20)
+    monkeypatch.setattr(quote_service, "CHART_URL", url)
+    fetched = lambda: metrics.quote_requests.value("ok")
+    before = fetched()
+
+    async def main():
+        try:
+            results = await asyncio.gather(*(quote_service.get_quotes(["2330", "AAPL", "2330"]) for _ in range(10)))
+            assert fetched() - before == 2  # 10 個請求 x 2 檔，只查了 2 次
+            assert quote_service._get_session() is quote_service._get_session()
+            again = await quote_service.get_quotes(["AAPL"])
+            assert fetched() - before == 2
+            return results, again
+        finally:
+            await quote_service.close()
+
+    try:
+        results, again = asyncio.run(main())
+    finally:
+        stub.shutdown()
+    expected = {"2330": float(100 + sum(map(ord, "2330.TW")) % 900), "AAPL": float(100 + sum(map(ord, "AAPL")) % 900)}
+    assert results == [expected] * 10
+    assert again == {"AAPL": expected["AAPL"]}
+    assert quote_service._session is None
+
+
+def test_failed_quotes_are_none(monkeypatch):
+    monkeypatch.setattr(quote_service, "CHART_URL", "http://127.0.0.1:9/{ticker}")
+    monkeypatch.setattr(quote_service, "QUOTE_TIMEOUT", 2)
+
+    async def main():
+        try:
+            return await quote_service.get_quotes(["2330"])
+        finally:
+            await quote_service.close()
+
+    assert asyncio.run(main()) == {"2330": None}
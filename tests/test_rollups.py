@@ -0,0 +1,45 @@
+"""
+月 / 日彙總：從明細重建 (backfill) 的結果要跟逐筆增量一致，重建也不能跟還在排隊的工作重複計算。
+"""
+from datetime import date
+from sqlalchemy import delete
+from APP import models
+from APP.services import rollup_service
+
+
+def test_backfill_matches_incremental_rollups(add_expense, totals, run, session, drain):
+    for amount, day in ((100, date(2025, 12, 31)), (200, date(2026, 1, 1)), (300, date(2026, 1, 1))):
+        add_expense(amount, day)
+    drain()
+    incremental = totals()
+
+    async def rebuild(db):
+        count = await rollup_service.backfill(db)
+        await db.commit()
+        return count
+    assert run(session(rebuild)) == 3
+    assert totals() == incremental == ((600, 3), (600, 3), (600, 3), 3)
+
+
+def test_ensure_backfilled_discards_jobs_it_already_counted(add_expense, totals, run, session, drain):
+    add_expense(100)
+    drain()
+    add_expense(200)
+    add_expense(300)  # 這兩筆的工作還在排隊
+
+    async def upgrade_and_backfill(db):
+        # 像是從沒有日彙總的舊版升級上來
+        await db.execute(delete(models.DailyTotal))
+        await db.execute(delete(models.MonthlyTotal))
+        await db.commit()
+        await rollup_service.ensure_backfilled(db)
+    run(session(upgrade_and_backfill))
+    drain()
+
+    assert totals() == ((600, 3), (600, 3), (600, 3), 3)
+
+
+def test_month_helpers():
+    assert rollup_service.previous_month_key(date(2026, 1, 15)) == "2025-12"
+    assert rollup_service.next_month_key("2025-12") == "2026-01"
+    assert rollup_service.month_range("2025-11", "2026-02") == ["2025-11", "2025-12", "2026-01", "2026-02"]
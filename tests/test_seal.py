@@ -0,0 +1,42 @@
+"""
+封存彙總：封存後的期間合計要跟直接加總明細一樣，補登到已封存的日子也要跟著調整。
+"""
+from datetime import date, datetime
+from APP.services import seal_service
+
+NOW = datetime(2026, 3, 10, 11, 0)  # 3/8 結束後已經過了 12 小時，可以封存到 3/8
+
+
+def _breakdown(client, start, end):
+    res = client.get(f"/expenses/breakdown?from={start}&to={end}").json()
+    return res["sealed_through"], {i["category"]: (i["total"], i["count"]) for i in res["items"]}
+
+
+def test_sealed_periods_match_raw_totals(client, add_expense, run, session):
+    for amount, day, category in (
+        (100, date(2026, 1, 5), "food"), (200, date(2026, 1, 31), "food"), (50, date(2026, 2, 14), "gift"),
+        (70, date(2026, 3, 8), "food"), (30, date(2026, 3, 9), "food"),
+    ):
+        add_expense(amount, day, category)
+    before = _breakdown(client, "2026-01-02", "2026-03-09")[1]
+
+    async def seal(db):
+        through = await seal_service.seal(db, NOW)
+        await db.commit()
+        return through
+    assert run(session(seal)) == date(2026, 3, 8) == seal_service.horizon(NOW)
+
+    sealed_through, after = _breakdown(client, "2026-01-02", "2026-03-09")
+    assert sealed_through == "2026-03-08"
+    assert after == before == {"food": (400, 4), "gift": (50, 1)}
+    # 整月 + 頭尾零散的日子
+    assert _breakdown(client, "2026-01-31", "2026-02-28")[1] == {"food": (200, 1), "gift": (50, 1)}
+
+    # 補登到已封存的整月裡：日與月的封存列都要調整
+    add_expense(1000, date(2026, 2, 1), "gift")
+    assert _breakdown(client, "2026-02-01", "2026-02-28")[1] == {"gift": (1050, 2)}
+    assert _breakdown(client, "2026-02-01", "2026-02-01")[1] == {"gift": (1000, 1)}
+
+    # 再封存一次不會重複計算
+    assert run(session(seal)) == date(2026, 3, 8)
+    assert _breakdown(client, "2026-01-01", "2026-03-31")[1] == {"food": (400, 4), "gift": (1050, 2)}
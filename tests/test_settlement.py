@@ -0,0 +1,31 @@
+"""
+月結算：月彙總是背景工作更新的，結算時還沒做完的工作也要算進去 (結算紀錄之後不能改)。
+"""
+from datetime import date
+from sqlalchemy import select, update
+from APP import models
+from APP.services import settlement_service
+
+
+def test_settlement_includes_pending_and_failed_jobs(add_expense, run, session, drain):
+    for amount in (99999, 1):
+        add_expense(amount, date(2026, 10, 19))
+    # 一個還在排隊、一個已經放棄重試
+    run(session(lambda db: _fail_one_job(db)))
+
+    months = run(session(lambda db: settlement_service.settle_due_months(db, today=date(2026, 11, 1))))
+    assert months == ["2026-10"]
+
+    drain()  # worker 之後才跑也不能再加一次
+    async def read(db):
+        settlement = await db.scalar(select(models.MonthlySettlement).where(models.MonthlySettlement.month == "2026-10"))
+        monthly = await db.scalar(select(models.MonthlyTotal).where(models.MonthlyTotal.month == "2026-10"))
+        jobs = (await db.scalars(select(models.Job.status))).all()
+        return settlement.total_expense, settlement.expense_count, monthly.total, monthly.count, set(jobs)
+    assert run(session(read)) == (100000, 2, 100000, 2, {"done"})
+
+
+async def _fail_one_job(db):
+    job_id = await db.scalar(select(models.Job.id).order_by(models.Job.id.desc()).limit(1))
+    await db.execute(update(models.Job).where(models.Job.id == job_id).values(status="failed"))
+    await db.commit()
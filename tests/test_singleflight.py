@@ -0,0 +1,52 @@
+"""
+請求合併：相同 key 同時只算一次，發起者被取消也不影響其他人。
+"""
+import asyncio
+from APP import singleflight
+
+
+def test_concurrent_calls_share_one_computation():
+    calls = []
+
+    async def compute(x):
+        calls.append(x)
+        await asyncio.sleep(0.01)
+        return x * 2
+
+    async def main():
+        same = await asyncio.gather(*(singleflight.run(("test", 1), compute, 21) for _ in range(5)))
+        other = await singleflight.run(("test", 2), compute, 1)
+        again = await singleflight.run(("test", 1), compute, 5)  # 算完就不再共用 (不是快取)
+        return same, other, again
+
+    same, other, again = asyncio.run(main())
+    assert same == [42] * 5 and other == 2 and again == 10
+    assert calls == [21, 1, 5]
+    assert singleflight._inflight == {}
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def compute():
+        await asyncio.sleep(0.02)
+        return "done"
+
+    async def main():
+        leader = asyncio.create_task(singleflight.run(("test", "cancel"), compute))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(singleflight.run(("test", "cancel"), compute))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower, leader.cancelled()
+
+    assert asyncio.run(main()) == ("done", True)
+
+
+def test_errors_reach_every_waiter():
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise KeyError("x")
+
+    async def main():
+        return await asyncio.gather(*(singleflight.run(("test", "err"), compute) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(r, KeyError) for r in asyncio.run(main()))
@@ -0,0 +1,23 @@
+"""
+使用者身分：X-User-Id 只有跟著閘道密鑰才算數；沒有設定密鑰是單人模式。
+"""
+import pytest
+from APP import tenancy
+
+
+@pytest.mark.parametrize("headers", [{"X-Gateway-Secret": ""}, {"X-Gateway-Secret": "wrong"}])
+def test_user_header_needs_the_gateway_secret(app_client, user_id, headers):
+    res = app_client.get("/expenses/", headers={"X-User-Id": str(user_id), **headers})
+    assert res.status_code == 401
+
+
+def test_gateway_must_name_the_user(app_client, monkeypatch):
+    # 不會默默當成使用者 1
+    monkeypatch.delitem(app_client.headers, "X-User-Id", raising=False)
+    assert app_client.get("/expenses/").status_code == 401
+
+
+def test_single_user_mode_rejects_other_users(app_client, monkeypatch):
+    monkeypatch.setattr(tenancy, "GATEWAY_SECRET", None)
+    assert app_client.get("/expenses/", headers={"X-User-Id": "2"}).status_code == 401
+    assert app_client.get("/expenses/", headers={"X-User-Id": "1"}).status_code == 200